@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runtime asyncio do bot (RUNTIME=async)
+
+Usa o AsyncWebClient e o Socket Mode via aiohttp do slack_sdk, um servidor
+aiohttp para /events, /health e /status. Os jobs diários usam o mesmo
+agendador do DailyBot; os que falam com o Slack rodam como coroutines no
+event loop. Configuração, banco, assinaturas e caches são os do DailyBot.
+
+As chamadas ao storage (SQLite ou PostgreSQL) são bloqueantes: rodam em
+threads via asyncio.to_thread, para uma consulta lenta ou um lock ocupado não
+parar as outras coroutines.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from functools import partial
+from urllib.parse import parse_qs
+
+from aiohttp import web
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.errors import SlackApiError
+
+import metrics
+from cache import MISSING
+from dedup import event_key
+from dispatcher import AsyncEventDispatcher
+from outbound import AsyncOutboundClient
+from history import QueryError, stream_page
+from signing import json_loads
+from slack_client import observe_api_call
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedAsyncWebClient(AsyncWebClient):
+    """AsyncWebClient com as mesmas métricas por método do InstrumentedWebClient"""
+
+    async def api_call(self, api_method, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await super().api_call(api_method, **kwargs)
+        except Exception as e:
+            observe_api_call(api_method, start, e)
+            raise
+        observe_api_call(api_method, start)
+        return response
+
+
+class AsyncRuntime:
+    """Executa um DailyBot inteiro em um único event loop"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.client = InstrumentedAsyncWebClient(
+            token=bot.bot_token,
+            base_url=os.getenv('SLACK_API_URL', AsyncWebClient.BASE_URL)
+        )
+        self.dispatcher = AsyncEventDispatcher.from_env(self.handle_message)
+        self.outbound = AsyncOutboundClient.from_env(self.client)
+        self.socket_client = None
+        self._runner = None
+
+    def run(self):
+        """Rodar até Ctrl+C"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logger.info("Bot interrompido pelo usuário")
+
+    async def serve(self):
+        """Iniciar workers, jobs agendados e o modo configurado"""
+        bot = self.bot
+        logger.info(f"Iniciando runtime async em modo: {'Webhook' if bot.webhook_mode else 'Socket'}")
+
+        self.dispatcher.start()
+        metrics.watch_dispatcher(self.dispatcher)
+
+        # Lembretes são enviados pelo cliente async, no event loop
+        loop = asyncio.get_running_loop()
+        bot.scheduler = bot.create_scheduler(
+            remind=lambda subscription, date: asyncio.run_coroutine_threadsafe(
+                self.remind_missed_daily(subscription, date), loop
+            ).result()
+        )
+        # Lease e horários salvos vêm do banco: fora do loop, que já atende eventos
+        await asyncio.to_thread(bot.leader.start)
+        await asyncio.to_thread(bot.scheduler.start)
+
+        try:
+            if bot.webhook_mode:
+                await self.start_http_server()
+                bot.mark_ready()
+                if bot.use_ngrok:
+                    # pyngrok é bloqueante: rodar fora do event loop
+                    await asyncio.to_thread(bot.setup_ngrok)
+            else:
+                if bot.metrics_port:
+                    await self.start_http_server(bot.metrics_port, events=False)
+                # Import tardio: o cliente do Socket Mode só é carregado neste modo
+                from slack_sdk.socket_mode.aiohttp import SocketModeClient
+                self.socket_client = SocketModeClient(app_token=bot.app_token, web_client=self.client)
+                self.socket_client.socket_mode_request_listeners.append(self.process_events)
+                await self.socket_client.connect()
+                logger.info("Bot conectado com sucesso!")
+                bot.mark_ready()
+
+            # Rodar até ser cancelado
+            await asyncio.Event().wait()
+        finally:
+            # Em thread: um lembrete em andamento precisa do loop para terminar
+            await asyncio.to_thread(bot.scheduler.stop)
+            await asyncio.to_thread(bot.leader.stop)
+            if self.socket_client:
+                await self.socket_client.close()
+            if self._runner:
+                await self._runner.cleanup()
+            await self.dispatcher.stop()
+            await self.outbound.stop()
+            await asyncio.to_thread(bot.writer.stop)
+            bot.storage.close()
+
+    # ------------------------------------------------------------------
+    # Servidor HTTP
+    # ------------------------------------------------------------------
+
+    def create_app(self, events=True):
+        """Aplicação aiohttp com as mesmas rotas principais do Flask"""
+        app = web.Application()
+        if events:
+            app.router.add_post('/events', self.slack_events)
+            app.router.add_post('/commands', self.slash_command)
+        app.router.add_get('/history', self.history)
+        app.router.add_get('/search', self.search)
+        app.router.add_get('/health', self.health_check)
+        app.router.add_get('/status', self.status)
+        app.router.add_get('/metrics', self.metrics_endpoint)
+        return app
+
+    async def start_http_server(self, port=None, events=True):
+        port = port or self.bot.port
+        self._runner = web.AppRunner(self.create_app(events))
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '0.0.0.0', port).start()
+        logger.info(f"Servidor aiohttp iniciado na porta {port}")
+
+    async def slack_events(self, request):
+        """Endpoint para receber eventos do Slack"""
+        start = time.perf_counter()
+        result = 'error'
+        try:
+            timestamp = request.headers.get('X-Slack-Request-Timestamp')
+            signature = request.headers.get('X-Slack-Signature')
+
+            # Mesma ordem do Flask: timestamp (sem ler o corpo), assinatura, JSON
+            if not self.bot.verifier.fresh(timestamp):
+                result = 'stale'
+                return web.json_response({'error': 'Stale request'}, status=401)
+
+            raw_body = await request.read()
+            if not self.bot.verify_slack_signature(raw_body, timestamp, signature):
+                logger.debug("Assinatura inválida (%d bytes)", len(raw_body))
+                result = 'invalid'
+                return web.json_response({'error': 'Invalid signature'}, status=401)
+
+            try:
+                event_data = json_loads(raw_body)
+            except ValueError as e:
+                logger.error("Erro ao decodificar JSON: %s", e)
+                result = 'invalid'
+                return web.json_response({'error': 'Invalid JSON'}, status=400)
+
+            # Verificar URL challenge (configuração inicial)
+            if 'challenge' in event_data:
+                result = 'challenge'
+                return web.json_response({'challenge': event_data['challenge']})
+
+            if request.headers.get('X-Slack-Retry-Num'):
+                metrics.EVENT_RETRIES.labels('webhook').inc()
+
+            result = 'ignored'
+            event = event_data.get('event')
+            if event and not self.bot.event_filter.accept(event):
+                result = 'filtered'
+            elif event:
+                # Fila cheia: não confirmar para o Slack reenviar depois
+                if not await self.dispatch_event(event, event_data.get('event_id')):
+                    result = 'rejected'
+                    return web.json_response({'error': 'Busy'}, status=503)
+                result = 'accepted'
+
+            return web.json_response({'status': 'ok'})
+
+        except Exception as e:
+            logger.error("Erro no endpoint /events: %s", e, exc_info=True)
+            return web.json_response({'error': str(e)}, status=500)
+        finally:
+            metrics.EVENTS_RECEIVED.labels('webhook', result).inc()
+            metrics.EVENT_ACK_SECONDS.labels('webhook').observe(time.perf_counter() - start)
+
+    async def history_response(self, request, query):
+        """Página do histórico escrita em partes (consulta limitada ao tamanho da página)"""
+        if not self.bot.history.authorized(request.headers.get('Authorization')):
+            return web.json_response({'error': 'Unauthorized'}, status=401)
+        args = request.query
+        try:
+            page = await asyncio.to_thread(query, args.get('user_id'), start=args.get('from'), end=args.get('to'),
+                                           cursor=args.get('cursor'), limit=args.get('limit'))
+        except QueryError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        response = web.StreamResponse(headers={'Content-Type': 'application/json'})
+        await response.prepare(request)
+        for chunk in stream_page(page):
+            await response.write(chunk.encode('utf-8'))
+        await response.write_eof()
+        return response
+
+    async def history(self, request):
+        return await self.history_response(request, self.bot.history.history)
+
+    async def search(self, request):
+        return await self.history_response(request, partial(self.bot.history.search, text=request.query.get('q')))
+
+    async def slash_command(self, request):
+        """Slash command de histórico, com a mesma validação do /events"""
+        timestamp = request.headers.get('X-Slack-Request-Timestamp')
+        signature = request.headers.get('X-Slack-Signature')
+        raw_body = await request.read()
+        if not self.bot.verifier.fresh(timestamp) or not self.bot.verify_slack_signature(raw_body, timestamp, signature):
+            return web.json_response({'error': 'Invalid signature'}, status=401)
+        form = {key: values[0] for key, values in parse_qs(raw_body.decode('utf-8')).items()}
+        return web.json_response(
+            await asyncio.to_thread(self.bot.command_response, form.get('user_id'), form.get('text'))
+        )
+
+    async def health_check(self, request):
+        return web.json_response(self.bot.health_payload())
+
+    async def status(self, request):
+        # Consulta o digest e as respostas de cada usuário no banco
+        payload = await asyncio.to_thread(self.bot.status_payload, self.dispatcher)
+        payload['outbound'] = self.outbound.stats()
+        return web.json_response(payload)
+
+    async def metrics_endpoint(self, request):
+        return web.Response(body=metrics.render().encode('utf-8'), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+
+    async def process_events(self, client, req):
+        """Listener do Socket Mode: enfileirar e confirmar imediatamente"""
+        start = time.perf_counter()
+        result = 'ignored'
+        try:
+            accepted = True
+            payload = None
+            if req.type == "events_api":
+                event = req.payload.get("event", {})
+                if req.retry_attempt:
+                    metrics.EVENT_RETRIES.labels('socket').inc()
+                if not self.bot.event_filter.accept(event):
+                    result = 'filtered'
+                else:
+                    accepted = await self.dispatch_event(event, req.payload.get("event_id"))
+                    result = 'accepted' if accepted else 'rejected'
+            elif req.type == "slash_commands":
+                payload = await asyncio.to_thread(
+                    self.bot.command_response, req.payload.get("user_id"), req.payload.get("text")
+                )
+                result = 'command'
+
+            if accepted:
+                from slack_sdk.socket_mode.response import SocketModeResponse
+                await client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id, payload=payload))
+                metrics.EVENT_ACK_SECONDS.labels('socket').observe(time.perf_counter() - start)
+
+        except Exception as e:
+            result = 'error'
+            logger.error("Erro ao processar evento: %s", e)
+        finally:
+            metrics.EVENTS_RECEIVED.labels('socket', result).inc()
+
+    async def dispatch_event(self, event, event_id=None):
+        """Enviar evento para a fila de processamento (repetições recentes são só confirmadas)"""
+        dedup_key = event_key(event, event_id)
+        if not self.bot.dedup.check_in(dedup_key):
+            return True
+        key = event.get("user") or event.get("channel")
+        if await self.dispatcher.submit(event, key):
+            return True
+        self.bot.dedup.release(dedup_key)
+        return False
+
+    async def handle_message(self, event):
+        """Mesmo roteamento do DailyBot.handle_message, com I/O assíncrono"""
+        bot = self.bot
+        user_id = event.get("user")
+        bot_id = event.get("bot_id")
+        channel = event.get("channel", "")
+        text = event.get("text", "")
+
+        if bot_id:
+            try:
+                bot_name = await self.resolve_bot_name(bot_id)
+                if (bot_name is not None and bot.daily_bot_name.lower() in bot_name
+                        and await asyncio.to_thread(bot.claim_event, event)):
+                    for subscription in bot.subscriptions.for_channel(channel):
+                        await self.handle_daily_message(event, subscription)
+            except Exception as e:
+                logger.error("Erro ao verificar bot info: %s", e)
+            return
+
+        subscription = bot.subscriptions.for_user(user_id)
+        if subscription and (channel == subscription.channel_id or channel.startswith("D")):
+            if await asyncio.to_thread(bot.claim_event, event):
+                await self.store_user_message(text, channel, user_id)
+
+    async def resolve_bot_name(self, bot_id):
+        bot_name = await asyncio.to_thread(self.bot.cached_bot_name, bot_id)
+        if bot_name is not MISSING:
+            return bot_name
+        bot_info = await self.outbound.call('bots.info', bot=bot_id)
+        return await asyncio.to_thread(self.bot.remember_bot_name, bot_id, bot_info)
+
+    async def handle_daily_message(self, event, subscription):
+        """Responder na thread da daily com as mensagens do usuário"""
+        bot = self.bot
+        try:
+            user_id = subscription.user_id
+            today = bot.today(user_id)
+            if await asyncio.to_thread(bot.has_responded_today, user_id, today):
+                return
+
+            digest = await asyncio.to_thread(bot.get_today_digest, user_id)
+            # Reserva atômica: só uma coroutine/processo responde por usuário por dia
+            if digest and await asyncio.to_thread(bot.responses.claim, user_id, today):
+                posted = 0
+                try:
+                    for part in bot.renderer.render(user_id, today, digest, 'reply'):
+                        await self.outbound.call(
+                            'chat.postMessage',
+                            channel=subscription.channel_id,
+                            thread_ts=event.get("ts"),
+                            **part.message()
+                        )
+                        posted += 1
+                except Exception:
+                    if not posted:
+                        await asyncio.to_thread(bot.responses.release, user_id, today)
+                    raise
+                logger.info("Resposta à daily de %s enviada para %s", user_id, today)
+
+        except Exception as e:
+            logger.error("Erro ao responder à daily: %s", e)
+
+    async def store_user_message(self, message, channel, user_id):
+        """Armazenar a mensagem (commit agrupado pelo escritor, sem bloquear o loop) e confirmar no DM"""
+        if not message.strip():
+            return
+
+        today = self.bot.today(user_id)
+        try:
+            bot = self.bot
+            # submit() pode bloquear (gravação direta sem group commit, fila cheia)
+            future = await asyncio.to_thread(bot.writer.submit, user_id, channel, today, message)
+            try:
+                message_id = await asyncio.wrap_future(future)
+            except BaseException:
+                # Erro ou coroutine cancelada: o commit ainda pode acontecer depois
+                bot.digests.append_when_done(user_id, today, message, future)
+                raise
+            bot.digests.append(user_id, today, message_id, message)
+            await self.outbound.debounce(user_id, partial(self.send_dm_confirmation, user_id))
+        except Exception as e:
+            logger.error("Erro ao armazenar mensagem: %s", e, exc_info=True)
+
+    async def send_dm_confirmation(self, user_id):
+        bot = self.bot
+        digest = await asyncio.to_thread(bot.get_today_digest, user_id)
+        if not digest:
+            return
+        today = bot.today(user_id)
+        confirmation, = bot.renderer.render(user_id, today, digest, 'confirmation')
+
+        # Editar a confirmação de hoje, se houver (mesmo estado do DailyBot)
+        with bot.dm_lock:
+            previous = bot.dm_confirmations.get(user_id)
+        if bot.dm_confirmation_update and previous and previous[0] == today:
+            try:
+                await self.outbound.call('chat.update', channel=previous[1], ts=previous[2],
+                                         **confirmation.message())
+                return
+            except SlackApiError as e:
+                logger.debug("Não foi possível editar a confirmação de %s: %s", user_id, e)
+
+        response = await self.outbound.call('chat.postMessage', channel=user_id, **confirmation.message())
+        with bot.dm_lock:
+            bot.dm_confirmations[user_id] = (today, response.get('channel'), response.get('ts'))
+
+    async def remind_missed_daily(self, subscription, date):
+        """Lembrete das 23:55 (no fuso do usuário) se a daily não foi respondida"""
+        bot = self.bot
+        if await asyncio.to_thread(bot.responses.responded, subscription.user_id, date):
+            return
+        digest = await asyncio.to_thread(bot.digests.get, subscription.user_id, date)
+        if digest:
+            thread_ts = None
+            for part in bot.renderer.render(subscription.user_id, date, digest, 'reminder'):
+                response = await self.outbound.call('chat.postMessage', channel=subscription.channel_id,
+                                                    thread_ts=thread_ts, **part.message())
+                thread_ts = thread_ts or response.get('ts')
+            logger.info("Lembrete de daily perdida enviado para %s", subscription.user_id)
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark e conformidade dos backends de armazenamento (SQLite e PostgreSQL)
+
+Roda as mesmas verificações contra cada backend, sempre num banco vazio:
+mensagens e ids, claims atômicos (resposta do dia, eventos, jobs) disputados
+por várias threads, histórico paginado, busca, assinaturas, bots,
+exportação/importação, retenção e o digest compartilhado com commits fora
+da ordem dos ids. Com os dois backends disponíveis, também
+migra um banco SQLite para o PostgreSQL com export/import. Depois mede
+operações/s e latência p50/p99 das operações do bot com N threads.
+
+O PostgreSQL usa --database-url (default: DATABASE_URL), cada banco num
+schema temporário apagado no fim; sem URL ou sem o psycopg ele é pulado.
+Sai com código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_backends.py [--database-url postgresql://localhost/dailybot]
+        [--backends sqlite,postgresql] [--threads 8] [--operations 2000]
+"""
+
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from digest import DigestCache
+from retention import encode_messages, decode_messages
+from storage import Storage, ConnectionPool, pragmas_from_env
+
+DAY = '2024-03-04'
+
+
+class ConformanceError(AssertionError):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise ConformanceError(message)
+
+
+def rows(values):
+    """Linhas comparáveis entre backends (tuplas, booleanos do SQLite como bool)"""
+    return [tuple(value) for value in values]
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, tmpdir, size):
+        self.tmpdir = tmpdir
+        self.size = size
+
+    def fresh(self):
+        path = os.path.join(self.tmpdir, f'{uuid.uuid4().hex}.db')
+        storage = Storage(ConnectionPool(path, size=self.size, pragmas=pragmas_from_env()))
+        storage.init_schema()
+        return storage
+
+    def drop(self, storage):
+        storage.close()
+
+
+class PostgresBackend:
+    name = 'postgresql'
+
+    def __init__(self, url, size):
+        import psycopg
+        from psycopg.conninfo import make_conninfo
+        from storage_postgres import PostgresStorage, connection_pool
+
+        self.url = url
+        self.size = size
+        self._psycopg = psycopg
+        self._conninfo = make_conninfo
+        self._storage = PostgresStorage
+        self._pool = connection_pool
+        self._schemas = {}
+        # Falha aqui (servidor fora do ar, credenciais) = backend indisponível
+        psycopg.connect(url, connect_timeout=5).close()
+
+    def fresh(self):
+        schema = f'bench_{uuid.uuid4().hex[:12]}'
+        with self._psycopg.connect(self.url, autocommit=True) as conn:
+            conn.execute(f'CREATE SCHEMA {schema}')
+        conninfo = self._conninfo(self.url, options=f'-c search_path={schema}')
+        storage = self._storage(self._pool(conninfo, size=self.size))
+        storage.init_schema()
+        self._schemas[id(storage)] = schema
+        return storage
+
+    def drop(self, storage):
+        storage.close()
+        schema = self._schemas.pop(id(storage))
+        with self._psycopg.connect(self.url, autocommit=True) as conn:
+            conn.execute(f'DROP SCHEMA {schema} CASCADE')
+
+
+# Verificações: cada uma recebe um storage vazio e a fábrica do backend
+
+def check_messages(storage, backend):
+    ids = [storage.insert_message('U1', 'C1', DAY, f'mensagem {n}') for n in range(3)]
+    expect(ids == sorted(set(ids)), f"ids não crescentes: {ids}")
+    more = storage.insert_messages([('U1', 'C1', DAY, 'mensagem 3'), ('U2', 'C1', DAY, 'outra'),
+                                    ('U1', 'D1', DAY, 'atualização ✅ "aspas" \\ barra')])
+    expect(len(more) == 3 and ids[-1] < more[0] < more[1] < more[2], f"ids do lote: {more}")
+    expect(storage.get_messages('U1', DAY) ==
+           ['mensagem 0', 'mensagem 1', 'mensagem 2', 'mensagem 3', 'atualização ✅ "aspas" \\ barra'],
+           f"mensagens do dia: {storage.get_messages('U1', DAY)}")
+    expect(rows(storage.get_messages_after('U1', DAY, ids[2])) ==
+           [(more[0], 'mensagem 3'), (more[2], 'atualização ✅ "aspas" \\ barra')], "get_messages_after")
+    expect(rows(storage.get_messages_after('U1', DAY)) and storage.get_messages('U1', '2024-03-05') == [],
+           "mensagens de outro dia")
+
+
+def check_responses(storage, backend):
+    expect(not storage.response_sent('U1', DAY), "resposta antes do claim")
+    expect(storage.claim_response('U1', DAY), "primeiro claim")
+    expect(not storage.claim_response('U1', DAY), "segundo claim aceito")
+    expect(storage.response_sent('U1', DAY), "resposta após o claim")
+    storage.release_response('U1', DAY)
+    expect(not storage.response_sent('U1', DAY), "release não desfez o claim")
+    expect(storage.claim_response('U1', DAY), "claim após o release")
+    storage.mark_responded('U2', DAY)
+    storage.mark_responded('U2', DAY)
+    expect(storage.response_sent('U2', DAY) and not storage.response_sent('U2', '2024-03-05'), "mark_responded")
+
+
+def check_concurrent_claims(storage, backend):
+    """Só uma de várias threads (réplicas) consegue cada claim"""
+    storage.init_job('daily', 100.0)
+    threads = 16
+    barrier = threading.Barrier(threads)
+    results = {'response': [], 'event': [], 'job': []}
+
+    def claim():
+        barrier.wait()
+        results['response'].append(storage.claim_response('U9', DAY))
+        results['event'].append(storage.claim_event('Ev-disputado', 1.0))
+        results['job'].append(storage.claim_job_run('daily', 100.0, 200.0, 150.0))
+
+    workers = [threading.Thread(target=claim) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    for name, values in results.items():
+        expect(values.count(True) == 1, f"claim {name}: {values.count(True)} vencedores em {threads}")
+
+
+def check_events(storage, backend):
+    expect(storage.claim_event('Ev1', 100.0) and not storage.claim_event('Ev1', 101.0), "claim_event")
+    expect(storage.claim_event('Ev2', 200.0), "claim_event de outro evento")
+    expect(storage.prune_events(150.0) == 1, "prune_events")
+    expect(storage.claim_event('Ev1', 300.0) and not storage.claim_event('Ev2', 300.0), "eventos após o prune")
+
+
+def check_jobs(storage, backend):
+    expect(storage.init_job('daily', 100.0) == 100.0, "init_job")
+    expect(storage.init_job('daily', 500.0) == 100.0, "init_job sobrescreveu o horário salvo")
+    expect(storage.claim_job_run('daily', 100.0, 200.0, 100.5), "claim_job_run")
+    expect(not storage.claim_job_run('daily', 100.0, 300.0, 100.6), "claim_job_run com horário antigo")
+    expect(storage.claim_job_run('daily', 200.0, 300.0, None), "claim_job_run sem ran_at")
+    storage.finish_job('daily', 'ok', 0.25)
+    storage.init_job('retention', 50.0)
+    expect(storage.get_job_next_run('daily') == 300.0 and storage.get_job_next_run('nenhum') is None,
+           "get_job_next_run")
+    expect(rows(storage.list_jobs()) == [('retention', 50.0, None, None, None), ('daily', 300.0, 100.5, 'ok', 0.25)],
+           f"list_jobs: {storage.list_jobs()}")
+
+
+def check_leases(storage, backend):
+    expect(storage.acquire_lease('scheduler', 'a', 100.0, 10.0) == 1, "acquire_lease livre")
+    expect(storage.acquire_lease('scheduler', 'a', 105.0, 10.0) == 1, "renovação trocou o token")
+    expect(storage.acquire_lease('scheduler', 'b', 110.0, 10.0) is None, "acquire_lease de lease válido de outro")
+    expect(storage.get_lease('scheduler') == ('a', 1, 115.0), f"get_lease: {storage.get_lease('scheduler')}")
+    expect(storage.acquire_lease('scheduler', 'b', 115.0, 10.0) == 2, "acquire_lease de lease vencido")
+    storage.init_job('fenced', 100.0)
+    expect(not storage.claim_job_run('fenced', 100.0, 200.0, 100.0, ('scheduler', 1)),
+           "claim_job_run com token antigo")
+    expect(storage.claim_job_run('fenced', 100.0, 200.0, 100.0, ('scheduler', 2)), "claim_job_run com token atual")
+    storage.release_lease('scheduler', 'a')
+    expect(storage.get_lease('scheduler')[0] == 'b', "release_lease de outro holder")
+    storage.release_lease('scheduler', 'b')
+    expect(storage.acquire_lease('scheduler', 'a', 120.0, 10.0) == 3, "acquire_lease após release")
+    expect(storage.get_lease('nenhum') is None, "get_lease inexistente")
+
+
+def check_subscriptions(storage, backend):
+    storage.save_subscription('U2', 'C2')
+    storage.save_subscription('U1', 'C1', 'America/Sao_Paulo')
+    storage.save_subscription('U2', 'C3', 'UTC')
+    expect(rows(storage.list_subscriptions()) == [('U1', 'C1', 'America/Sao_Paulo'), ('U2', 'C3', 'UTC')],
+           f"assinaturas: {storage.list_subscriptions()}")
+    storage.delete_subscription('U1')
+    expect(rows(storage.list_subscriptions()) == [('U2', 'C3', 'UTC')], "delete_subscription")
+
+
+def check_bots(storage, backend):
+    expect(storage.get_bot_identity('B1') is None, "bot inexistente")
+    storage.save_bot_identity('B1', 'daily-bot', 1.5)
+    expect(tuple(storage.get_bot_identity('B1')) == ('daily-bot', 1.5), "save_bot_identity")
+    storage.save_bot_identity('B1', None, 2.0)
+    expect(tuple(storage.get_bot_identity('B1')) == (None, 2.0), "bot sem informação")
+
+
+def check_history(storage, backend):
+    for user in ('U1', 'U2'):
+        storage.insert_messages([(user, 'C1', f'2024-03-{day:02d}', f'{user} dia {day} n{n}')
+                                 for day in range(1, 6) for n in range(3)])
+    seen, after = [], None
+    while True:
+        page = rows(storage.history('U1', '2024-01-01', '2024-12-31', after, 4))
+        seen.extend(page)
+        if len(page) < 4:
+            break
+        after = (page[-1][1], page[-1][2], page[-1][0])
+    keys = [(row[1], row[2], row[0]) for row in seen]
+    expect(len(seen) == 15 and keys == sorted(keys, reverse=True) and len(set(keys)) == 15,
+           f"paginação do histórico: {len(seen)} linhas")
+    expect(all(row[3].startswith('U1 ') for row in seen), "histórico com mensagens de outro usuário")
+    window = rows(storage.history('U1', '2024-03-02', '2024-03-03', None, 50))
+    expect(sorted({row[1] for row in window}) == ['2024-03-02', '2024-03-03'] and len(window) == 6,
+           "intervalo de datas do histórico")
+
+
+def check_search(storage, backend):
+    texts = ['deploy do serviço de pagamentos', 'revisão do deploy', 'reunião com o time', 'Deploy atrasado']
+    ids = storage.insert_messages([('U1', 'C1', f'2024-03-0{n + 1}', text) for n, text in enumerate(texts)])
+    storage.insert_message('U2', 'C1', DAY, 'deploy de outro usuário')
+    found = rows(storage.search('U1', ['deploy'], '2024-01-01', '2024-12-31'))
+    expect([row[0] for row in found] == [ids[3], ids[1], ids[0]], f"busca por um termo: {found}")
+    expect([row[0] for row in storage.search('U1', ['deploy', 'pagamentos'], '2024-01-01', '2024-12-31')]
+           == [ids[0]], "busca com dois termos")
+    expect([row[0] for row in storage.search('U1', ['revisão'], '2024-01-01', '2024-12-31')] == [ids[1]],
+           "busca com acento")
+    page = rows(storage.search('U1', ['deploy'], '2024-01-01', '2024-12-31', None, 2))
+    rest = rows(storage.search('U1', ['deploy'], '2024-01-01', '2024-12-31', page[-1][0], 2))
+    expect([row[0] for row in page + rest] == [ids[3], ids[1], ids[0]], "paginação da busca")
+    expect(rows(storage.search('U1', ['deploy'], '2024-03-02', '2024-03-03')) == [found[1]],
+           "intervalo de datas da busca")
+    expect(storage.search('U1', ['inexistente'], '2024-01-01', '2024-12-31') == [], "busca sem resultados")
+
+
+def check_shared_digest(storage, backend):
+    """Digest compartilhado: a linha de id menor commitada depois da de id maior não se perde"""
+    digests = DigestCache(storage, shared=True, grace=0.5)
+    first_id = storage.insert_message('U1', 'C1', DAY, 'primeira')
+    expect(digests.get('U1', DAY).messages == ['primeira'], "carga do digest")
+
+    if backend.name == 'postgresql':
+        # Duas sessões: o id da lenta é reservado primeiro, mas o commit é o último
+        with storage.pool.connection() as slow:
+            slow_id = slow.execute("INSERT INTO daily_messages (user_id, channel_id, date, message) "
+                                   "VALUES ('U1', 'C1', %s, 'atrasada') RETURNING id", (DAY,)).fetchone()[0]
+            fast_id = storage.insert_message('U1', 'C1', DAY, 'rápida')
+            expect(digests.get('U1', DAY).messages == ['primeira', 'rápida'], "digest antes do commit atrasado")
+    else:
+        # Um escritor por vez: os ids seguem a ordem dos commits, então o
+        # commit atrasado é simulado com ids explícitos
+        insert = "INSERT INTO daily_messages (id, user_id, channel_id, date, message) VALUES (?, 'U1', 'C1', ?, ?)"
+        with storage.pool.connection() as conn, conn:
+            fast_id = conn.execute(insert, (first_id + 10, DAY, 'rápida')).lastrowid
+        expect(digests.get('U1', DAY).messages == ['primeira', 'rápida'], "digest antes do commit atrasado")
+        with storage.pool.connection() as conn, conn:
+            slow_id = conn.execute(insert, (first_id + 5, DAY, 'atrasada')).lastrowid
+    expect(slow_id < fast_id, f"ids fora de ordem: {slow_id}, {fast_id}")
+
+    expected = storage.get_messages('U1', DAY)
+    expect(sorted(expected) == ['atrasada', 'primeira', 'rápida'], f"mensagens no banco: {expected}")
+    expect(digests.get('U1', DAY).messages == expected,
+           f"commit fora de ordem perdido: {digests.get('U1', DAY).messages}")
+    time.sleep(0.6)
+    storage.insert_message('U1', 'C1', DAY, 'depois')
+    expect(digests.get('U1', DAY).messages == expected + ['depois'], "digest depois da janela")
+
+
+def fill_history(storage):
+    """Mensagens com lacunas nos ids e respostas, para exportar"""
+    ids = storage.insert_messages([(f'U{n % 3}', 'C1', f'2024-02-{n % 28 + 1:02d}', f'mensagem {n}')
+                                   for n in range(30)])
+    storage.take_old_days('2024-02-02', 10)  # apaga os dias 1 (lacunas nos ids)
+    for n in range(5):
+        storage.mark_responded(f'U{n}', '2024-02-10')
+    storage.claim_response('U1', '2024-02-11')
+    storage.release_response('U1', '2024-02-11')
+    return ids
+
+
+def check_transfer(storage, backend):
+    fill_history(storage)
+    messages = rows(storage.export_messages(batch=7))
+    responses = rows(storage.export_responses(batch=2))
+    expect(len(messages) == 28 and len(responses) == 6, f"exportação: {len(messages)}/{len(responses)}")
+    target = backend.fresh()
+    try:
+        for _ in range(2):  # reimportar não duplica
+            target.import_messages(iter(messages), batch=10)
+            target.import_responses(iter(responses), batch=4)
+        expect(rows(target.export_messages()) == messages, "mensagens importadas diferentes das exportadas")
+        expect([(u, d, bool(r), t) for u, d, r, t in rows(target.export_responses())] ==
+               [(u, d, bool(r), t) for u, d, r, t in responses], "respostas importadas diferentes")
+        last = messages[-1][0]
+        target.import_messages([(None, 'U7', 'C1', DAY, 'anexada', None)])
+        appended = rows(target.export_messages())[-1]
+        expect(appended[0] > last and appended[5], f"mensagem sem id importada: {appended}")
+        # Depois da importação com ids, novos inserts continuam a sequência
+        new_id = target.insert_message('U7', 'C1', DAY, 'nova')
+        expect(new_id > appended[0], f"id após a importação: {new_id} <= {appended[0]}")
+        target.import_responses([('U1', '2024-02-11', True, None), ('U1', '2024-02-11', False, None)])
+        expect(target.response_sent('U1', '2024-02-11'), "importação desmarcou uma resposta enviada")
+    finally:
+        backend.drop(target)
+
+
+def check_retention(storage, backend):
+    for day in range(1, 6):
+        storage.insert_messages([('U1', 'C1', f'2024-01-0{day}', f'dia {day} n{n}') for n in range(2)])
+    storage.mark_responded('U1', '2024-01-02')
+    storage.mark_responded('U1', '2024-01-06')
+    storage.mark_responded('U2', '2024-01-01')  # resposta sem mensagens
+
+    def archive(records):
+        return [(user_id, day, encode_messages(messages), len(messages), response_sent)
+                for user_id, day, messages, response_sent in records]
+
+    taken = []
+    while True:
+        records = storage.take_old_days('2024-01-04', 2, archive)
+        if not records:
+            break
+        taken.extend((user_id, day, len(messages), response_sent) for user_id, day, messages, response_sent in records)
+    expect(sorted(taken) == [('U1', '2024-01-01', 2, False), ('U1', '2024-01-02', 2, True),
+                             ('U1', '2024-01-03', 2, False), ('U2', '2024-01-01', 0, True)],
+           f"dias arquivados: {taken}")
+    expect(storage.get_messages('U1', '2024-01-02') == [] and len(storage.get_messages('U1', '2024-01-04')) == 2,
+           "mensagens após a retenção")
+    expect(not storage.response_sent('U1', '2024-01-02') and storage.response_sent('U1', '2024-01-06'),
+           "respostas após a retenção")
+    (blob, responded), = storage.get_archive('U1', '2024-01-02')
+    expect([message[2] for message in decode_messages(blob)] == ['dia 2 n0', 'dia 2 n1'] and responded,
+           "arquivo do dia")
+    expect(storage.take_old_days('2024-01-04', 2, lambda records: []) == [], "retenção sem dias antigos")
+
+
+def check_maintenance(storage, backend):
+    size, free = storage.db_size()
+    expect(size > 0 and free >= 0, f"db_size: {size}, {free}")
+    expect(storage.auto_vacuum() in (0, 1, 2), "auto_vacuum")
+    expect(storage.incremental_vacuum(10) >= 0, "incremental_vacuum")
+    storage.optimize()
+
+
+CHECKS = [check_messages, check_responses, check_concurrent_claims, check_events, check_jobs,
+          check_leases, check_subscriptions, check_bots, check_history, check_search, check_transfer,
+          check_retention, check_maintenance, check_shared_digest]
+
+
+def conformance(backend):
+    """Rodar as verificações; retorna a lista de falhas"""
+    failures = []
+    for check in CHECKS:
+        storage = backend.fresh()
+        try:
+            check(storage, backend)
+            status = 'ok'
+        except Exception as e:
+            failures.append(check.__name__)
+            status = f'FALHA: {e}' if isinstance(e, ConformanceError) else f'ERRO: {traceback.format_exc()}'
+        finally:
+            backend.drop(storage)
+        print(f"  {check.__name__[6:]:<20}{status}")
+    return failures
+
+
+def migration(source_backend, target_backend):
+    """Exportar de um backend e importar no outro: mesmas linhas dos dois lados"""
+    source, target = source_backend.fresh(), target_backend.fresh()
+    try:
+        fill_history(source)
+        target.import_messages(source.export_messages())
+        target.import_responses(source.export_responses())
+        same = rows(target.export_messages()) == rows(source.export_messages()) and [
+            (u, d, bool(r), t) for u, d, r, t in target.export_responses()
+        ] == [(u, d, bool(r), t) for u, d, r, t in source.export_responses()]
+        target.insert_message('U1', 'C1', DAY, 'depois da migração')
+        return same
+    finally:
+        source_backend.drop(source)
+        target_backend.drop(target)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def measure(threads, operations, operation):
+    """Executar `operation(n)` `operations` vezes divididas entre as threads; (ops/s, latências)"""
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def run(index):
+        barrier.wait()
+        for n in range(index, operations, threads):
+            begin = time.perf_counter()
+            operation(n)
+            latencies[index].append(time.perf_counter() - begin)
+
+    workers = [threading.Thread(target=run, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return operations / elapsed, [value for values in latencies for value in values]
+
+
+def benchmark(backend, threads, operations):
+    storage = backend.fresh()
+    users = [f'U{n:04d}' for n in range(200)]
+    try:
+        # Histórico prévio: 200 usuários x 30 dias x 3 mensagens
+        storage.insert_messages([(user, 'C1', f'2024-02-{day:02d}', f'atualização {day} deploy {user}')
+                                 for user in users for day in range(1, 29) for _ in range(3)])
+        operations_by_name = [
+            ('insert_message', lambda n: storage.insert_message(users[n % 200], 'C1', DAY, f'mensagem {n}')),
+            ('insert_messages x50', lambda n: storage.insert_messages(
+                [(users[(n + i) % 200], 'C1', DAY, f'lote {n}') for i in range(50)])),
+            ('claim_event', lambda n: storage.claim_event(f'Ev{n}', time.time())),
+            ('claim_response', lambda n: storage.claim_response(users[n % 200], f'2024-04-{n % 28 + 1:02d}')),
+            ('get_messages', lambda n: storage.get_messages(users[n % 200], '2024-02-10')),
+            ('history (50)', lambda n: storage.history(users[n % 200], '2024-01-01', '2024-12-31', None, 50)),
+            ('search', lambda n: storage.search(users[n % 200], ['deploy'], '2024-01-01', '2024-12-31', None, 20)),
+        ]
+        results = []
+        for name, operation in operations_by_name:
+            count = operations // 10 if 'x50' in name else operations
+            rate, latencies = measure(threads, count, operation)
+            results.append((name, rate, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000))
+        return results
+    finally:
+        backend.drop(storage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL', ''),
+                        help='PostgreSQL (default: DATABASE_URL)')
+    parser.add_argument('--backends', default='sqlite,postgresql')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=2000, help='execuções de cada operação')
+    parser.add_argument('--no-benchmark', action='store_true', help='só as verificações de conformidade')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        backends = []
+        for name in args.backends.split(','):
+            if name == 'sqlite':
+                backends.append(SQLiteBackend(tmpdir, args.threads))
+                continue
+            if not args.database_url.startswith(('postgres://', 'postgresql://')):
+                print(f"{name}: indisponível (defina --database-url ou DATABASE_URL)\n")
+                continue
+            try:
+                backends.append(PostgresBackend(args.database_url, args.threads))
+            except Exception as e:
+                print(f"{name}: indisponível ({e!r})\n")
+
+        for backend in backends:
+            print(f"{backend.name}: conformidade")
+            failures = conformance(backend)
+            failed = failed or bool(failures)
+            print()
+
+        if len(backends) == 2:
+            same = migration(*backends)
+            print(f"migração {backends[0].name} -> {backends[1].name} (export/import): "
+                  f"{'ok' if same else 'FALHA: linhas diferentes'}\n")
+            failed = failed or not same
+
+        if not args.no_benchmark:
+            print(f"{args.threads} threads, {args.operations} execuções por operação (lotes: 1/10)\n")
+            print(f"{'backend':<12}{'operação':<22}{'ops/s':>10}{'p50 ms':>9}{'p99 ms':>9}")
+            for backend in backends:
+                for name, rate, p50, p99 in benchmark(backend, args.threads, args.operations):
+                    print(f"{backend.name:<12}{name:<22}{rate:>10.0f}{p50:>9.2f}{p99:>9.2f}")
+
+    if failed:
+        print("\nFALHA: backends com comportamento diferente")
+        return 1
+    print("\nOK: backends conformes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
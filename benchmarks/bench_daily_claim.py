@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de concorrência: uma resposta à daily por usuário por dia
+
+O bot da daily posta várias mensagens no canal (ex: lembretes) e cada uma é
+processada por uma thread diferente, divididas entre dois bots no mesmo
+banco (como dois processos). Compara a verificação anterior (flag em
+memória, consultada e marcada depois do envio) com a reserva atômica no
+banco. Sai com código 1 se algum usuário receber mais de uma resposta com a
+reserva atômica.
+
+Uso: python benchmarks/bench_daily_claim.py [--users 20] [--dailies 8] [--threads 16]
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+
+def legacy_bot_class():
+    """DailyBot com a verificação anterior: flag em memória marcada após o envio"""
+    from bot import DailyBot
+
+    class LegacyBot(DailyBot):
+        def __init__(self):
+            super().__init__()
+            self.daily_responded_today = {}
+
+        def has_responded_today(self, user_id, today):
+            if self.daily_responded_today.get(user_id) == today:
+                return True
+            if self.storage.response_sent(user_id, today):
+                self.daily_responded_today[user_id] = today
+                return True
+            return False
+
+        def handle_daily_message(self, event, subscription):
+            user_id = subscription.user_id
+            today = self.today(user_id)
+            if self.has_responded_today(user_id, today):
+                return
+            digest = self.get_today_digest(user_id)
+            if digest:
+                self.outbound.call('chat.postMessage', channel=subscription.channel_id,
+                                   thread_ts=event.get("ts"), text=digest.text)
+                self.storage.mark_responded(user_id, today)
+                self.daily_responded_today[user_id] = today
+
+    return LegacyBot
+
+
+def run(name, bot_class, tmpdir, args):
+    slack = FakeSlack(latency=args.latency, bot_names={'BDAILY': 'daily-bot'}).start()
+    path = os.path.join(tmpdir, f'{name}.subscriptions.json')
+    users = [f'U{i:05d}' for i in range(args.users)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'user_id': user, 'channel_id': 'C0001'} for user in users], f)
+    os.environ.update({
+        'WEBHOOK_MODE': 'false',
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_APP_TOKEN': 'xapp-bench',
+        'SLACK_API_URL': slack.url,
+        'SUBSCRIPTIONS_FILE': path,
+        'DB_PATH': os.path.join(tmpdir, f'{name}.db'),
+        'DAILY_BOT_NAME': 'daily-bot',
+        'SLACK_RATE_LIMITS': 'chat.postMessage=1000000',
+    })
+
+    # Dois bots no mesmo banco, como dois processos
+    bots = [bot_class(), bot_class()]
+    for user in users:
+        bots[0].save_message(user, 'C0001', bots[0].today(user), f'tarefa de {user}')
+
+    events = [{'type': 'message', 'bot_id': 'BDAILY', 'channel': 'C0001',
+               'ts': f'1700000000.{i:06d}'} for i in range(args.dailies)]
+    barrier = threading.Barrier(min(args.threads, len(events)))
+
+    def handle(index):
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        bots[index % 2].handle_message(events[index])
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(handle, range(len(events))))
+
+    replies = Counter(post['text'] for post in slack.posts if post.get('thread_ts'))
+    per_user = [replies[f'• tarefa de {user}'] for user in users]
+    for bot in bots:
+        bot.storage.close()
+    slack.stop()
+
+    duplicated = sum(1 for count in per_user if count > 1)
+    missing = sum(1 for count in per_user if count == 0)
+    print(f"{name:<10} respostas: {sum(per_user):>4}  usuários com resposta repetida: {duplicated:>3}  "
+          f"sem resposta: {missing}")
+    return duplicated, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--dailies', type=int, default=8, help='mensagens do bot da daily')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    from bot import DailyBot
+
+    print(f"{args.users} usuários, {args.dailies} mensagens da daily em {args.threads} threads, 2 bots")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        run('antes', legacy_bot_class(), tmpdir, args)
+        duplicated, missing = run('reserva', DailyBot, tmpdir, args)
+
+    if duplicated or missing:
+        print("FALHA: cada usuário deve receber exatamente uma resposta")
+        return 1
+    print("OK: exatamente uma resposta por usuário")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
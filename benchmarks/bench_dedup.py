@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tempestade de retries: cada evento é reenviado várias vezes pelo /events
+
+Simula o Slack reenviando (X-Slack-Retry-Num) N mensagens R vezes, de várias
+threads ao mesmo tempo, e depois um reinício do bot com o mesmo banco
+recebendo tudo de novo. Verifica que cada mensagem foi armazenada e
+confirmada no DM uma única vez e mede o custo da deduplicação na entrada.
+Sai com código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_dedup.py [--messages 200] [--retries 4] [--threads 8]
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+SECRET = 'bench-secret'
+
+
+def signed_request(payload, retry_num):
+    body = json.dumps(payload).encode('utf-8')
+    timestamp = str(int(time.time()))
+    signature = 'v0=' + hmac.new(
+        SECRET.encode('utf-8'), f'v0:{timestamp}:'.encode('utf-8') + body, hashlib.sha256
+    ).hexdigest()
+    headers = {'X-Slack-Request-Timestamp': timestamp, 'X-Slack-Signature': signature}
+    if retry_num:
+        headers['X-Slack-Retry-Num'] = str(retry_num)
+        headers['X-Slack-Retry-Reason'] = 'http_timeout'
+    return body, headers
+
+
+def storm(bot, deliveries, threads):
+    """Entregar todas as requisições em paralelo; retorna os status HTTP"""
+    client = bot.app.test_client()
+
+    def post(delivery):
+        payload, retry_num = delivery
+        body, headers = signed_request(payload, retry_num)
+        return client.post('/events', data=body, headers=headers).status_code
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(post, deliveries))
+
+
+def stored_count(bot):
+    with bot.storage.pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM daily_messages").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--retries', type=int, default=4, help='entregas de cada evento')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    slack = FakeSlack(latency=0.002).start()
+
+    payloads = [
+        {
+            'event_id': f'Ev{i:06d}',
+            'event': {'type': 'message', 'user': 'U0001', 'channel': 'C0001',
+                      'text': f'mensagem {i}', 'ts': f'1700000000.{i:06d}'},
+        }
+        for i in range(args.messages)
+    ]
+    deliveries = [(payload, retry) for payload in payloads for retry in range(args.retries)]
+    random.shuffle(deliveries)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update({
+            'WEBHOOK_MODE': 'true',
+            'SLACK_BOT_TOKEN': 'xoxb-bench',
+            'SLACK_SIGNING_SECRET': SECRET,
+            'SLACK_API_URL': slack.url,
+            'USER_ID': 'U0001',
+            'SLACK_CHANNEL_ID': 'C0001',
+            'DB_PATH': os.path.join(tmpdir, 'dedup.db'),
+            'EVENT_WORKERS': '4',
+            'EVENT_QUEUE_SIZE': str(len(deliveries)),
+            # Uma confirmação nova por mensagem, sem o limite de taxa do Slack real
+            'DM_CONFIRMATION_DEBOUNCE': '0',
+            'SLACK_RATE_LIMITS': 'chat.postMessage=1000000',
+            'DM_CONFIRMATION_UPDATE': 'false',
+        })
+        from bot import DailyBot
+
+        # 1) Tempestade de retries com o bot no ar
+        bot = DailyBot()
+        bot.dispatcher.start()
+        start = time.perf_counter()
+        statuses = storm(bot, deliveries, args.threads)
+        bot.dispatcher.stop(timeout=120)
+        elapsed = time.perf_counter() - start
+
+        if set(statuses) != {200}:
+            failures.append(f"status inesperados: {sorted(set(statuses))}")
+        if stored_count(bot) != args.messages:
+            failures.append(f"armazenadas {stored_count(bot)} de {args.messages} mensagens")
+        dms = slack.calls['chat.postMessage']
+        if dms != args.messages:
+            failures.append(f"{dms} DMs de confirmação para {args.messages} mensagens")
+        print(f"tempestade: {len(deliveries)} entregas em {elapsed:.2f}s, "
+              f"armazenadas: {stored_count(bot)}, DMs: {dms}")
+        print(f"dedup: {bot.dedup.stats()}")
+        bot.storage.close()
+
+        # 2) Reinício: memória vazia, o banco rejeita as reentregas
+        bot = DailyBot()
+        bot.dispatcher.start()
+        storm(bot, deliveries, args.threads)
+        bot.dispatcher.stop(timeout=120)
+        if stored_count(bot) != args.messages:
+            failures.append(f"após reinício: {stored_count(bot)} mensagens armazenadas")
+        if slack.calls['chat.postMessage'] != dms:
+            failures.append("após reinício: DMs reenviados")
+        print(f"reinício: armazenadas: {stored_count(bot)}, DMs: {slack.calls['chat.postMessage']}")
+
+        # 3) Custo por evento na entrada (conjunto em memória) e no worker (banco)
+        keys = [f'C0001:{i}.000000' for i in range(20000)]
+        start = time.perf_counter()
+        for key in keys:
+            bot.dedup.check_in(key)
+        check_in_us = (time.perf_counter() - start) / len(keys) * 1e6
+        start = time.perf_counter()
+        for key in keys[:2000]:
+            bot.dedup.claim(key)
+        claim_us = (time.perf_counter() - start) / 2000 * 1e6
+        print(f"custo: check_in {check_in_us:.2f} us/evento, claim no banco {claim_us:.1f} us/evento")
+        bot.storage.close()
+
+    slack.stop()
+    if failures:
+        for failure in failures:
+            print(f"FALHA: {failure}")
+        return 1
+    print("OK: nenhuma mensagem duplicada")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: custo por mensagem para manter o digest do dia
+
+"releitura" reproduz o caminho antigo (gravar, reler o dia inteiro do banco e
+remontar o texto com +=); "digest" grava e atualiza o DigestCache. Cada
+mensagem é seguida de uma leitura do texto, como no DM de confirmação.
+
+Verifica também que uma gravação cujo commit termina depois do timeout da
+espera (banco travado por outra conexão) ainda aparece no digest em cache,
+e que no modo compartilhado uma leitura lenta do banco para um usuário não
+atrasa o digest dos outros.
+Sai com código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_digest.py [--sizes 10,100,1000]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage, ConnectionPool, pragmas_from_env
+from digest import DigestCache
+from writer import GroupCommitWriter
+
+USER = 'U0001'
+CHANNEL = 'C0001'
+
+
+def legacy_response(messages):
+    response = ""
+    for i, message in enumerate(messages, 1):
+        response += f"• {message}\n"
+    return response.rstrip('\n')
+
+
+def run_reread(storage, date, count):
+    start = time.perf_counter()
+    for i in range(count):
+        storage.insert_message(USER, CHANNEL, date, f"mensagem {i} com algum texto descritivo")
+        legacy_response(storage.get_messages(USER, date))
+    return time.perf_counter() - start
+
+
+def run_digest(storage, date, count):
+    digests = DigestCache(storage)
+    start = time.perf_counter()
+    for i in range(count):
+        message = f"mensagem {i} com algum texto descritivo"
+        digests.append(USER, date, storage.insert_message(USER, CHANNEL, date, message), message)
+        digests.get(USER, date).text
+    return time.perf_counter() - start
+
+
+def check_late_commit(storage, path, failures):
+    """Espera do commit estoura o timeout, mas a linha é gravada depois: o digest não pode perdê-la"""
+    date = 'late'
+    digests = DigestCache(storage)
+    writer = GroupCommitWriter(storage, timeout=0.1)
+    digests.append(USER, date, storage.insert_message(USER, CHANNEL, date, 'antes'), 'antes')
+
+    # Conexões do pool abertas antes (os PRAGMAs de uma conexão nova não esperam o lock)
+    connections = [storage.pool.acquire() for _ in range(storage.pool.size)]
+    for conn in connections:
+        storage.pool.release(conn)
+
+    # Outra conexão segura o lock de escrita: o lote do escritor espera o busy_timeout
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    future = writer.submit(USER, CHANNEL, date, 'atrasada')
+    try:
+        # Mesmo caminho do DailyBot.save_message
+        message_id = future.result(timeout=writer.timeout)
+        digests.append(USER, date, message_id, 'atrasada')
+        failures.append("a gravação não esperou o lock de escrita")
+    except TimeoutError:
+        digests.append_when_done(USER, date, 'atrasada', future)
+    # Leitura enquanto o commit não aconteceu (recarrega o digest sem a linha)
+    digests.get(USER, date).text
+    blocker.execute("COMMIT")
+    blocker.close()
+    future.result(timeout=10)
+    writer.stop()
+
+    if digests.get(USER, date).messages != ['antes', 'atrasada']:
+        failures.append(f"commit depois do timeout fora do digest: {digests.get(USER, date).messages}")
+
+
+class SlowStorage:
+    """Storage cujas leituras do digest de um usuário demoram (consulta lenta no banco)"""
+
+    def __init__(self, storage, slow_user, delay):
+        self.storage = storage
+        self.slow_user = slow_user
+        self.delay = delay
+        self.backend = storage.backend
+
+    def get_messages_after(self, user_id, date, after_id=0):
+        if user_id == self.slow_user:
+            time.sleep(self.delay)
+        return self.storage.get_messages_after(user_id, date, after_id)
+
+
+def check_concurrent_reads(storage, failures, delay=0.3):
+    """Modo compartilhado: a leitura lenta de um usuário não segura o digest dos outros"""
+    date = 'shared'
+    for user_id in ('ULENTO', USER):
+        storage.insert_message(user_id, CHANNEL, date, f'mensagem de {user_id}')
+    digests = DigestCache(SlowStorage(storage, 'ULENTO', delay), shared=True)
+    digests.get(USER, date)
+
+    slow = threading.Thread(target=digests.get, args=('ULENTO', date))
+    slow.start()
+    time.sleep(delay / 10)
+    start = time.perf_counter()
+    digest = digests.get(USER, date)
+    elapsed = time.perf_counter() - start
+    slow.join()
+
+    if elapsed > delay / 2:
+        failures.append(f"leitura de {USER} esperou a consulta lenta de outro usuário ({elapsed * 1000:.0f} ms)")
+    if digest.messages != [f'mensagem de {USER}'] or digests.get('ULENTO', date).messages != ['mensagem de ULENTO']:
+        failures.append("digest compartilhado com mensagens erradas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10,100,1000', help='mensagens por dia')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'digest.db')
+        storage = Storage(ConnectionPool(path, pragmas=pragmas_from_env()))
+        storage.init_schema()
+
+        print(f"{'mensagens/dia':>14}{'releitura us/msg':>18}{'digest us/msg':>16}{'speedup':>10}")
+        for n, size in enumerate(int(s) for s in args.sizes.split(',')):
+            reread = run_reread(storage, f"r{n}", size) / size * 1e6
+            digest = run_digest(storage, f"d{n}", size) / size * 1e6
+            print(f"{size:>14}{reread:>18.1f}{digest:>16.1f}{reread / digest:>9.1f}x")
+
+        check_late_commit(storage, path, failures)
+        check_concurrent_reads(storage, failures)
+        storage.close()
+
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
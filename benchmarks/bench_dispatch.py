@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tempo até o ack no /events com processamento inline vs workers
+
+Usa o Slack falso com latência injetada em cada chamada da API.
+
+Uso: python benchmarks/bench_dispatch.py [--events 200] [--latency 0.05]
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+SECRET = 'bench-secret'
+
+
+def signed_request(payload):
+    body = json.dumps(payload).encode('utf-8')
+    timestamp = str(int(time.time()))
+    signature = 'v0=' + hmac.new(
+        SECRET.encode('utf-8'), b'v0:' + timestamp.encode('utf-8') + b':' + body, hashlib.sha256
+    ).hexdigest()
+    headers = {
+        'X-Slack-Request-Timestamp': timestamp,
+        'X-Slack-Signature': signature,
+        'Content-Type': 'application/json',
+    }
+    return body, headers
+
+
+def run(workers, events, slack, tmpdir):
+    os.environ.update({
+        'WEBHOOK_MODE': 'true',
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_SIGNING_SECRET': SECRET,
+        'SLACK_CHANNEL_ID': 'C0001',
+        'USER_ID': 'U0001',
+        'SLACK_API_URL': slack.url,
+        'DB_PATH': os.path.join(tmpdir, f'dispatch_{workers}.db'),
+        'EVENT_WORKERS': str(workers),
+        # Uma confirmação nova por mensagem, sem o limite de taxa do Slack real
+        'DM_CONFIRMATION_DEBOUNCE': '0',
+        'SLACK_RATE_LIMITS': 'chat.postMessage=1000000',
+        'DM_CONFIRMATION_UPDATE': 'false',
+    })
+    from bot import DailyBot
+
+    bot = DailyBot()
+    bot.dispatcher.start()
+    client = bot.app.test_client()
+
+    acks = []
+    start = time.perf_counter()
+    for i in range(events):
+        body, headers = signed_request({
+            'event_id': f'Ev{i}',
+            'event': {'type': 'message', 'user': 'U0001', 'channel': 'C0001',
+                      'text': f'mensagem {i}', 'ts': f'{i}.0'},
+        })
+        sent = time.perf_counter()
+        client.post('/events', data=body, headers=headers)
+        acks.append((time.perf_counter() - sent) * 1000)
+    bot.dispatcher.stop(timeout=300)
+    total = time.perf_counter() - start
+    bot.storage.close()
+
+    acks.sort()
+    return {
+        'ack_p50_ms': statistics.median(acks),
+        'ack_p99_ms': acks[int(len(acks) * 0.99) - 1],
+        'events_per_s': events / total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='latência da API falsa (s)')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    slack = FakeSlack(latency=args.latency).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            print(f"{'modo':<12}{'ack p50 ms':>12}{'ack p99 ms':>12}{'eventos/s':>12}")
+            for label, workers in (('inline', 0), ('workers', args.workers)):
+                result = run(workers, args.events, slack, tmpdir)
+                print(f"{label:<12}{result['ack_p50_ms']:>12.2f}"
+                      f"{result['ack_p99_ms']:>12.2f}{result['events_per_s']:>12.1f}")
+    finally:
+        slack.stop()
+
+
+if __name__ == "__main__":
+    main()
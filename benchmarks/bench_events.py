@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: requisições por segundo no /events sob uma enxurrada de requisições inválidas
+
+Compara o pipeline anterior (JSON lido antes de validar, corpo decodificado e
+recodificado para o HMAC) com o atual (timestamp primeiro, HMAC direto sobre
+os bytes, JSON por último, com orjson se instalado) para cada tipo de
+requisição: timestamp velho (replay), assinatura inválida, corpo que não é
+JSON e eventos válidos. As rotas rodam no mesmo app Flask, via test client.
+
+Uso: python benchmarks/bench_events.py [--requests 3000] [--size 20000]
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET = 'bench-secret'
+
+
+def sign(body, timestamp):
+    return 'v0=' + hmac.new(
+        SECRET.encode('utf-8'), f'v0:{timestamp}:'.encode('utf-8') + body, hashlib.sha256
+    ).hexdigest()
+
+
+def add_legacy_route(bot):
+    """/events-legacy: o handler anterior (JSON antes da assinatura, decode/encode no HMAC)"""
+    import metrics
+    from flask import request, jsonify
+
+    def legacy_verify(request_body, timestamp, signature):
+        sig_basestring = f'v0:{timestamp}:{request_body.decode("utf-8")}'
+        my_signature = 'v0=' + hmac.new(
+            SECRET.encode('utf-8'), sig_basestring.encode('utf-8'), hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(my_signature, signature)
+
+    def events_legacy():
+        start = time.perf_counter()
+        result = 'error'
+        try:
+            raw_body = request.get_data()
+            timestamp = request.headers.get('X-Slack-Request-Timestamp')
+            signature = request.headers.get('X-Slack-Signature')
+            try:
+                event_data = json.loads(raw_body)
+            except json.JSONDecodeError:
+                result = 'invalid'
+                return jsonify({'error': 'Invalid JSON'}), 400
+            if 'challenge' in event_data:
+                result = 'challenge'
+                return jsonify({'challenge': event_data['challenge']})
+            if not legacy_verify(raw_body, timestamp, signature):
+                result = 'invalid'
+                return jsonify({'error': 'Invalid signature'}), 401
+            result = 'ignored'
+            event = event_data.get('event') or {}
+            if event.get('type') == 'message':
+                result = 'accepted' if bot.dispatch_event(event, event_data.get('event_id')) else 'rejected'
+            return jsonify({'status': 'ok'})
+        finally:
+            metrics.EVENTS_RECEIVED.labels('webhook', result).inc()
+            metrics.EVENT_ACK_SECONDS.labels('webhook').observe(time.perf_counter() - start)
+
+    bot.app.add_url_rule('/events-legacy', 'events_legacy', events_legacy, methods=['POST'])
+
+
+def requests_by_kind(size):
+    """Corpo e headers de cada tipo de requisição"""
+    now = str(int(time.time()))
+    stale = str(int(time.time()) - 3600)
+    payload = {
+        'event_id': 'Ev0001',
+        # Evento de outro tipo: validado e parseado, mas não vai para a fila
+        'event': {'type': 'reaction_added', 'user': 'U0001', 'padding': 'x' * size},
+    }
+    body = json.dumps(payload).encode('utf-8')
+    junk = b'\x00not json ' * (size // 10)
+    return {
+        'timestamp velho': (body, {'X-Slack-Request-Timestamp': stale,
+                                   'X-Slack-Signature': sign(body, stale)}),
+        'assinatura inválida': (body, {'X-Slack-Request-Timestamp': now,
+                                       'X-Slack-Signature': 'v0=' + '0' * 64}),
+        'corpo não JSON': (junk, {'X-Slack-Request-Timestamp': now,
+                                  'X-Slack-Signature': 'v0=' + '0' * 64}),
+        'válida': (body, {'X-Slack-Request-Timestamp': now, 'X-Slack-Signature': sign(body, now)}),
+    }
+
+
+def flood(client, path, body, headers, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.post(path, data=body, headers=headers)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--size', type=int, default=20000, help='bytes de padding no corpo')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update({
+            'WEBHOOK_MODE': 'true',
+            'SLACK_BOT_TOKEN': 'xoxb-bench',
+            'SLACK_SIGNING_SECRET': SECRET,
+            'USER_ID': 'U0001',
+            'SLACK_CHANNEL_ID': 'C0001',
+            'DB_PATH': os.path.join(tmpdir, 'events.db'),
+        })
+        from bot import DailyBot
+        from signing import JSON_BACKEND
+
+        bot = DailyBot()
+        add_legacy_route(bot)
+        client = bot.app.test_client()
+
+        print(f"{args.requests} requisições por tipo, corpo de ~{args.size} bytes, JSON: {JSON_BACKEND}")
+        print(f"{'requisição':<22}{'antes req/s':>12}{'atual req/s':>13}{'ganho':>8}")
+        for kind, (body, headers) in requests_by_kind(args.size).items():
+            before = flood(client, '/events-legacy', body, headers, args.requests)
+            after = flood(client, '/events', body, headers, args.requests)
+            print(f"{kind:<22}{before:>12.0f}{after:>13.0f}{after / before:>7.2f}x")
+
+        # Custo só da validação, sem o overhead do Flask
+        body, headers = requests_by_kind(args.size)['válida']
+        timestamp, signature = headers['X-Slack-Request-Timestamp'], headers['X-Slack-Signature']
+        count = args.requests * 10
+        start = time.perf_counter()
+        for _ in range(count):
+            json.loads(body)
+            hmac.compare_digest('v0=' + hmac.new(
+                SECRET.encode('utf-8'),
+                f'v0:{timestamp}:{body.decode("utf-8")}'.encode('utf-8'), hashlib.sha256
+            ).hexdigest(), signature)
+        before_us = (time.perf_counter() - start) / count * 1e6
+        from signing import json_loads
+        start = time.perf_counter()
+        for _ in range(count):
+            bot.verifier.fresh(timestamp)
+            bot.verifier.verify(body, timestamp, signature)
+            json_loads(body)
+        after_us = (time.perf_counter() - start) / count * 1e6
+        print(f"validação + parsing de uma requisição válida: {before_us:.1f} us -> {after_us:.1f} us")
+        bot.storage.close()
+
+
+if __name__ == "__main__":
+    main()
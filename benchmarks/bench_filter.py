@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: eventos/s num workspace barulhento, com e sem o filtro de eventos
+
+Gera um trace em que só uma fração pequena interessa ao bot (mensagens dos
+assinantes no canal da daily ou em DM e os posts do bot da daily). O resto
+é conversa de outros usuários, edições, entradas em canais, respostas em
+threads, outros bots e eventos que não são mensagens. Cada variante recebe o
+trace pelo caminho do Socket Mode (process_events) ou do /events (cliente de
+teste do Flask) até a fila drenar:
+
+- sem filtro: como antes, todo evento "message" passa pela deduplicação, pela
+  fila e pelo handler;
+- com filtro: EventFilter descarta o ruído logo após o parsing.
+
+Mostra eventos/s, eventos enfileirados, chamadas à API, descartes por motivo
+e as mensagens armazenadas. Sai com código 1 se, com o filtro, o bot não
+armazenar exatamente as mensagens relevantes do trace.
+
+Uso: python benchmarks/bench_filter.py [--events 100000] [--relevant 0.05] [--mode socket|webhook]
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+SECRET = 'bench-secret'
+DAILY_BOT = 'BDAILY'
+
+
+def noisy_trace(count, relevant, subscribers, daily_channels, seed=42):
+    """Eventos de um workspace grande; retorna (eventos, mensagens relevantes)"""
+    rng = random.Random(seed)
+    users = [f'U{n:05d}' for n in range(subscribers)]
+    channels = [f'C{n:04d}' for n in range(daily_channels)]
+    home = {user: channels[n % daily_channels] for n, user in enumerate(users)}
+    others = [f'U9{n:04d}' for n in range(2000)]
+    workspace = channels + [f'C9{n:03d}' for n in range(200)]
+    bots = [f'B{n:03d}' for n in range(20)]
+    # Ruído: (peso, gerador)
+    noise = [
+        (55, lambda ts: {'user': rng.choice(others), 'channel': rng.choice(workspace)}),
+        (10, lambda ts: {'user': rng.choice(users), 'channel': rng.choice(workspace[daily_channels:])}),
+        (10, lambda ts: {'subtype': 'message_changed', 'channel': rng.choice(workspace), 'hidden': True,
+                         'message': {'user': rng.choice(users + others), 'text': 'editada'}}),
+        (5, lambda ts: {'subtype': 'channel_join', 'user': rng.choice(users + others),
+                        'channel': rng.choice(workspace), 'text': 'entrou no canal'}),
+        (10, lambda ts: {'user': rng.choice(users + others), 'channel': rng.choice(workspace),
+                         'thread_ts': f'{float(ts) - 100:.6f}'}),
+        (6, lambda ts: {'subtype': 'bot_message', 'bot_id': rng.choice(bots),
+                        'channel': rng.choice(workspace[daily_channels:])}),
+        (4, lambda ts: {'type': 'reaction_added', 'user': rng.choice(others), 'reaction': 'tada'}),
+    ]
+    weights = [weight for weight, _ in noise]
+
+    events, expected = [], 0
+    for n in range(count):
+        ts = f'{1700000000 + n}.{n % 1000000:06d}'
+        if rng.random() < relevant:
+            user = rng.choice(users)
+            channel = home[user] if rng.random() < 0.8 else f'D{user[1:]}'
+            event = {'type': 'message', 'user': user, 'channel': channel}
+            expected += 1
+        else:
+            event = dict({'type': 'message'}, **rng.choices(noise, weights)[0][1](ts))
+        event.setdefault('text', f'mensagem {n}')
+        event['ts'] = ts
+        events.append(event)
+    # Um post do bot da daily por canal, no fim (responde com o digest de cada assinante)
+    for n, channel in enumerate(channels):
+        events.append({'type': 'message', 'subtype': 'bot_message', 'bot_id': DAILY_BOT, 'channel': channel,
+                       'text': 'Hora da daily!', 'ts': f'{1800000000 + n}.000000'})
+    return events, expected, [{'user_id': user, 'channel_id': home[user]} for user in users]
+
+
+class PassThrough:
+    """Comportamento anterior: todo evento "message" segue para a fila"""
+
+    def accept(self, event):
+        return event.get('type') == 'message'
+
+    def stats(self):
+        return {}
+
+
+def signed(payload):
+    body = json.dumps(payload).encode('utf-8')
+    timestamp = str(int(time.time()))
+    signature = 'v0=' + hmac.new(SECRET.encode('utf-8'), f'v0:{timestamp}:'.encode('utf-8') + body,
+                                 hashlib.sha256).hexdigest()
+    return body, {'Content-Type': 'application/json', 'X-Slack-Request-Timestamp': timestamp,
+                  'X-Slack-Signature': signature}
+
+
+def handler_seconds():
+    """Tempo total gasto pelos workers no handler (histograma do dispatcher)"""
+    import metrics
+
+    return sum(child.snapshot()[2] for _, child in metrics.EVENT_HANDLE_SECONDS._items())
+
+
+def run(variant, events, subscriptions, slack, mode, tmpdir):
+    path = os.path.join(tmpdir, f'{variant}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(subscriptions, f)
+    os.environ.update({
+        'WEBHOOK_MODE': str(mode == 'webhook').lower(),
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_APP_TOKEN': 'xapp-bench',
+        'SLACK_SIGNING_SECRET': SECRET,
+        'SLACK_API_URL': slack.url,
+        'SUBSCRIPTIONS_FILE': path,
+        'DB_PATH': os.path.join(tmpdir, f'{variant}.db'),
+        'DAILY_BOT_NAME': 'daily-bot',
+        'EVENT_QUEUE_SIZE': '1000000',
+        'SLACK_RATE_LIMITS': 'chat.postMessage=1000000,chat.update=1000000,bots.info=1000000',
+    })
+    for name in ('USER_ID', 'SLACK_CHANNEL_ID'):
+        os.environ.pop(name, None)
+    from bot import DailyBot
+
+    bot = DailyBot()
+    if variant == 'sem filtro':
+        bot.event_filter = PassThrough()
+    calls = dict(slack.calls)
+    handled = handler_seconds()
+    bot.dispatcher.start()
+
+    if mode == 'webhook':
+        client = bot.app.test_client()
+        requests = [signed({'type': 'event_callback', 'event_id': f'Ev{n}', 'event': event})
+                    for n, event in enumerate(events)]
+        start = time.perf_counter()
+        for body, headers in requests:
+            client.post('/events', data=body, headers=headers)
+    else:
+        client = SimpleNamespace(send_socket_mode_response=lambda response: None)
+        requests = [SimpleNamespace(type='events_api', envelope_id=f'env-{n}', retry_attempt=0,
+                                    payload={'type': 'event_callback', 'event_id': f'Ev{n}', 'event': event})
+                    for n, event in enumerate(events)]
+        start = time.perf_counter()
+        for req in requests:
+            bot.process_events(client, req)
+    ingest = time.perf_counter() - start
+    bot.dispatcher.stop(timeout=600)
+    total = time.perf_counter() - start
+    bot.outbound.stop()
+
+    with bot.storage.pool.connection() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM daily_messages").fetchone()[0]
+    result = {
+        'ingest_rate': len(events) / ingest,
+        'rate': len(events) / total,
+        'queued': bot.dispatcher.stats()['submitted'],
+        'handler_s': handler_seconds() - handled,
+        'api': {method: count - calls.get(method, 0) for method, count in slack.calls.items()
+                if count - calls.get(method, 0)},
+        'dropped': bot.event_filter.stats().get('dropped', {}),
+        'stored': stored,
+    }
+    bot.storage.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--relevant', type=float, default=0.05, help='fração de mensagens relevantes')
+    parser.add_argument('--subscribers', type=int, default=50)
+    parser.add_argument('--channels', type=int, default=5, help='canais com daily')
+    parser.add_argument('--mode', choices=('socket', 'webhook'), default='socket')
+    parser.add_argument('--latency', type=float, default=0.005, help='latência da API falsa (s)')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    events, expected, subscriptions = noisy_trace(args.events, args.relevant, args.subscribers, args.channels)
+    bot_names = {f'B{n:03d}': f'outro-bot-{n}' for n in range(20)}
+    bot_names[DAILY_BOT] = 'daily-bot'
+    slack = FakeSlack(latency=args.latency, bot_names=bot_names).start()
+    print(f"{len(events)} eventos ({args.mode}), {expected} mensagens relevantes "
+          f"({args.relevant:.0%}) de {args.subscribers} assinantes em {args.channels} canais")
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for variant in ('sem filtro', 'com filtro'):
+                result = results[variant] = run(variant, events, subscriptions, slack, args.mode, tmpdir)
+                print(f"\n{variant}: {result['rate']:>9.0f} eventos/s até drenar a fila "
+                      f"(ingestão {result['ingest_rate']:.0f}/s)")
+                print(f"  enfileirados: {result['queued']}  tempo nos workers: {result['handler_s']:.2f}s  "
+                      f"armazenadas: {result['stored']}")
+                print(f"  API do Slack: {result['api']}")
+                if result['dropped']:
+                    print(f"  descartados: {result['dropped']}")
+    finally:
+        slack.stop()
+
+    speedup = results['com filtro']['rate'] / results['sem filtro']['rate']
+    print(f"\nfiltro: {speedup:.1f}x eventos/s")
+    if results['com filtro']['stored'] != expected:
+        print(f"FALHA: {results['com filtro']['stored']} mensagens armazenadas, esperado {expected}")
+        return 1
+    print("OK: exatamente as mensagens relevantes armazenadas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: gravação de mensagens em rajada, commit por mensagem vs agrupado
+
+Simula o pico das 9h: P processos (como os workers do gunicorn) com T
+threads cada gravam M mensagens o mais rápido possível. Compara:
+
+- direto: Storage.insert_message, uma transação (e um commit) por mensagem;
+- agrupado: GroupCommitWriter, uma thread escritora por processo gravando
+  lotes numa transação só.
+
+Para cada SQLITE_SYNCHRONOUS (NORMAL e FULL, que faz fsync em cada commit)
+mostra inserts/s sustentados, latência p50/p99/máx de cada gravação (até o
+commit), erros ("database is locked") e o tamanho médio dos lotes. Sai com
+código 1 se alguma mensagem confirmada não estiver no banco.
+
+Uso: python benchmarks/bench_group_commit.py [--processes 2] [--threads 16] [--messages 500]
+        [--synchronous NORMAL,FULL]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def writer_process(variant, threads, messages, start, results):
+    """Um processo do bot: T threads gravando M mensagens cada"""
+    logging.disable(logging.CRITICAL)
+    from storage import Storage
+    from writer import GroupCommitWriter
+
+    storage = Storage.from_env()
+    writer = GroupCommitWriter.from_env(storage)
+    insert = writer.insert_message if variant == 'agrupado' else storage.insert_message
+    pid = os.getpid()
+    latencies = [[] for _ in range(threads)]
+    errors = [0] * threads
+
+    def run(index):
+        user = f'U{pid % 100000:05d}{index:02d}'
+        for n in range(messages):
+            begin = time.perf_counter()
+            try:
+                insert(user, 'C0001', '2024-01-01', f'atualização {n} de {user}')
+            except (sqlite3.OperationalError, TimeoutError):
+                errors[index] += 1
+                continue
+            latencies[index].append(time.perf_counter() - begin)
+
+    workers = [threading.Thread(target=run, args=(index,)) for index in range(threads)]
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    stats = writer.stats()
+    writer.stop()
+    storage.close()
+    results.put({
+        'latencies': [value for values in latencies for value in values],
+        'errors': sum(errors),
+        'elapsed': elapsed,
+        'batches': stats['batches'],
+        'rows': stats['rows'],
+    })
+
+
+def run(variant, synchronous, args, tmpdir):
+    path = os.path.join(tmpdir, f'{variant}-{synchronous}.db')
+    os.environ.update({'DB_PATH': path, 'SQLITE_SYNCHRONOUS': synchronous})
+    from storage import Storage
+
+    storage = Storage.from_env()
+    storage.init_schema()
+    storage.close()
+
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=writer_process, args=(variant, args.threads, args.messages, start, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)  # processos prontos antes da largada
+    start.set()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = [value for report in reports for value in report['latencies']]
+    elapsed = max(report['elapsed'] for report in reports)
+    batches = sum(report['batches'] for report in reports)
+    with sqlite3.connect(path) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM daily_messages").fetchone()[0]
+    return {
+        'rate': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.5) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'max': max(latencies) * 1000 if latencies else 0.0,
+        'errors': sum(report['errors'] for report in reports),
+        'batch': sum(report['rows'] for report in reports) / batches if batches else 1.0,
+        'confirmed': len(latencies),
+        'stored': stored,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16, help='threads gravando por processo')
+    parser.add_argument('--messages', type=int, default=500, help='mensagens por thread')
+    parser.add_argument('--synchronous', default='NORMAL,FULL')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    total = args.processes * args.threads * args.messages
+    print(f"{args.processes} processos x {args.threads} threads x {args.messages} mensagens = {total} gravações\n")
+    print(f"{'synchronous':<12}{'modo':<10}{'inserts/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'máx ms':>9}"
+          f"{'erros':>7}{'lote médio':>12}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for synchronous in args.synchronous.split(','):
+            for variant in ('direto', 'agrupado'):
+                result = run(variant, synchronous, args, tmpdir)
+                print(f"{synchronous:<12}{variant:<10}{result['rate']:>10.0f}{result['p50']:>9.2f}"
+                      f"{result['p99']:>9.2f}{result['max']:>9.1f}{result['errors']:>7}{result['batch']:>12.1f}")
+                if result['stored'] != result['confirmed']:
+                    print(f"FALHA: {result['confirmed']} gravações confirmadas, {result['stored']} no banco")
+                    failed = True
+    if failed:
+        return 1
+    print("\nOK: toda gravação confirmada está no banco")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: /history e /search com anos de histórico de centenas de usuários
+
+Popula U usuários x D dias x M mensagens e mede, pelo app Flask:
+- primeira página e uma página profunda do histórico (keyset) comparada ao
+  mesmo ponto via OFFSET;
+- busca textual (FTS5) por um termo comum e por um raro, comparada a LIKE.
+
+Verifica também que cursores adulterados (tipos errados no lugar da data,
+do timestamp ou do id) são recusados com 400 em vez de erro 500. Sai com
+código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_history.py [--users 200] [--days 730] [--messages 3]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ('deploy revisão reunião bug correção teste documentação refatoração '
+         'cliente migração pipeline monitoramento alerta banco cache fila').split()
+
+
+def populate(storage, users, days, messages):
+    rng = random.Random(42)
+    first = date.today() - timedelta(days=days)
+    with storage.pool.connection() as conn, conn:
+        for offset in range(days):
+            day = (first + timedelta(days=offset)).isoformat()
+            rows = []
+            for user in range(users):
+                for n in range(messages):
+                    text = ' '.join(rng.choice(WORDS) for _ in range(6))
+                    if rng.random() < 0.0005:
+                        text += ' kubernetes'
+                    rows.append((f'U{user:05d}', 'C0001', day, text, f'{day} 09:{n:02d}:00'))
+            conn.executemany(
+                "INSERT INTO daily_messages (user_id, channel_id, date, message, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+
+def timed_ms(func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def check_tampered_cursors(client, headers, user, failures):
+    """Cursores com a forma certa mas tipos errados: 400, nunca 500"""
+    from history import encode_cursor
+
+    history = ([1, '2024-01-01 09:00:00', 5], ['2024-01-01', None, 5], ['2024-01-01', '09:00', '5'],
+               ['2024-01-01', '09:00', True], ['2024-01-01', '09:00', 2 ** 64], {'a': 1}, 'x')
+    search = ('5', 5.5, True, -1, 2 ** 64, [5])
+    for path, cursors in (('/history', history), ('/search', search)):
+        for key in cursors:
+            response = client.get(path, headers=headers, query_string={
+                'user_id': user, 'q': 'deploy', 'cursor': encode_cursor(key)})
+            if response.status_code != 400:
+                failures.append(f"{path} com cursor {key!r}: status {response.status_code}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--messages', type=int, default=3)
+    parser.add_argument('--page', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update({
+            'WEBHOOK_MODE': 'true',
+            'SLACK_BOT_TOKEN': 'xoxb-bench',
+            'SLACK_SIGNING_SECRET': 'bench-secret',
+            'USER_ID': 'U00000',
+            'SLACK_CHANNEL_ID': 'C0001',
+            'DB_PATH': os.path.join(tmpdir, 'history.db'),
+            'HISTORY_API_TOKEN': 'bench-token',
+        })
+        from bot import DailyBot
+        from history import MIN_DATE, MAX_DATE, decode_cursor
+
+        bot = DailyBot()
+        total = args.users * args.days * args.messages
+        start = time.perf_counter()
+        populate(bot.storage, args.users, args.days, args.messages)
+        print(f"{total} mensagens ({args.users} usuários, {args.days} dias) "
+              f"inseridas em {time.perf_counter() - start:.1f}s")
+
+        client = bot.app.test_client()
+        headers = {'Authorization': 'Bearer bench-token'}
+        user = 'U00007'
+
+        def get(path, **params):
+            response = client.get(path, query_string=dict(params, user_id=user), headers=headers)
+            return response.get_json()
+
+        # Histórico: primeira página e página profunda (metade do histórico do
+        # usuário, no mínimo a segunda página)
+        first_ms, page = timed_ms(lambda: get('/history', limit=args.page))
+        depth = max(args.days * args.messages // 2, args.page)
+        cursor = None
+        for _ in range(depth // args.page):
+            cursor = get('/history', limit=args.page, cursor=cursor)['next_cursor']
+            if cursor is None:
+                break
+        if cursor is None:
+            # Histórico do usuário numa página só: nada além da primeira para medir
+            print(f"/history primeira página: {first_ms:.2f} ms (histórico cabe numa página)")
+        else:
+            deep_ms, _ = timed_ms(lambda: get('/history', limit=args.page, cursor=cursor))
+
+            def offset_page():
+                with bot.storage.pool.connection() as conn:
+                    return conn.execute(
+                        "SELECT id, date, timestamp, message FROM daily_messages WHERE user_id = ? "
+                        "ORDER BY date DESC, timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                        (user, args.page, depth)
+                    ).fetchall()
+            offset_ms, _ = timed_ms(offset_page)
+            after = decode_cursor(cursor)
+            keyset_ms, _ = timed_ms(lambda: bot.storage.history(user, MIN_DATE, MAX_DATE, after, args.page))
+            print(f"/history primeira página: {first_ms:.2f} ms, página no item {depth}: {deep_ms:.2f} ms")
+            print(f"só o banco, página no item {depth}: keyset {keyset_ms:.3f} ms, OFFSET {offset_ms:.3f} ms")
+
+        # Busca: termo comum, termo raro e o mesmo termo raro com LIKE
+        common_ms, common = timed_ms(lambda: get('/search', q='deploy cache', limit=args.page))
+        rare_ms, rare = timed_ms(lambda: get('/search', q='kubernetes', limit=args.page))
+
+        def like_search():
+            with bot.storage.pool.connection() as conn:
+                return conn.execute(
+                    "SELECT id FROM daily_messages WHERE user_id = ? AND message LIKE ? "
+                    "ORDER BY id DESC LIMIT ?", (user, '%kubernetes%', args.page)
+                ).fetchall()
+        like_ms, _ = timed_ms(like_search, repeat=5)
+        print(f"/search termo comum: {common_ms:.2f} ms ({len(common['items'])} itens), "
+              f"termo raro: {rare_ms:.2f} ms ({len(rare['items'])} itens), LIKE: {like_ms:.2f} ms")
+
+        failures = []
+        check_tampered_cursors(client, headers, user, failures)
+        bot.storage.close()
+
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: eleição de líder entre réplicas com jobs agendados
+
+N processos (como réplicas do bot) compartilham o banco, cada um com sua
+eleição e seu agendador, e um job de intervalo curto (um "horário" a cada
+--interval segundos). Com o cluster rodando, o líder é:
+
+1) morto com SIGKILL (queda): outro assume depois do TTL do lease;
+2) congelado com SIGSTOP por 2x o TTL (pausa longa, GC, rede): outro assume
+   e, ao voltar, o antigo não executa nada com o token velho;
+3) encerrado com SIGTERM: libera o lease e outro assume na renovação seguinte.
+
+Mostra o tempo de cada troca de líder e verifica que nenhum horário rodou
+duas vezes, que os tokens só aumentam, que cada troca terminou em até
+TTL + intervalo de renovação e que um compare-and-set com o token de um
+mandato anterior é recusado. Sai com código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_leader.py [--processes 3] [--ttl 1.0] [--renew 0.2] [--interval 0.25]
+        [--database-url postgresql://...]
+"""
+
+import os
+import sys
+import time
+import uuid
+import queue
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import open_storage
+from scheduler import Job, Scheduler
+from leader import LeaderElection
+
+
+class IntervalJob(Job):
+    """Job com um horário a cada `interval` segundos (alinhados ao epoch)"""
+
+    __slots__ = ('interval',)
+
+    def __init__(self, name, interval, func, grace=60.0):
+        super().__init__(name, None, func, grace=grace)
+        self.interval = interval
+
+    def next_after(self, after):
+        return (int(after / self.interval) + 1) * self.interval
+
+
+def replica(index, args, lease, job_name, events, runs):
+    """Um processo do bot: eleição + agendador com o job de intervalo"""
+    logging.disable(logging.CRITICAL)
+    storage = open_storage()
+    leader = LeaderElection(storage, name=lease, holder=f'réplica-{index}', ttl=args.ttl, renew=args.renew)
+    scheduler = Scheduler(storage, workers=2, leader=leader)
+    leader.add_listener(lambda is_leader: events.put((time.time(), index, is_leader, leader.stats()['token'])))
+    scheduler.add_job(IntervalJob(job_name, args.interval,
+                                  lambda run_at: runs.put((run_at.timestamp(), index, leader.stats()['token']))))
+
+    done = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: done.set())
+    leader.start()
+    scheduler.start()
+    done.wait()
+    scheduler.stop()
+    leader.stop()
+    storage.close()
+
+
+def wait_leader(events, leaders, exclude, timeout):
+    """Consumir eventos até um processo diferente de `exclude` virar líder; (instante, índice)"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            at, index, is_leader, _ = events.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            return None, None
+        leaders.append((at, index, is_leader))
+        if is_leader and index != exclude:
+            return at, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--ttl', type=float, default=1.0, help='validade do lease (s)')
+    parser.add_argument('--renew', type=float, default=0.2, help='intervalo de renovação (s)')
+    parser.add_argument('--interval', type=float, default=0.25, help='intervalo do job (s)')
+    parser.add_argument('--steady', type=float, default=1.5, help='tempo com líder estável entre as trocas (s)')
+    parser.add_argument('--database-url', help='PostgreSQL compartilhado (senão SQLite temporário)')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    failures = []
+    # Nomes únicos: rodadas no mesmo PostgreSQL não se misturam
+    run_id = uuid.uuid4().hex[:8]
+    lease, job_name = f'bench-{run_id}', f'tick-{run_id}'
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.database_url:
+            os.environ['DATABASE_URL'] = args.database_url
+        else:
+            os.environ.pop('DATABASE_URL', None)
+            os.environ['DB_PATH'] = os.path.join(tmpdir, 'leader.db')
+        storage = open_storage()
+        storage.init_schema()
+
+        context = multiprocessing.get_context('fork')
+        events, runs = context.Queue(), context.Queue()
+        processes = [context.Process(target=replica, args=(index, args, lease, job_name, events, runs))
+                     for index in range(args.processes)]
+        for process in processes:
+            process.start()
+
+        leaders = []
+        _, current = wait_leader(events, leaders, None, 10)
+        if current is None:
+            print("FALHA: nenhum processo virou líder")
+            for process in processes:
+                process.kill()
+            return 1
+        first_token = storage.get_lease(lease)[1]
+        print(f"{args.processes} réplicas, {storage.backend}, ttl {args.ttl}s, renovação {args.renew}s, "
+              f"job a cada {args.interval}s\n")
+        print(f"{'troca':<10}{'antigo':>8}{'novo':>8}{'failover ms':>13}{'limite ms':>11}")
+
+        limit = args.ttl + args.renew
+        for scenario, signum in (('SIGKILL', signal.SIGKILL), ('SIGSTOP', signal.SIGSTOP),
+                                 ('SIGTERM', signal.SIGTERM)):
+            time.sleep(args.steady)
+            old = current
+            began = time.time()
+            os.kill(processes[old].pid, signum)
+            at, current = wait_leader(events, leaders, old, limit * 5)
+            if current is None:
+                failures.append(f"{scenario}: nenhum outro processo assumiu")
+                break
+            elapsed = at - began
+            bound = limit if signum != signal.SIGTERM else args.renew
+            print(f"{scenario:<10}{old:>8}{current:>8}{elapsed * 1000:>13.0f}{(bound + 0.2) * 1000:>11.0f}")
+            if elapsed > bound + 0.2:
+                failures.append(f"{scenario}: failover em {elapsed:.2f}s (limite {bound + 0.2:.2f}s)")
+            if signum == signal.SIGSTOP:
+                # Congelado além do TTL: ao voltar, descobre que perdeu o lease
+                time.sleep(max(0.0, 2 * args.ttl - (time.time() - began)))
+                os.kill(processes[old].pid, signal.SIGCONT)
+
+        time.sleep(args.steady)
+        for index, process in enumerate(processes):
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        for process in processes:
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+
+        executions = []
+        while True:
+            try:
+                executions.append(runs.get(timeout=0.5))
+            except queue.Empty:
+                break
+        while True:
+            try:
+                at, index, is_leader, _ = events.get_nowait()
+                leaders.append((at, index, is_leader))
+            except queue.Empty:
+                break
+
+        # Com o token do primeiro mandato, o compare-and-set tem de falhar
+        next_run = storage.get_job_next_run(job_name)
+        stale = storage.claim_job_run(job_name, next_run, next_run + args.interval, time.time(),
+                                      (lease, first_token))
+        tokens = [token for _, _, token in sorted(executions) if token is not None]
+        storage.close()
+
+    repeated = [slot for slot, count in Counter(slot for slot, _, _ in executions).items() if count > 1]
+    print(f"\nexecuções: {len(executions)}, horários repetidos: {len(repeated)}, "
+          f"tokens: {sorted(set(tokens))}, trocas de liderança: {sum(1 for *_, up in leaders if up)}")
+    if repeated:
+        failures.append(f"{len(repeated)} horários executados mais de uma vez")
+    if tokens != sorted(tokens):
+        failures.append("execução com token de um mandato anterior depois de um mais novo")
+    if stale:
+        failures.append("compare-and-set com token antigo foi aceito")
+    if not executions:
+        failures.append("nenhum job executado")
+
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
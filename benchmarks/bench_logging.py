@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: CPU por evento gasto com logging, antes e depois do logging lazy
+
+"antes" reproduz os logs INFO que o caminho de um evento emitia (headers,
+json.dumps(indent=2) do payload, cada mensagem do dia...) com f-strings;
+"depois" executa o DailyBot.handle_message atual para o mesmo evento.
+Os registros vão para /dev/null, então só o custo de CPU é medido.
+
+Uso: python benchmarks/bench_logging.py [--events 20000] [--messages 10]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger('bench.legacy')
+
+HEADERS = {
+    'Host': 'abc123.ngrok.io', 'User-Agent': 'Slackbot 1.0 (+https://api.slack.com/robots)',
+    'Content-Type': 'application/json', 'X-Slack-Signature': 'v0=' + 'a' * 64,
+    'X-Slack-Request-Timestamp': '1700000000', 'Accept-Encoding': 'gzip,deflate',
+}
+
+
+def legacy_event_logging(event_data, messages):
+    """Os logs INFO emitidos por evento antes da mudança (sem o I/O)"""
+    event = event_data['event']
+    raw_body = json.dumps(event_data).encode('utf-8')
+    logger.info("Requisição recebida no /events")
+    logger.info(f"Headers: {dict(HEADERS)}")
+    logger.info(f"Body size: {len(raw_body)}, Timestamp: 1700000000")
+    logger.info(f"Body content: {raw_body.decode('utf-8')[:200]}...")
+    logger.info("Assinatura válida, processando evento")
+    logger.info(f"Evento completo: {json.dumps(event_data, indent=2)}")
+    logger.info(f"Tipo do evento: {event.get('type')}")
+    logger.info(f"Detalhes do evento: {event}")
+    logger.info(f"=== PROCESSANDO MENSAGEM ===")
+    logger.info(f"Evento completo: {event}")
+    logger.info(f"User: {event['user']}, Bot: None, Channel: {event['channel']}")
+    logger.info(f"Text: {event['text'][:100]}...")
+    logger.info("Usuário correto detectado!")
+    logger.info("Mensagem do canal configurado")
+    logger.info(f"=== ARMAZENANDO MENSAGEM ===")
+    logger.info(f"Mensagem recebida: '{event['text']}'")
+    logger.info(f"✅ Mensagem armazenada: {event['text'][:50]}...")
+    # send_dm_confirmation -> get_today_messages listava o dia inteiro
+    logger.info(f"=== BUSCANDO MENSAGENS DO DIA ===")
+    for i, msg in enumerate(messages, 1):
+        logger.info(f"  {i}. {msg}")
+    logger.info(f"Mensagens: {messages}")
+    content = "\n".join(f"• {m}" for m in messages)
+    logger.info(f"Conteúdo da daily: '{content}'")
+    logger.info(f"Mensagem de confirmação: 'Beleza!\n{content}'")
+
+
+def cpu_per_event(fn, events):
+    start = time.process_time()
+    for _ in range(events):
+        fn()
+    return (time.process_time() - start) / events * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--messages', type=int, default=10, help='mensagens já armazenadas no dia')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update({
+            'SLACK_BOT_TOKEN': 'xoxb-bench', 'SLACK_APP_TOKEN': 'xapp-bench',
+            'USER_ID': 'U0001', 'SLACK_CHANNEL_ID': 'C0001',
+            'DB_PATH': os.path.join(tmpdir, 'logging.db'),
+        })
+        from bot import DailyBot
+
+        bot = DailyBot()
+        devnull = open(os.devnull, 'w')
+        logging.getLogger().handlers[:] = [logging.StreamHandler(devnull)]
+
+        messages = [f"tarefa {i} com uma descrição razoavelmente longa" for i in range(args.messages)]
+        event = {'type': 'message', 'user': 'U0001', 'channel': 'C0001',
+                 'text': 'terminei a revisão do PR de storage', 'ts': '1700000000.000100'}
+        event_data = {'token': 'x', 'team_id': 'T1', 'event_id': 'Ev1', 'event': event}
+        # Evento barulhento: outro usuário, mesmo caminho de filtragem sem I/O
+        noisy = dict(event, user='U9999')
+
+        logging.getLogger().setLevel(logging.INFO)
+        before = cpu_per_event(lambda: legacy_event_logging(event_data, messages), args.events)
+        after = cpu_per_event(lambda: bot.handle_message(noisy), args.events)
+
+        logging.getLogger().setLevel(logging.DEBUG)
+        debug = cpu_per_event(lambda: bot.handle_message(noisy), args.events)
+
+        bot.storage.close()
+        devnull.close()
+
+    print(f"{'cenário':<36}{'CPU us/evento':>14}")
+    print(f"{'antes: logs INFO eager':<36}{before:>14.1f}")
+    print(f"{'depois: handle_message (INFO)':<36}{after:>14.1f}")
+    print(f"{'depois: handle_message (DEBUG)':<36}{debug:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de carga: um processo atendendo N usuários
+
+Gera um fluxo sintético de eventos (mensagens de N usuários espalhados em
+vários canais, seguidas pela daily em cada canal), reproduz pelo mesmo
+caminho do Socket Mode e mede vazão e chamadas à API do Slack falso.
+
+Uso: python benchmarks/bench_multitenant.py [--users 200] [--messages 5]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import itertools
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+DAILY_BOT_ID = 'BDAILY'
+
+
+def synthetic_events(users, messages, channels):
+    """Mensagens dos usuários intercaladas e depois a daily em cada canal"""
+    # ts único por mensagem, como no Slack (é a identidade usada na deduplicação)
+    seq = itertools.count(int(time.time()) * 1000)
+    for i in range(messages):
+        for user in range(users):
+            yield {
+                'type': 'message',
+                'user': f'U{user:05d}',
+                'channel': f'C{user % channels:04d}',
+                'text': f'tarefa {i} do usuário {user}',
+                'ts': f'{next(seq) / 1000:.6f}',
+            }
+    for channel in range(channels):
+        yield {
+            'type': 'message',
+            'bot_id': DAILY_BOT_ID,
+            'channel': f'C{channel:04d}',
+            'text': 'Bom dia! Como foi ontem?',
+            'ts': f'{next(seq) / 1000:.6f}',
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=5, help='mensagens por usuário')
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.005, help='latência da API falsa (s)')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    slack = FakeSlack(latency=args.latency, bot_names={DAILY_BOT_ID: 'daily-bot'}).start()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        subscriptions = os.path.join(tmpdir, 'subscriptions.json')
+        with open(subscriptions, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'user_id': f'U{user:05d}', 'channel_id': f'C{user % args.channels:04d}'}
+                for user in range(args.users)
+            ], f)
+
+        os.environ.update({
+            'WEBHOOK_MODE': 'false',
+            'SLACK_BOT_TOKEN': 'xoxb-bench',
+            'SLACK_APP_TOKEN': 'xapp-bench',
+            'SLACK_API_URL': slack.url,
+            'SUBSCRIPTIONS_FILE': subscriptions,
+            'DAILY_BOT_NAME': 'daily',
+            'DB_PATH': os.path.join(tmpdir, 'multitenant.db'),
+            'EVENT_WORKERS': str(args.workers),
+            'EVENT_QUEUE_SIZE': str(args.users * args.messages + args.channels),
+        })
+        os.environ.pop('USER_ID', None)
+        os.environ.pop('SLACK_CHANNEL_ID', None)
+        from bot import DailyBot
+
+        bot = DailyBot()
+        bot.dispatcher.start()
+
+        events = list(synthetic_events(args.users, args.messages, args.channels))
+        start = time.perf_counter()
+        for event in events:
+            bot.dispatch_event(event)
+        bot.dispatcher.stop(timeout=600)
+        bot.outbound.stop(timeout=600)
+        elapsed = time.perf_counter() - start
+
+        stats = bot.dispatcher.stats()
+        responded = sum(bot.has_responded_today(f'U{user:05d}', bot.today()) for user in range(args.users))
+        bot.storage.close()
+        slack.stop()
+
+    print(f"usuários: {args.users}, eventos: {len(events)}, workers: {args.workers}")
+    print(f"tempo total: {elapsed:.2f}s ({len(events) / elapsed:.0f} eventos/s)")
+    print(f"processados: {stats['processed']}, falhas: {stats['failed']}, "
+          f"pico da fila: {stats['max_depth']}")
+    print(f"respostas à daily: {responded}/{args.users}")
+    print(f"chamadas à API: {dict(slack.calls)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: chamadas ao Slack numa rajada de mensagens e com respostas 429
+
+1) Um usuário envia K mensagens seguidas: sem debounce cada uma gera um DM
+   com o digest inteiro; com debounce a rajada gera uma confirmação, e as
+   seguintes editam a mesma mensagem (chat.update).
+2) O Slack falso responde 429 (Retry-After) às primeiras chamadas: os envios
+   são refeitos depois da espera e nenhuma mensagem se perde.
+3) Envios lentos com várias threads de envio (e no cliente asyncio): dois
+   envios da mesma chave nunca rodam ao mesmo tempo e o pedido feito durante
+   um envio não se perde.
+   Sai com código 1 se a verificação falhar.
+
+Uso: python benchmarks/bench_outbound.py [--burst 5] [--debounce 0.5]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+
+def make_bot(tmpdir, name, slack, debounce):
+    os.environ.update({
+        'WEBHOOK_MODE': 'false',
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_APP_TOKEN': 'xapp-bench',
+        'SLACK_API_URL': slack.url,
+        'USER_ID': 'U0001',
+        'SLACK_CHANNEL_ID': 'C0001',
+        'DB_PATH': os.path.join(tmpdir, f'{name}.db'),
+        'EVENT_WORKERS': '0',
+        'DM_CONFIRMATION_DEBOUNCE': str(debounce),
+    })
+    from bot import DailyBot
+    return DailyBot()
+
+
+def burst(bot, count, offset=0):
+    for i in range(count):
+        bot.handle_message({'type': 'message', 'user': 'U0001', 'channel': 'C0001',
+                            'text': f'tarefa {offset + i}', 'ts': f'1700000000.{offset + i:06d}'})
+
+
+def check_serialized(failures, senders=4, keys=3, rounds=20):
+    """Pedidos da mesma chave durante um envio lento: um envio por vez e o último sempre enviado"""
+    from outbound import OutboundClient
+
+    outbound = OutboundClient(client=None, debounce=0.005, senders=senders)
+    lock = threading.Lock()
+    active, overlaps, requested, delivered = {}, [], {}, {}
+
+    def make_send(key):
+        def send():
+            with lock:
+                active[key] = active.get(key, 0) + 1
+                if active[key] > 1:
+                    overlaps.append(key)
+                seen = requested[key]
+            time.sleep(0.02)
+            with lock:
+                active[key] -= 1
+                delivered[key] = max(delivered.get(key, 0), seen)
+        return send
+
+    for n in range(1, rounds + 1):
+        for key in range(keys):
+            with lock:
+                requested[key] = n
+            outbound.debounce(key, make_send(key))
+        time.sleep(0.007)
+    outbound.stop()
+
+    if overlaps:
+        failures.append(f"{len(overlaps)} envios simultâneos da mesma chave")
+    if any(delivered.get(key) != rounds for key in range(keys)):
+        failures.append(f"último pedido não enviado: {delivered}")
+    print(f"{senders} threads de envio, {keys} chaves: {outbound.sent} envios, "
+          f"{outbound.coalesced} agrupados, {len(overlaps)} simultâneos")
+
+
+def check_serialized_async(failures, keys=3, rounds=20):
+    """O mesmo do check_serialized no AsyncOutboundClient (envios lentos no event loop)"""
+    from outbound import AsyncOutboundClient
+
+    async def run():
+        outbound = AsyncOutboundClient(client=None, debounce=0.005)
+        active, overlaps, requested, delivered = {}, [], {}, {}
+
+        def make_send(key):
+            async def send():
+                active[key] = active.get(key, 0) + 1
+                if active[key] > 1:
+                    overlaps.append(key)
+                seen = requested[key]
+                await asyncio.sleep(0.02)
+                active[key] -= 1
+                delivered[key] = max(delivered.get(key, 0), seen)
+            return send
+
+        for n in range(1, rounds + 1):
+            for key in range(keys):
+                requested[key] = n
+                await outbound.debounce(key, make_send(key))
+            await asyncio.sleep(0.007)
+        await outbound.stop()
+        return outbound, overlaps, delivered
+
+    outbound, overlaps, delivered = asyncio.run(run())
+    if overlaps:
+        failures.append(f"async: {len(overlaps)} envios simultâneos da mesma chave")
+    if any(delivered.get(key) != rounds for key in range(keys)):
+        failures.append(f"async: último pedido não enviado: {delivered}")
+    print(f"asyncio, {keys} chaves: {outbound.sent} envios, "
+          f"{outbound.coalesced} agrupados, {len(overlaps)} simultâneos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--burst', type=int, default=5, help='mensagens por rajada')
+    parser.add_argument('--bursts', type=int, default=3)
+    parser.add_argument('--debounce', type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f"{args.bursts} rajadas de {args.burst} mensagens")
+        for name, debounce, update in (('antes', 0, False), ('debounce', args.debounce, True)):
+            slack = FakeSlack(latency=0.01).start()
+            bot = make_bot(tmpdir, name, slack, debounce)
+            bot.dm_confirmation_update = update
+            start = time.perf_counter()
+            for n in range(args.bursts):
+                burst(bot, args.burst, offset=n * args.burst)
+                # Pausa entre rajadas maior que o debounce
+                time.sleep(args.debounce * 2)
+            bot.outbound.stop()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} postMessage: {slack.calls['chat.postMessage']:>3}  "
+                  f"update: {slack.calls['chat.update']:>3}  ({elapsed:.1f}s)")
+            bot.storage.close()
+            slack.stop()
+
+        # Rate limit: as 2 primeiras chamadas de chat.postMessage recebem 429
+        slack = FakeSlack(latency=0.01, rate_limited={'chat.postMessage': 2}, retry_after=1).start()
+        bot = make_bot(tmpdir, 'ratelimit', slack, 0)
+        start = time.perf_counter()
+        burst(bot, 1)
+        elapsed = time.perf_counter() - start
+        print(f"429 + Retry-After=1: {dict(slack.throttled)} respostas 429, "
+              f"{slack.calls['chat.postMessage']} enviada após {elapsed:.1f}s")
+        bot.storage.close()
+        slack.stop()
+
+        # Token bucket: chat.postMessage limitado a ~1/s por canal
+        slack = FakeSlack().start()
+        bot = make_bot(tmpdir, 'bucket', slack, 0)
+        bot.dm_confirmation_update = False
+        start = time.perf_counter()
+        burst(bot, 6)
+        print(f"6 DMs no mesmo canal com o limite de 1/s (rajada de 3): {time.perf_counter() - start:.1f}s")
+        bot.storage.close()
+        slack.stop()
+
+    failures = []
+    check_serialized(failures)
+    check_serialized_async(failures)
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: renderização do digest com templates e cache
+
+Para digests de N mensagens mede o custo por renderização:
+
+- montagem: cada template (padrão, com seções, com Block Kit), sem cache;
+- cache: a mesma renderização repetida (resposta, DM e lembrete do mesmo dia);
+- por mensagem: uma mensagem nova seguida da confirmação no DM, como no bot.
+
+Verifica também que o template padrão produz exatamente os textos de antes
+(resposta, confirmação e lembrete), que as partes respeitam os limites do
+Slack (caracteres por mensagem, blocos por mensagem e texto por bloco) sem
+perder itens, e que a confirmação do DM cabe numa mensagem só. Sai com
+código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_render.py [--sizes 10,100,1000] [--repeat 200]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from digest import Digest
+from render import DigestRenderer, MAX_BLOCKS, MAX_SECTION_TEXT
+from subscriptions import Subscription, SubscriptionRegistry
+
+DATE = '2024-01-01'
+
+STANDUP = {
+    'header': 'Daily de {date}',
+    'sections': [
+        {'title': 'Ontem', 'prefixes': ['ontem', 'yesterday']},
+        {'title': 'Hoje', 'prefixes': ['hoje', 'today']},
+        {'title': 'Impedimentos', 'prefixes': ['impedimentos', 'bloqueios']},
+    ],
+    'other': 'Outros',
+    'footer': '{count} mensagens',
+}
+
+
+def make_messages(count):
+    kinds = ('Ontem: revisei o PR {0} e corrigi os testes', 'Hoje - deploy do serviço {0}\n- monitorar',
+             'Impedimentos: aguardando acesso {0}', 'reunião {0} com o time')
+    return [kinds[n % len(kinds)].format(n) for n in range(count)]
+
+
+def make_digest(messages):
+    digest = Digest()
+    for message_id, message in enumerate(messages, 1):
+        digest.add(message_id, message)
+    return digest
+
+
+def make_renderer(**kwargs):
+    subscriptions = SubscriptionRegistry([
+        Subscription('UTEXT', 'C1', None, 'texto'),
+        Subscription('UBLOCKS', 'C1', None, 'blocos'),
+    ])
+    templates = {'texto': STANDUP, 'blocos': {**STANDUP, 'blocks': True}}
+    return DigestRenderer(templates, subscriptions=subscriptions, **kwargs)
+
+
+def per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def check_legacy(renderer, failures):
+    """Template padrão: os mesmos textos montados antes em cada lugar"""
+    messages = make_messages(7)
+    digest = make_digest(messages)
+    text = "\n".join(f"• {message}" for message in messages)
+    expected = {
+        'reply': text,
+        'confirmation': f"Beleza <@UPADRAO>!\n\nEssa será sua daily de hoje:\n{text}",
+        'reminder': "⚠️ **Lembrete:** Daily ainda não foi respondida hoje!\n\n" + text,
+    }
+    for kind, value in expected.items():
+        parts = renderer.render('UPADRAO', DATE, digest, kind)
+        if [part.message() for part in parts] != [{'text': value}]:
+            failures.append(f"template padrão mudou o texto de {kind}")
+
+
+def check_limits(renderer, failures):
+    """Digest enorme: partes dentro dos limites e todos os itens presentes"""
+    messages = [f"Hoje: tarefa {n} " + "x" * 80 for n in range(3000)] + ["y" * 9000]
+    digest = make_digest(messages)
+    for user_id in ('UPADRAO', 'UTEXT', 'UBLOCKS'):
+        parts = renderer.render(user_id, DATE, digest, 'reply')
+        if len(parts) < 2:
+            failures.append(f"{user_id}: digest enorme numa parte só")
+        if any(len(part.text) > renderer.max_chars for part in parts):
+            failures.append(f"{user_id}: parte com mais de {renderer.max_chars} caracteres")
+        if user_id == 'UBLOCKS':
+            texts = [block['text']['text'] for part in parts for block in part.blocks if block['type'] == 'section']
+            if any(len(part.blocks) > MAX_BLOCKS for part in parts):
+                failures.append(f"{user_id}: parte com mais de {MAX_BLOCKS} blocos")
+            if any(len(text) > MAX_SECTION_TEXT for text in texts):
+                failures.append(f"{user_id}: bloco com mais de {MAX_SECTION_TEXT} caracteres")
+        else:
+            texts = [part.text for part in parts]
+        body = "".join(texts).replace("\n", "")
+        if any(f"tarefa {n} " not in body for n in range(3000)) or body.count("y") < 9000:
+            failures.append(f"{user_id}: itens perdidos na divisão")
+        confirmation = renderer.render(user_id, DATE, digest, 'confirmation')
+        if len(confirmation) != 1 or len(confirmation[0].text) > renderer.max_chars:
+            failures.append(f"{user_id}: confirmação do DM fora de uma mensagem")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10,100,1000', help='mensagens no digest')
+    parser.add_argument('--repeat', type=int, default=200, help='renderizações por medida')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    failures = []
+    renderer = make_renderer()
+    check_legacy(renderer, failures)
+    check_limits(renderer, failures)
+
+    print(f"{'mensagens':>10}{'template':>10}{'montagem us':>13}{'cache us':>10}{'por msg us':>12}{'partes':>8}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        messages = make_messages(size)
+        digest = make_digest(messages)
+        for user_id, name in (('UPADRAO', 'padrão'), ('UTEXT', 'seções'), ('UBLOCKS', 'blocos')):
+            template = renderer.template_for(user_id)
+            build = per_call(lambda: renderer.render_messages(template, user_id, DATE, messages), args.repeat)
+            cached = per_call(lambda: renderer.render(user_id, DATE, digest, 'reply'), args.repeat)
+
+            # Uma mensagem nova e a confirmação no DM: a versão muda, uma montagem por mensagem
+            # (no máximo 10% de mensagens a mais, para o tamanho continuar comparável)
+            growing = make_digest(messages)
+            steps = max(1, min(args.repeat, size // 10))
+            counter = iter(range(size + 1, size + 1 + steps))
+
+            def new_message():
+                message_id = next(counter)
+                growing.add(message_id, f'Hoje: mensagem {message_id}')
+                renderer.render(user_id, DATE, growing, 'confirmation')
+            incremental = per_call(new_message, steps)
+            parts = len(renderer.render(user_id, DATE, digest, 'reply'))
+            print(f"{size:>10}{name:>10}{build:>13.1f}{cached:>10.2f}{incremental:>12.1f}{parts:>8}")
+
+    print(f"\ncache: {renderer.stats()['cache']}")
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
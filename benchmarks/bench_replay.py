@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de carga por replay: traces de eventos contra o bot com um Slack falso
+
+Reproduz um trace (sintético ou gravado) de mensagens de usuários, posts do
+bot da daily e retries do Slack no ritmo marcado, contra o bot rodando em
+processo com o Slack falso (Web API + Socket Mode via WebSocket local):
+
+- webhook: POST assinado no /events por HTTP de verdade (servidor do Flask
+  no runtime threaded, aiohttp no async);
+- socket: envelopes entregues pelo WebSocket, ack pelo próprio Socket Mode.
+
+Para cada runtime x modo mostra a vazão, a latência p50/p95/p99 do ack e
+do processamento completo (medidas a partir do horário agendado de cada
+entrega, então atrasos do próprio envio também contam), o tempo gasto no
+banco por operação e as chamadas à API do Slack. Com --baseline compara com
+um resultado salvo por --output e sai com código 1 se houver regressão.
+
+Trace (NDJSON, uma entrega por linha):
+    {"at": 0.125, "event_id": "Ev1", "retry": 0,
+     "event": {"type": "message", "user": "U00001", "channel": "C0001", "text": "...", "ts": "..."}}
+
+Uso: python benchmarks/bench_replay.py [--rate 200] [--duration 10] [--modes webhook,socket]
+        [--runtimes threaded,async] [--trace trace.ndjson] [--save-trace trace.ndjson]
+        [--output resultado.json] [--baseline resultado.json] [--tolerance 0.2]
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack, FakeSocketMode
+
+SECRET = 'bench-secret'
+DAILY_BOT = 'BDAILY'
+
+
+# ----------------------------------------------------------------------
+# Traces
+# ----------------------------------------------------------------------
+
+def channel_of(user, channels):
+    return f'C{user % channels:04d}'
+
+
+def synthetic_trace(rate, duration, users, channels, retry_fraction, retry_delay, seed=42):
+    """Mensagens de usuários a `rate`/s, um post da daily por canal aos 80% e retries"""
+    rng = random.Random(seed)
+    deliveries = []
+    count = int(rate * duration)
+    for n in range(count):
+        user = rng.randrange(users)
+        deliveries.append({
+            'at': n / rate,
+            'event_id': f'Ev{n:08d}',
+            'retry': 0,
+            'event': {'type': 'message', 'user': f'U{user:05d}', 'channel': channel_of(user, channels),
+                      'text': f'mensagem {n} do usuário {user}', 'ts': f'{1700000000 + n}.{n % 1000000:06d}'},
+        })
+    for channel in range(channels):
+        n = count + channel
+        deliveries.append({
+            'at': duration * 0.8 + channel * 0.001,
+            'event_id': f'Ev{n:08d}',
+            'retry': 0,
+            'event': {'type': 'message', 'bot_id': DAILY_BOT, 'channel': f'C{channel:04d}',
+                      'text': 'Hora da daily!', 'ts': f'{1700000000 + n}.{n % 1000000:06d}'},
+        })
+    # O Slack reenvia eventos cujo ack não chegou a tempo, com o mesmo event_id
+    for delivery in rng.sample(deliveries, int(len(deliveries) * retry_fraction)):
+        deliveries.append(dict(delivery, at=delivery['at'] + retry_delay, retry=1))
+    deliveries.sort(key=lambda delivery: delivery['at'])
+    return deliveries
+
+
+def load_trace(path):
+    with open(path, encoding='utf-8') as f:
+        return sorted((json.loads(line) for line in f if line.strip()), key=lambda d: d['at'])
+
+
+def save_trace(path, deliveries):
+    with open(path, 'w', encoding='utf-8') as f:
+        for delivery in deliveries:
+            f.write(json.dumps(delivery, ensure_ascii=False) + '\n')
+
+
+def subscriptions_of(deliveries):
+    """Inscrições (usuário, canal) de quem aparece no trace"""
+    pairs = {(d['event']['user'], d['event']['channel']) for d in deliveries if d['event'].get('user')}
+    return [{'user_id': user, 'channel_id': channel} for user, channel in sorted(pairs)]
+
+
+def event_key(event):
+    return f"{event.get('channel')}:{event.get('ts')}"
+
+
+# ----------------------------------------------------------------------
+# Medição
+# ----------------------------------------------------------------------
+
+class Recorder:
+    """Horário agendado de cada evento, acks e conclusões do processamento"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scheduled = {}      # chave do evento -> horário agendado da primeira entrega
+        self.ack_latencies = []
+        self.done_latencies = []
+        self.errors = Counter()
+        self.last_done = 0.0
+
+    def sent(self, key, scheduled):
+        with self.lock:
+            self.scheduled.setdefault(key, scheduled)
+
+    def acked(self, scheduled):
+        now = time.perf_counter()
+        with self.lock:
+            self.ack_latencies.append(now - scheduled)
+
+    def done(self, key):
+        now = time.perf_counter()
+        with self.lock:
+            scheduled = self.scheduled.get(key)
+            if scheduled is not None:
+                self.done_latencies.append(now - scheduled)
+                self.last_done = now
+
+    def error(self, kind):
+        with self.lock:
+            self.errors[kind] += 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000 if values else 0.0
+
+
+def metrics_snapshot():
+    """Estado dos contadores/histogramas usados no relatório"""
+    import metrics
+
+    return {
+        'db': {labels[0]: child.snapshot() for labels, child in metrics.DB_QUERY_SECONDS._items()},
+        'duplicates': {labels[0]: child.value() for labels, child in metrics.EVENT_DUPLICATES._items()},
+        'received': {'/'.join(labels): child.value() for labels, child in metrics.EVENTS_RECEIVED._items()},
+    }
+
+
+def db_report(before, after):
+    """Por operação: chamadas, tempo médio, p99 (limite do bucket) e tempo total"""
+    import metrics
+
+    buckets = metrics.DB_QUERY_SECONDS.buckets + (float('inf'),)
+    report = {}
+    for op, (cumulative, total, seconds) in after['db'].items():
+        old_cumulative, old_total, old_seconds = before['db'].get(op, ([0] * len(cumulative), 0, 0.0))
+        count = total - old_total
+        if not count:
+            continue
+        deltas = [new - old for new, old in zip(cumulative, old_cumulative)]
+        p99 = next(bound for bound, seen in zip(buckets, deltas) if seen >= count * 0.99)
+        report[op] = {
+            'calls': int(count),
+            'mean_ms': round((seconds - old_seconds) / count * 1000, 3),
+            'p99_ms': p99 * 1000,
+            'total_s': round(seconds - old_seconds, 3),
+        }
+    return report
+
+
+def counter_delta(before, after):
+    return {key: int(value - before.get(key, 0)) for key, value in after.items() if value - before.get(key, 0)}
+
+
+# ----------------------------------------------------------------------
+# Entrega (Events API por HTTP e Socket Mode por WebSocket)
+# ----------------------------------------------------------------------
+
+def signed(payload, retry):
+    body = json.dumps(payload).encode('utf-8')
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Slack-Request-Timestamp': timestamp,
+        'X-Slack-Signature': 'v0=' + hmac.new(
+            SECRET.encode('utf-8'), f'v0:{timestamp}:'.encode('utf-8') + body, hashlib.sha256
+        ).hexdigest(),
+    }
+    if retry:
+        headers['X-Slack-Retry-Num'] = str(retry)
+        headers['X-Slack-Retry-Reason'] = 'http_timeout'
+    return body, headers
+
+
+class WebhookDriver:
+    """POST no /events com conexões keep-alive, uma por thread de envio"""
+
+    def __init__(self, port, recorder, connections):
+        self.port = port
+        self.recorder = recorder
+        self.pool = ThreadPoolExecutor(connections)
+        self.local = threading.local()
+
+    def _post(self, body, headers, scheduled):
+        for attempt in range(2):
+            conn = getattr(self.local, 'conn', None)
+            if conn is None:
+                conn = self.local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                conn.request('POST', '/events', body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                self.recorder.acked(scheduled)
+                if response.status != 200:
+                    self.recorder.error(f'http_{response.status}')
+                return
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self.local.conn = None
+        self.recorder.error('connection')
+
+    def deliver(self, delivery, scheduled):
+        payload = {'type': 'event_callback', 'event_id': delivery['event_id'], 'event': delivery['event']}
+        body, headers = signed(payload, delivery.get('retry', 0))
+        self.pool.submit(self._post, body, headers, scheduled)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+class SocketDriver:
+    """Envelopes events_api pelo Socket Mode falso; o ack volta pelo WebSocket"""
+
+    def __init__(self, socket_mode, recorder):
+        self.socket_mode = socket_mode
+        self.recorder = recorder
+        self.pending = {}
+        self.counter = 0
+        socket_mode.on_ack = self._acked
+
+    def _acked(self, envelope_id, payload):
+        scheduled = self.pending.pop(envelope_id, None)
+        if scheduled is not None:
+            self.recorder.acked(scheduled)
+
+    def deliver(self, delivery, scheduled):
+        self.counter += 1
+        envelope_id = f'env-{self.counter}'
+        self.pending[envelope_id] = scheduled
+        retry = delivery.get('retry', 0)
+        self.socket_mode.send({
+            'envelope_id': envelope_id,
+            'type': 'events_api',
+            'accepts_response_payload': False,
+            'retry_attempt': retry,
+            'retry_reason': 'timeout' if retry else '',
+            'payload': {'type': 'event_callback', 'event_id': delivery['event_id'], 'event': delivery['event']},
+        })
+
+    def close(self):
+        pass
+
+
+def replay(deliveries, driver, recorder, speed=1.0):
+    """Entregar cada item no horário `at` (dividido por `speed`) a partir de agora"""
+    start = time.perf_counter()
+    lag = 0.0
+    for delivery in deliveries:
+        scheduled = start + delivery['at'] / speed
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            lag = max(lag, -delay)
+        recorder.sent(event_key(delivery['event']), scheduled)
+        driver.deliver(delivery, scheduled)
+    return start, lag
+
+
+# ----------------------------------------------------------------------
+# Bot em processo (runtime threaded ou async, modo webhook ou socket)
+# ----------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def configure(runtime, mode, tmpdir, slack, deliveries, args):
+    subscriptions = os.path.join(tmpdir, 'subscriptions.json')
+    with open(subscriptions, 'w', encoding='utf-8') as f:
+        json.dump(subscriptions_of(deliveries), f)
+    os.environ.update({
+        'RUNTIME': runtime,
+        'WEBHOOK_MODE': str(mode == 'webhook').lower(),
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_APP_TOKEN': 'xapp-bench',
+        'SLACK_SIGNING_SECRET': SECRET,
+        'SLACK_API_URL': slack.url,
+        'SUBSCRIPTIONS_FILE': subscriptions,
+        'DB_PATH': os.path.join(tmpdir, f'{runtime}-{mode}.db'),
+        'PORT': str(free_port()),
+        'DAILY_BOT_NAME': 'daily-bot',
+        'EVENT_WORKERS': str(args.workers),
+        'ASYNC_CONCURRENCY': str(args.concurrency),
+        'EVENT_QUEUE_SIZE': '100000',
+        # Limites do Slack real ficam de fora: mede o bot, não o rate limit
+        'SLACK_RATE_LIMITS': 'chat.postMessage=1000000,chat.update=1000000,bots.info=1000000',
+        'DM_CONFIRMATION_DEBOUNCE': '0',
+    })
+    for name in ('USER_ID', 'SLACK_CHANNEL_ID'):
+        os.environ.pop(name, None)
+    from bot import DailyBot
+    return DailyBot()
+
+
+class ThreadedBot:
+    """DailyBot com Flask (servidor de desenvolvimento, threaded) ou Socket Mode"""
+
+    def __init__(self, bot, mode, recorder):
+        self.bot = bot
+        self.mode = mode
+        self.server = None
+
+        def timed(event):
+            bot.handle_message(event)
+            recorder.done(event_key(event))
+
+        bot.dispatcher.handler = timed
+
+    def start(self, socket_mode=None):
+        from werkzeug.serving import make_server
+
+        self.bot.dispatcher.start()
+        if self.mode == 'webhook':
+            self.server = make_server('127.0.0.1', self.bot.port, self.bot.app, threaded=True)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        else:
+            self.bot.socket_client.connect()
+            if not socket_mode.connected.wait(10):
+                raise RuntimeError('o Socket Mode não conectou')
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+        else:
+            self.bot.socket_client.close()
+        self.bot.dispatcher.stop(timeout=60)
+        self.bot.outbound.stop()
+        self.bot.storage.close()
+
+
+class AsyncBot:
+    """AsyncRuntime em um event loop próprio (aiohttp no webhook, Socket Mode aiohttp)"""
+
+    def __init__(self, bot, mode, recorder):
+        from async_runtime import AsyncRuntime
+
+        self.bot = bot
+        self.mode = mode
+        self.runtime = AsyncRuntime(bot)
+        self.loop = asyncio.new_event_loop()
+        self.task = None
+        self.thread = None
+        self.error = None
+
+        async def timed(event):
+            await self.runtime.handle_message(event)
+            recorder.done(event_key(event))
+
+        self.runtime.dispatcher.handler = timed
+
+    def start(self, socket_mode=None):
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.task = self.loop.create_task(self.runtime.serve())
+            try:
+                self.loop.run_until_complete(self.task)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                self.error = e
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        if self.mode == 'webhook':
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                try:
+                    socket.create_connection(('127.0.0.1', self.bot.port), timeout=0.2).close()
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        else:
+            deadline = time.time() + 10
+            while not socket_mode.connected.wait(0.05) and self.thread.is_alive() and time.time() < deadline:
+                pass
+            # O cliente pode cair logo depois do hello (ping inicial)
+            time.sleep(0.2)
+            if not socket_mode.connected.is_set() or not self.thread.is_alive():
+                raise RuntimeError(f'o Socket Mode não conectou: {self.error!r}')
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(timeout=60)
+
+
+def run_once(runtime, mode, deliveries, slack, socket_mode, args):
+    """Replay completo contra um runtime/modo; retorna o relatório"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bot = configure(runtime, mode, tmpdir, slack, deliveries, args)
+        recorder = Recorder()
+        host = (ThreadedBot if runtime == 'threaded' else AsyncBot)(bot, mode, recorder)
+        socket_mode.connected.clear()
+        try:
+            host.start(socket_mode)
+        except RuntimeError:
+            host.stop()
+            raise
+        driver = (WebhookDriver(bot.port, recorder, args.connections) if mode == 'webhook'
+                  else SocketDriver(socket_mode, recorder))
+
+        calls_before = Counter(slack.calls)
+        before = metrics_snapshot()
+        unique = len({event_key(delivery['event']) for delivery in deliveries})
+        start, lag = replay(deliveries, driver, recorder, args.speed)
+        driver.close()
+
+        # Esperar o processamento de todos os eventos (ou o limite de --drain)
+        deadline = time.perf_counter() + args.drain
+        while len(recorder.done_latencies) < unique and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        after = metrics_snapshot()
+        calls = counter_delta(calls_before, slack.calls)
+        host.stop()
+
+    processed = len(recorder.done_latencies)
+    elapsed = (recorder.last_done or time.perf_counter()) - start
+    db = db_report(before, after)
+    return {
+        'runtime': runtime,
+        'mode': mode,
+        'deliveries': len(deliveries),
+        'events': unique,
+        'processed': processed,
+        'throughput': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+        'send_lag_ms': round(lag * 1000, 1),
+        'ack_ms': {name: round(percentile(recorder.ack_latencies, q), 2)
+                   for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+        'e2e_ms': {name: round(percentile(recorder.done_latencies, q), 2)
+                   for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+        'acks': len(recorder.ack_latencies),
+        'errors': dict(recorder.errors),
+        'duplicates': counter_delta(before['duplicates'], after['duplicates']),
+        'received': counter_delta(before['received'], after['received']),
+        'db': db,
+        'db_ms_per_event': round(sum(op['total_s'] for op in db.values()) / max(1, processed) * 1000, 3),
+        'api_calls': calls,
+    }
+
+
+# ----------------------------------------------------------------------
+# Relatório e comparação com a baseline
+# ----------------------------------------------------------------------
+
+def print_report(result):
+    name = f"{result['runtime']}/{result['mode']}"
+    ack, e2e = result['ack_ms'], result['e2e_ms']
+    print(f"\n== {name}: {result['processed']}/{result['events']} eventos processados "
+          f"({result['deliveries']} entregas), {result['throughput']:.0f} eventos/s, "
+          f"atraso máximo do envio {result['send_lag_ms']:.1f} ms")
+    print(f"   ack  p50 {ack['p50']:8.2f}  p95 {ack['p95']:8.2f}  p99 {ack['p99']:8.2f} ms")
+    print(f"   e2e  p50 {e2e['p50']:8.2f}  p95 {e2e['p95']:8.2f}  p99 {e2e['p99']:8.2f} ms")
+    print(f"   duplicados descartados: {result['duplicates'] or 0}  erros: {result['errors'] or 0}")
+    print(f"   banco: {result['db_ms_per_event']:.3f} ms/evento")
+    top = sorted(result['db'].items(), key=lambda item: -item[1]['total_s'])[:5]
+    for op, stats in top:
+        print(f"     {op:<22}{stats['calls']:>7} chamadas  média {stats['mean_ms']:7.3f} ms  "
+              f"p99 <= {stats['p99_ms']:g} ms  total {stats['total_s']:.2f}s")
+    print(f"   API do Slack: {result['api_calls']}")
+
+
+def compare(results, baseline, tolerance):
+    """Regressões em relação à baseline: vazão menor ou p99 maior que a tolerância"""
+    previous = {f"{r['runtime']}/{r['mode']}": r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        name = f"{result['runtime']}/{result['mode']}"
+        base = previous.get(name)
+        if not base:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: vazão {result['throughput']:.0f}/s < {base['throughput']:.0f}/s")
+        for metric in ('ack_ms', 'e2e_ms'):
+            new, old = result[metric]['p99'], base[metric]['p99']
+            # Diferenças de poucos ms são ruído em latências baixas
+            if new > old * (1 + tolerance) and new - old > 5:
+                regressions.append(f"{name}: {metric} p99 {new:.1f} > {old:.1f}")
+        if result['processed'] < result['events']:
+            regressions.append(f"{name}: {result['events'] - result['processed']} eventos não processados")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='webhook,socket')
+    parser.add_argument('--runtimes', default='threaded,async')
+    parser.add_argument('--rate', type=float, default=200, help='mensagens de usuários por segundo')
+    parser.add_argument('--duration', type=float, default=10, help='segundos de trace sintético')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--retries', type=float, default=0.05, help='fração de entregas reenviadas')
+    parser.add_argument('--retry-delay', type=float, default=1.0)
+    parser.add_argument('--trace', help='trace gravado (NDJSON) em vez do sintético')
+    parser.add_argument('--save-trace', help='salvar o trace usado')
+    parser.add_argument('--speed', type=float, default=1.0, help='multiplicador do ritmo do trace')
+    parser.add_argument('--latency', type=float, default=0.02, help='latência da API falsa (s)')
+    parser.add_argument('--workers', type=int, default=8, help='EVENT_WORKERS (threaded)')
+    parser.add_argument('--concurrency', type=int, default=100, help='ASYNC_CONCURRENCY (async)')
+    parser.add_argument('--connections', type=int, default=16, help='conexões HTTP de envio')
+    parser.add_argument('--drain', type=float, default=60, help='espera máxima pelo processamento (s)')
+    parser.add_argument('--output', help='salvar o resultado em JSON')
+    parser.add_argument('--baseline', help='resultado anterior (--output) para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    if args.trace:
+        deliveries = load_trace(args.trace)
+    else:
+        deliveries = synthetic_trace(args.rate, args.duration, args.users, args.channels,
+                                     args.retries, args.retry_delay)
+    if args.save_trace:
+        save_trace(args.save_trace, deliveries)
+
+    socket_mode = FakeSocketMode().start()
+    slack = FakeSlack(latency=args.latency, bot_names={DAILY_BOT: 'daily-bot'}, socket_mode=socket_mode).start()
+    results = []
+    try:
+        print(f"trace: {len(deliveries)} entregas em {deliveries[-1]['at'] / args.speed:.1f}s, "
+              f"API falsa com {args.latency * 1000:.0f} ms de latência")
+        for runtime in args.runtimes.split(','):
+            for mode in args.modes.split(','):
+                try:
+                    result = run_once(runtime, mode, deliveries, slack, socket_mode, args)
+                except (RuntimeError, ImportError) as e:
+                    # Dependência opcional ausente/incompatível: a combinação fica fora da rodada
+                    print(f"\n== {runtime}/{mode}: indisponível ({e})")
+                    continue
+                print_report(result)
+                results.append(result)
+    finally:
+        slack.stop()
+        socket_mode.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2, ensure_ascii=False)
+
+    failed = any(result['processed'] < result['events'] for result in results)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSÃO: {regression}")
+        failed = failed or bool(regressions)
+    if failed:
+        print("FALHA")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: retenção, arquivamento e compactação do messages.db
+
+Popula U usuários x D dias x M mensagens (com resposta à daily em cada dia),
+roda o job de retenção mantendo os últimos K dias e mede o tamanho do banco,
+o espaço devolvido e o tempo do job. Enquanto o job roda, uma thread grava
+mensagens como o caminho dos eventos (insert_message), e a latência dessas
+gravações é comparada com a do banco ocioso: o job não pode travar os eventos.
+Sai com código 1 se algum dia recente for removido ou se o arquivo não
+devolver as mensagens arquivadas.
+
+Uso: python benchmarks/bench_retention.py [--users 200] [--days 365] [--keep 90] [--archive table]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ('deploy revisão reunião bug correção teste documentação refatoração '
+         'cliente migração pipeline monitoramento alerta banco cache fila').split()
+
+
+def populate(storage, users, days, messages, today):
+    rng = random.Random(42)
+    with storage.pool.connection() as conn, conn:
+        for offset in range(days, 0, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            conn.executemany(
+                "INSERT INTO daily_messages (user_id, channel_id, date, message, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(f'U{user:05d}', 'C0001', day, ' '.join(rng.choice(WORDS) for _ in range(8)),
+                  f'{day} 09:{n:02d}:00') for user in range(users) for n in range(messages)]
+            )
+            conn.executemany(
+                "INSERT INTO daily_responses (user_id, date, response_sent) VALUES (?, ?, TRUE)",
+                [(f'U{user:05d}', day) for user in range(users)]
+            )
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def live_writes(storage, stop, rate, latencies):
+    """Gravar mensagens de hoje a `rate` por segundo, medindo cada insert"""
+    today = date.today().isoformat()
+    interval = 1.0 / rate
+    count = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        storage.insert_message(f'U{count % 100:05d}', 'C0001', today, f'mensagem ao vivo {count}')
+        latencies.append(time.perf_counter() - start)
+        count += 1
+        time.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+
+def measure_writes(storage, rate, seconds=None, during=None):
+    """Latências das gravações por `seconds` ou enquanto `during()` roda"""
+    latencies = []
+    stop = threading.Event()
+    writer = threading.Thread(target=live_writes, args=(storage, stop, rate, latencies))
+    writer.start()
+    result = during() if during else time.sleep(seconds)
+    stop.set()
+    writer.join()
+    return latencies, result
+
+
+def file_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--messages', type=int, default=3)
+    parser.add_argument('--keep', type=int, default=90, help='dias mantidos (RETENTION_DAYS)')
+    parser.add_argument('--archive', choices=('table', 'file', 'none'), default='table')
+    parser.add_argument('--rate', type=float, default=200, help='gravações/s ao vivo durante o job')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'retention.db')
+        os.environ['DB_PATH'] = path
+        from storage import Storage
+        from retention import Retention
+
+        storage = Storage.from_env()
+        storage.init_schema()
+        today = date.today()
+        start = time.perf_counter()
+        populate(storage, args.users, args.days, args.messages, today)
+        with storage.pool.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        total = args.users * args.days * args.messages
+        size_before = file_size(path)
+        print(f"{total} mensagens ({args.users} usuários, {args.days} dias) em "
+              f"{time.perf_counter() - start:.1f}s; banco com {size_before / 1e6:.1f} MB")
+
+        sample_user, sample_day = 'U00007', (today - timedelta(days=args.days)).isoformat()
+        expected = storage.get_messages(sample_user, sample_day)
+
+        idle, _ = measure_writes(storage, args.rate, seconds=3)
+        retention = Retention(storage, days=args.keep, archive=args.archive,
+                              archive_dir=os.path.join(tmpdir, 'archive'))
+        busy, report = measure_writes(storage, args.rate, during=lambda: retention.run(today))
+        with storage.pool.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            oldest = conn.execute("SELECT MIN(date) FROM daily_messages WHERE date < ?",
+                                  (today.isoformat(),)).fetchone()[0]
+        size_after = file_size(path)
+
+        print(f"retenção ({args.archive}, mantendo {args.keep} dias): {report['days']} usuário/dias, "
+              f"{report['messages']} mensagens e {report['responses']} respostas em {report['seconds']:.1f}s")
+        print(f"banco: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB "
+              f"({report['reclaimed_bytes'] / 1e6:.1f} MB devolvidos pelo incremental_vacuum)")
+        for name, values in (('banco ocioso', idle), ('durante o job', busy)):
+            print(f"gravações ao vivo, {name:<14} p50 {percentile(values, 0.5) * 1000:6.2f} ms  "
+                  f"p99 {percentile(values, 0.99) * 1000:6.2f} ms  máx {max(values) * 1000:7.2f} ms  "
+                  f"({len(values)} gravações)")
+
+        failed = False
+        if oldest != retention.cutoff(today):
+            print(f"FALHA: dia mais antigo mantido {oldest}, esperado {retention.cutoff(today)}")
+            failed = True
+        if args.archive == 'table':
+            archived, responded = retention.archived(sample_user, sample_day)
+            if [row[2] for row in archived] != expected or not responded:
+                print("FALHA: o arquivo não devolve as mensagens e a resposta do dia arquivado")
+                failed = True
+        storage.close()
+        if failed:
+            return 1
+        print("OK: dias antigos arquivados, dias recentes intactos")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
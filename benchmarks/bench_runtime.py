@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: latência p50/p99 dos eventos no runtime threaded vs async
+
+Uma rajada de mensagens de vários usuários é enfileirada de uma vez e a
+latência de cada evento (enfileirado -> armazenado e DM enviado) é medida
+contra o Slack falso com latência injetada.
+
+Uso: python benchmarks/bench_runtime.py [--events 2000] [--latency 0.05]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlack
+
+
+def synthetic_events(count, users):
+    for i in range(count):
+        user = i % users
+        yield {
+            'type': 'message',
+            'user': f'U{user:05d}',
+            'channel': f'C{user % 10:04d}',
+            'text': f'mensagem {i}',
+            'ts': f'{i}.000000',
+        }
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return (
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    )
+
+
+def configure(runtime, tmpdir, slack, users, concurrency):
+    subscriptions = os.path.join(tmpdir, 'subscriptions.json')
+    with open(subscriptions, 'w', encoding='utf-8') as f:
+        json.dump([{'user_id': f'U{u:05d}', 'channel_id': f'C{u % 10:04d}'} for u in range(users)], f)
+    os.environ.update({
+        'RUNTIME': runtime,
+        'WEBHOOK_MODE': 'false',
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_APP_TOKEN': 'xapp-bench',
+        'SLACK_API_URL': slack.url,
+        'SUBSCRIPTIONS_FILE': subscriptions,
+        'DB_PATH': os.path.join(tmpdir, f'{runtime}.db'),
+        'EVENT_WORKERS': str(concurrency),
+        'ASYNC_CONCURRENCY': str(concurrency),
+        'EVENT_QUEUE_SIZE': '1000000',
+        # Uma confirmação nova por mensagem, sem o limite de taxa do Slack real
+        'DM_CONFIRMATION_DEBOUNCE': '0',
+        'SLACK_RATE_LIMITS': 'chat.postMessage=1000000',
+        'DM_CONFIRMATION_UPDATE': 'false',
+    })
+    os.environ.pop('USER_ID', None)
+    os.environ.pop('SLACK_CHANNEL_ID', None)
+    from bot import DailyBot
+    return DailyBot()
+
+
+def run_threaded(bot, events):
+    latencies = []
+
+    def timed(event):
+        bot.handle_message(event)
+        latencies.append(time.perf_counter() - event['_sent'])
+
+    bot.dispatcher.handler = timed
+    bot.dispatcher.start()
+    start = time.perf_counter()
+    for event in events:
+        event['_sent'] = time.perf_counter()
+        bot.dispatch_event(event)
+    bot.dispatcher.stop(timeout=600)
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(bot, events):
+    from async_runtime import AsyncRuntime
+
+    runtime = AsyncRuntime(bot)
+    latencies = []
+
+    async def timed(event):
+        await runtime.handle_message(event)
+        latencies.append(time.perf_counter() - event['_sent'])
+
+    runtime.dispatcher.handler = timed
+    runtime.dispatcher.start()
+    start = time.perf_counter()
+    for event in events:
+        event['_sent'] = time.perf_counter()
+        await runtime.dispatch_event(event)
+    await runtime.dispatcher.stop()
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05, help='latência da API falsa (s)')
+    parser.add_argument('--threads', type=int, default=16, help='workers do runtime threaded')
+    parser.add_argument('--concurrency', type=int, default=500, help='workers do runtime async')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    slack = FakeSlack(latency=args.latency).start()
+    try:
+        print(f"{'runtime':<10}{'p50 ms':>10}{'p99 ms':>10}{'eventos/s':>12}")
+        for runtime in ('threaded', 'async'):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                concurrency = args.threads if runtime == 'threaded' else args.concurrency
+                bot = configure(runtime, tmpdir, slack, args.users, concurrency)
+                events = list(synthetic_events(args.events, args.users))
+                if runtime == 'threaded':
+                    latencies, elapsed = run_threaded(bot, events)
+                else:
+                    latencies, elapsed = asyncio.run(run_async(bot, events))
+                bot.storage.close()
+            p50, p99 = percentiles(latencies)
+            print(f"{runtime:<10}{p50:>10.1f}{p99:>10.1f}{len(events) / elapsed:>12.0f}")
+    finally:
+        slack.stop()
+
+
+if __name__ == "__main__":
+    main()
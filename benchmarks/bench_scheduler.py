@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: agendador de jobs diários com estado no banco
+
+1) Atraso dos disparos: N jobs (metade no horário local, metade em UTC)
+   agendados para o próximo minuto; mede o atraso entre o horário agendado e
+   o início de cada job. O loop anterior (schedule + sleep(60)) atrasava em
+   média ~30s e até 60s.
+2) Recuperação: um job cujo horário passou com o bot parado roda uma vez ao
+   iniciar; um atrasado além da tolerância é pulado.
+3) Dois agendadores (ex: dois processos) no mesmo banco: cada horário roda
+   uma única vez.
+Sai com código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/bench_scheduler.py [--jobs 200]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage
+from scheduler import Scheduler, get_timezone
+
+
+def open_storage(path):
+    os.environ['DB_PATH'] = path
+    storage = Storage.from_env()
+    storage.init_schema()
+    return storage
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--lead', type=float, default=1.5, help='segundos até o disparo')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    failures = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # 1) Relógio adiantado para o próximo minuto começar daqui a `lead` segundos
+        now = time.time()
+        minute = (datetime.fromtimestamp(now).replace(second=0, microsecond=0)
+                  + timedelta(minutes=1)).timestamp()
+        offset = minute - now - args.lead
+        clock = lambda: time.time() + offset  # noqa: E731
+        local_at = datetime.fromtimestamp(minute).strftime('%H:%M')
+        utc_at = datetime.fromtimestamp(minute, timezone.utc).strftime('%H:%M')
+
+        storage = open_storage(os.path.join(tmpdir, 'jitter.db'))
+        scheduler = Scheduler(storage, workers=8, clock=clock)
+        delays = []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def job(run_at):
+            delay = clock() - run_at.timestamp()
+            with lock:
+                delays.append(delay)
+                if len(delays) == args.jobs:
+                    done.set()
+
+        for i in range(args.jobs):
+            if i % 2:
+                scheduler.add_daily(f'bench:{i}', utc_at, job, tz=get_timezone('UTC'))
+            else:
+                scheduler.add_daily(f'bench:{i}', local_at, job)
+        scheduler.start()
+        if not done.wait(args.lead + 30):
+            failures.append(f"só {len(delays)} de {args.jobs} jobs dispararam")
+        scheduler.stop()
+        if delays:
+            print(f"{len(delays)} jobs: atraso p50 {percentile(delays, 0.5) * 1000:.1f} ms, "
+                  f"p99 {percentile(delays, 0.99) * 1000:.1f} ms, máx {max(delays) * 1000:.1f} ms")
+        next_runs = {row[1] for row in storage.list_jobs()}
+        if next_runs != {minute + 86400}:
+            failures.append("próxima execução não avançou um dia")
+        storage.close()
+
+        # 2) Recuperação ao iniciar
+        storage = open_storage(os.path.join(tmpdir, 'catchup.db'))
+        runs = []
+        scheduler = Scheduler(storage, grace=3600)
+        scheduler.add_daily('recente', '00:00', lambda run_at: runs.append('recente'))
+        scheduler.add_daily('antigo', '00:00', lambda run_at: runs.append('antigo'))
+        storage.init_job('recente', time.time() - 600)     # perdido há 10 minutos
+        storage.init_job('antigo', time.time() - 7 * 3600)  # perdido há 7 horas
+        start = time.perf_counter()
+        scheduler.start()
+        while not runs and time.perf_counter() - start < 5:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        scheduler.stop()
+        print(f"recuperação: executados {runs} em {elapsed * 1000:.1f} ms, pulados {scheduler.skipped}")
+        if runs != ['recente'] or scheduler.skipped != 1:
+            failures.append(f"recuperação incorreta: {runs}, pulados {scheduler.skipped}")
+        storage.close()
+
+        # 3) Dois agendadores no mesmo banco disputando os mesmos horários
+        path = os.path.join(tmpdir, 'shared.db')
+        counts = {}
+        lock = threading.Lock()
+
+        def count(name):
+            def job(run_at):
+                with lock:
+                    counts[name] = counts.get(name, 0) + 1
+            return job
+
+        now = time.time()
+        minute = (datetime.fromtimestamp(now).replace(second=0, microsecond=0)
+                  + timedelta(minutes=1)).timestamp()
+        offset = minute - now - args.lead
+        at = datetime.fromtimestamp(minute).strftime('%H:%M')
+        schedulers = []
+        for _ in range(2):
+            scheduler = Scheduler(open_storage(path), clock=lambda: time.time() + offset)
+            for i in range(args.jobs):
+                scheduler.add_daily(f'shared:{i}', at, count(i))
+            schedulers.append(scheduler)
+        for scheduler in schedulers:
+            scheduler.start()
+        time.sleep(args.lead + 1)
+        for scheduler in schedulers:
+            scheduler.stop()
+            scheduler.storage.close()
+        total = sum(counts.values())
+        print(f"2 agendadores, {args.jobs} jobs: {total} execuções, "
+              f"repetidas: {sum(1 for n in counts.values() if n > 1)}")
+        if total != args.jobs or any(n != 1 for n in counts.values()):
+            failures.append("jobs executados mais de uma vez ou não executados")
+
+    if failures:
+        for failure in failures:
+            print(f"FALHA: {failure}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: latência de get_messages conforme o histórico cresce
+
+O banco é preenchido de forma incremental até cada tamanho da lista e a
+busca por (user_id, date) é medida a cada etapa. Com o índice composto a
+latência deve ficar estável de 10k até 10M linhas.
+
+Uso: python benchmarks/bench_schema.py [--sizes 10000,100000,1000000,10000000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage, ConnectionPool, pragmas_from_env
+
+USERS = 200
+MESSAGES_PER_DAY = 5
+
+
+def synthetic_rows(start, stop):
+    """Gerar linhas (user_id, channel_id, date, message) sem materializar a lista"""
+    for i in range(start, stop):
+        day = i // (USERS * MESSAGES_PER_DAY)
+        user = (i // MESSAGES_PER_DAY) % USERS
+        yield (f"U{user:05d}", "C0001", f"d{day:07d}", f"mensagem {i}")
+
+
+def fill(storage, start, stop, chunk=50_000):
+    with storage.pool.connection() as conn:
+        for offset in range(start, stop, chunk):
+            with conn:
+                conn.executemany(
+                    "INSERT INTO daily_messages (user_id, channel_id, date, message) "
+                    "VALUES (?, ?, ?, ?)",
+                    synthetic_rows(offset, min(offset + chunk, stop)),
+                )
+
+
+def measure(storage, rows, lookups):
+    days = max(1, rows // (USERS * MESSAGES_PER_DAY))
+    samples = []
+    for _ in range(lookups):
+        user = f"U{random.randrange(USERS):05d}"
+        date = f"d{random.randrange(days):07d}"
+        start = time.perf_counter()
+        storage.get_messages(user, date)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='tamanhos do histórico, separados por vírgula')
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = Storage(ConnectionPool(os.path.join(tmpdir, 'bench.db'), pragmas=pragmas_from_env()))
+        storage.init_schema()
+
+        print(f"{'linhas':>12}{'p50 (us)':>12}{'p99 (us)':>12}")
+        filled = 0
+        for size in sizes:
+            fill(storage, filled, size)
+            filled = size
+            p50, p99 = measure(storage, size, args.lookups)
+            print(f"{size:>12}{p50:>12.1f}{p99:>12.1f}")
+
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tempo de partida do bot em cada modo (cold start)
+
+Para cada modo, em processos novos:
+- mede o `import bot` e a criação do DailyBot, listando as dependências
+  pesadas carregadas (Flask, pyngrok, cliente do Socket Mode, aiohttp, gunicorn);
+- sobe `python bot.py` contra o Slack falso e mede, a partir do spawn, o
+  tempo até o primeiro evento ser confirmado (ack do /events ou do Socket
+  Mode) e até ele ser processado (confirmação enviada por DM ao usuário).
+
+Uso: python benchmarks/bench_startup.py [--runs 5] [--modes socket,webhook,gunicorn,async-socket,async-webhook]
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import signal
+import socket
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import http.client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_slack import FakeSlack, FakeSocketMode
+
+SECRET = 'bench-secret'
+
+MODES = {
+    'socket': {'RUNTIME': 'threaded', 'WEBHOOK_MODE': 'false'},
+    'webhook': {'RUNTIME': 'threaded', 'WEBHOOK_MODE': 'true', 'SERVER': 'dev'},
+    'gunicorn': {'RUNTIME': 'threaded', 'WEBHOOK_MODE': 'true', 'SERVER': 'gunicorn', 'WEB_WORKERS': '1'},
+    'async-socket': {'RUNTIME': 'async', 'WEBHOOK_MODE': 'false'},
+    'async-webhook': {'RUNTIME': 'async', 'WEBHOOK_MODE': 'true'},
+}
+
+HEAVY = ('flask', 'pyngrok.ngrok', 'slack_sdk.socket_mode.builtin', 'aiohttp', 'gunicorn')
+
+# Executado num processo novo: custo do import e da criação do bot
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import bot
+imported = time.perf_counter()
+bot.DailyBot().storage.close()
+built = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'init': built - imported,
+    'modules': [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def base_env(mode, slack, db_path):
+    env = dict(os.environ)
+    env.update(MODES[mode])
+    env.update({
+        'SLACK_BOT_TOKEN': 'xoxb-bench',
+        'SLACK_APP_TOKEN': 'xapp-bench',
+        'SLACK_SIGNING_SECRET': SECRET,
+        'SLACK_API_URL': slack.url,
+        'USER_ID': 'U00001',
+        'SLACK_CHANNEL_ID': 'C0001',
+        'DB_PATH': db_path,
+        'PORT': str(free_port()),
+        'USE_NGROK': 'false',
+        'DM_CONFIRMATION_DEBOUNCE': '0',
+    })
+    env.pop('SUBSCRIPTIONS_FILE', None)
+    return env
+
+
+def probe(env):
+    """import bot + DailyBot() num processo novo"""
+    output = subprocess.run([sys.executable, '-c', PROBE % (HEAVY,)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def signed_event(text):
+    body = json.dumps({
+        'type': 'event_callback', 'event_id': f'Ev{time.time_ns()}',
+        'event': {'type': 'message', 'user': 'U00001', 'channel': 'C0001', 'text': text,
+                  'ts': f'{time.time():.6f}'},
+    }).encode('utf-8')
+    timestamp = str(int(time.time()))
+    signature = 'v0=' + hmac.new(SECRET.encode('utf-8'), f'v0:{timestamp}:'.encode('utf-8') + body,
+                                 hashlib.sha256).hexdigest()
+    return body, {'Content-Type': 'application/json', 'X-Slack-Request-Timestamp': timestamp,
+                  'X-Slack-Signature': signature}
+
+
+def wait_webhook_ack(port, proc, deadline):
+    """Reenviar o evento até o /events responder 200 (servidor no ar)"""
+    while time.perf_counter() < deadline and proc.poll() is None:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            body, headers = signed_event('primeiro evento')
+            conn.request('POST', '/events', body=body, headers=headers)
+            if conn.getresponse().status == 200:
+                return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.002)
+    return None
+
+
+def wait_socket_ack(socket_mode, proc, deadline):
+    """Entregar um envelope assim que o bot conectar e esperar o ack"""
+    acked = threading.Event()
+    socket_mode.on_ack = lambda envelope_id, payload: acked.set()
+    while time.perf_counter() < deadline and proc.poll() is None:
+        if socket_mode.connected.wait(0.002):
+            body = json.loads(signed_event('primeiro evento')[0])
+            socket_mode.send({'envelope_id': f'env-{time.time_ns()}', 'type': 'events_api',
+                              'accepts_response_payload': False, 'retry_attempt': 0,
+                              'retry_reason': '', 'payload': body})
+            if acked.wait(max(0.0, deadline - time.perf_counter())):
+                return time.perf_counter()
+    return None
+
+
+def first_event(mode, env, slack, socket_mode, timeout, log):
+    """Spawn do bot até o primeiro ack e até o primeiro evento processado"""
+    posts = slack.calls['chat.postMessage']
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'bot.py'], cwd=ROOT, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+    deadline = start + timeout
+    try:
+        if env['WEBHOOK_MODE'] == 'true':
+            acked = wait_webhook_ack(int(env['PORT']), proc, deadline)
+        else:
+            acked = wait_socket_ack(socket_mode, proc, deadline)
+        handled = None
+        while acked and time.perf_counter() < deadline:
+            if slack.calls['chat.postMessage'] > posts:
+                handled = time.perf_counter()
+                break
+            time.sleep(0.001)
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        # Esperar o Socket Mode falso notar a desconexão antes da próxima rodada
+        for _ in range(200):
+            if not socket_mode.connected.is_set():
+                break
+            time.sleep(0.01)
+    if acked is None or handled is None:
+        return None
+    return acked - start, handled - start
+
+
+def median_ms(values):
+    return statistics.median(values) * 1000 if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--timeout', type=float, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    socket_mode = FakeSocketMode().start()
+    slack = FakeSlack(socket_mode=socket_mode).start()
+    failed = False
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            interpreter = [0.0] * args.runs
+            for run in range(args.runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, '-c', 'pass'], check=True)
+                interpreter[run] = time.perf_counter() - start
+            print(f"interpretador (python -c pass): {median_ms(interpreter):.0f} ms; medianas de {args.runs} rodadas\n")
+            print(f"{'modo':<15}{'import bot':>11}{'DailyBot()':>12}{'1º ack':>10}{'1º evento':>11}  dependências carregadas")
+
+            for mode in args.modes.split(','):
+                db_path = os.path.join(tmpdir, f'{mode}.db')
+                # Banco já existente, como num container com volume persistente
+                probe(base_env(mode, slack, db_path))
+                probes = [probe(base_env(mode, slack, db_path)) for _ in range(args.runs)]
+                acks, handled = [], []
+                with open(os.path.join(tmpdir, f'{mode}.log'), 'w') as log:
+                    for _ in range(args.runs):
+                        result = first_event(mode, base_env(mode, slack, db_path), slack, socket_mode,
+                                             args.timeout, log)
+                        if result:
+                            acks.append(result[0])
+                            handled.append(result[1])
+                modules = ', '.join(probes[-1]['modules']) or '-'
+                print(f"{mode:<15}{median_ms([p['import'] for p in probes]):>9.0f}ms"
+                      f"{median_ms([p['init'] for p in probes]):>10.0f}ms"
+                      f"{median_ms(acks):>8.0f}ms{median_ms(handled):>9.0f}ms  {modules}")
+                if len(handled) < args.runs:
+                    print(f"  {args.runs - len(handled)} rodada(s) sem evento processado "
+                          f"em {args.timeout:.0f}s (log em {mode}.log):")
+                    with open(os.path.join(tmpdir, f'{mode}.log')) as log:
+                        errors = [line.rstrip() for line in log if 'Error' in line or 'ERROR' in line]
+                    for line in errors[-3:]:
+                        print(f"    {line}")
+                    failed = True
+    finally:
+        slack.stop()
+        socket_mode.stop()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
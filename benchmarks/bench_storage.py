@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: conexão por chamada (padrão antigo) vs pool persistente
+
+Uso: python benchmarks/bench_storage.py [--ops 2000]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage, ConnectionPool, pragmas_from_env
+
+
+def per_call_insert(path, date, message):
+    """Reproduz o padrão antigo: connect/insert/commit/close a cada chamada"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO daily_messages (date, message) VALUES (?, ?)", (date, message))
+    conn.commit()
+    conn.close()
+
+
+def per_call_select(path, date):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT message FROM daily_messages WHERE date = ? ORDER BY timestamp", (date,))
+    rows = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return rows
+
+
+def rate(ops, elapsed):
+    return ops / elapsed if elapsed else float('inf')
+
+
+def run(ops, tmpdir):
+    date = '2024-01-01'
+    results = {}
+
+    # Padrão antigo (journal padrão, nova conexão por operação)
+    old_path = os.path.join(tmpdir, 'per_call.db')
+    Storage(ConnectionPool(old_path, size=1)).init_schema()
+
+    start = time.perf_counter()
+    for i in range(ops):
+        per_call_insert(old_path, date, f"mensagem {i}")
+    results['per_call_insert'] = rate(ops, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        per_call_select(old_path, '2024-01-02')
+    results['per_call_read'] = rate(ops, time.perf_counter() - start)
+
+    # Pool persistente com WAL e pragmas configuráveis
+    storage = Storage(ConnectionPool(os.path.join(tmpdir, 'pooled.db'), pragmas=pragmas_from_env()))
+    storage.init_schema()
+
+    start = time.perf_counter()
+    for i in range(ops):
+        storage.insert_message('U0001', 'C0001', date, f"mensagem {i}")
+    results['pooled_insert'] = rate(ops, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        storage.get_messages('U0001', '2024-01-02')
+    results['pooled_read'] = rate(ops, time.perf_counter() - start)
+
+    storage.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ops', type=int, default=2000, help='operações por cenário')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = run(args.ops, tmpdir)
+
+    print(f"{'cenário':<20}{'ops/s':>12}")
+    for name, value in results.items():
+        print(f"{name:<20}{value:>12.0f}")
+    print(f"speedup insert: {results['pooled_insert'] / results['per_call_insert']:.1f}x")
+    print(f"speedup leitura: {results['pooled_read'] / results['per_call_read']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: importação/exportação em massa do histórico (python bot.py import/export)
+
+Gera um NDJSON com N mensagens (em fluxo, sem montar a lista em memória),
+importa num banco vazio em lotes com executemany, exporta de volta e mede
+linhas/s e o pico de memória do processo. Para comparar, importa uma amostra
+linha a linha com Storage.insert_message, como no caminho dos eventos (uma
+transação por linha).
+
+Uso: python benchmarks/bench_transfer.py [--rows 10000000] [--batch 5000] [--format ndjson]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ('deploy revisão reunião bug correção teste documentação refatoração '
+         'cliente migração pipeline monitoramento alerta banco cache fila').split()
+
+
+def generate(path, rows, users=500):
+    """Arquivo de exportação com `rows` mensagens de `users` usuários"""
+    import transfer
+
+    rng = random.Random(42)
+    first = date.today() - timedelta(days=rows // (users * 3) + 1)
+
+    def records():
+        for index in range(rows):
+            day = (first + timedelta(days=index // (users * 3))).isoformat()
+            text = ' '.join(rng.choice(WORDS) for _ in range(6))
+            yield (index + 1, f'U{index % users:05d}', 'C0001', day, text, f'{day} 09:00:00')
+
+    fmt = transfer.detect_format(path)
+    with open(path, 'w', encoding='utf-8', newline='') as stream:
+        transfer.WRITERS[fmt](records(), stream, 'messages')
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--sample', type=int, default=20000,
+                        help='linhas importadas uma a uma para comparação')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['DB_PATH'] = os.path.join(tmpdir, 'transfer.db')
+        import transfer
+        from storage import Storage
+
+        source = os.path.join(tmpdir, f'source.{args.format}')
+        start = time.perf_counter()
+        generate(source, args.rows)
+        size_mb = os.path.getsize(source) / 1e6
+        print(f"{args.rows} mensagens geradas ({size_mb:.0f} MB {args.format}) "
+              f"em {time.perf_counter() - start:.1f}s")
+        baseline_mb = max_rss_mb()
+
+        storage = Storage.from_env()
+        storage.init_schema()
+
+        # Antes: uma linha por chamada, cada uma na própria transação
+        with open(source, encoding='utf-8', newline='') as stream:
+            rows = transfer.READERS[args.format](stream, 'messages')
+            start = time.perf_counter()
+            for count, row in enumerate(rows, 1):
+                storage.insert_message(row[1], row[2], row[3], row[4])
+                if count >= args.sample:
+                    break
+            single_rate = count / (time.perf_counter() - start)
+        with storage.pool.connection() as conn, conn:
+            conn.execute("DELETE FROM daily_messages")
+
+        with open(source, encoding='utf-8', newline='') as stream:
+            start = time.perf_counter()
+            imported = transfer.import_table(storage, 'messages', stream, args.format, args.batch)
+            import_s = time.perf_counter() - start
+        import_mb = max_rss_mb()
+
+        target = os.path.join(tmpdir, f'export.{args.format}')
+        with open(target, 'w', encoding='utf-8', newline='') as stream:
+            start = time.perf_counter()
+            exported = transfer.export_table(storage, 'messages', stream, args.format, args.batch)
+            export_s = time.perf_counter() - start
+        export_mb = max_rss_mb()
+        storage.close()
+
+        with open(source, 'rb') as a, open(target, 'rb') as b:
+            identical = all(x == y for x, y in zip(a, b)) and os.path.getsize(source) == os.path.getsize(target)
+
+        print(f"linha a linha (amostra de {args.sample}): {single_rate:>10.0f} linhas/s")
+        print(f"importação em lotes de {args.batch}:     {imported / import_s:>10.0f} linhas/s "
+              f"({imported} linhas em {import_s:.1f}s)")
+        print(f"exportação:                       {exported / export_s:>10.0f} linhas/s "
+              f"({exported} linhas em {export_s:.1f}s)")
+        print(f"pico de memória (RSS): {baseline_mb:.0f} MB antes, {import_mb:.0f} MB após importar, "
+              f"{export_mb:.0f} MB após exportar")
+        print("exportação idêntica ao arquivo importado" if identical else "exportação DIFERENTE do importado")
+        return 0 if identical and imported == exported == args.rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Slack falso para benchmarks: Web API com latência e rate limit (429)
+injetados e um servidor de Socket Mode (WebSocket) que entrega envelopes
+
+Aponte o bot para ele com SLACK_API_URL=http://127.0.0.1:<porta>/api/; com
+FakeSlack(socket_mode=FakeSocketMode().start()), o apps.connections.open
+devolve a URL ws:// local.
+"""
+
+import json
+import time
+import asyncio
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+
+class FakeSlack:
+    """Servidor HTTP local que responde aos métodos usados pelo bot"""
+
+    def __init__(self, latency=0.0, bot_names=None, port=0, rate_limited=None, retry_after=1,
+                 socket_mode=None):
+        self.latency = latency
+        self.socket_mode = socket_mode
+        self.bot_names = bot_names or {}
+        self.calls = Counter()
+        # Método -> quantas das primeiras chamadas respondem 429 com Retry-After
+        self.rate_limited = Counter(rate_limited or {})
+        self.retry_after = retry_after
+        self.throttled = Counter()
+        self.posts = []  # parâmetros de cada chat.postMessage
+        self._lock = threading.Lock()
+        self._ts = 0
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8')
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params = json.loads(body or '{}')
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body).items()}
+
+                if fake.throttle(method):
+                    data = json.dumps({'ok': False, 'error': 'ratelimited'}).encode('utf-8')
+                    self.send_response(429)
+                    self.send_header('Retry-After', str(fake.retry_after))
+                else:
+                    data = json.dumps(fake.respond(method, params)).encode('utf-8')
+                    self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+
+    def throttle(self, method):
+        """Consumir uma das respostas 429 configuradas para o método"""
+        with self._lock:
+            if self.rate_limited[method] > 0:
+                self.rate_limited[method] -= 1
+                self.throttled[method] += 1
+                return True
+            return False
+
+    def respond(self, method, params):
+        """Montar a resposta de um método da API"""
+        with self._lock:
+            self.calls[method] += 1
+            if method == 'chat.postMessage':
+                self.posts.append(params)
+            self._ts += 1
+            ts = f"{time.time():.0f}.{self._ts:06d}"
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == 'bots.info':
+            bot_id = params.get('bot', '')
+            return {'ok': True, 'bot': {'id': bot_id, 'name': self.bot_names.get(bot_id, bot_id)}}
+        if method in ('chat.postMessage', 'chat.update'):
+            return {'ok': True, 'channel': params.get('channel'), 'ts': params.get('ts') or ts}
+        if method == 'apps.connections.open' and self.socket_mode:
+            return {'ok': True, 'url': self.socket_mode.url}
+        if method == 'auth.test':
+            return {'ok': True, 'user_id': 'UBOT', 'bot_id': 'BBOT'}
+        return {'ok': True}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeSocketMode:
+    """Servidor WebSocket local no lugar do Socket Mode do Slack
+
+    `send(envelope)` entrega um envelope ao bot conectado sem bloquear; cada
+    ack (mensagem com o envelope_id) chama `on_ack(envelope_id, payload)`.
+    Requer aiohttp.
+    """
+
+    def __init__(self, on_ack=None):
+        self.on_ack = on_ack
+        self.connected = threading.Event()
+        self.acks = 0
+        self._loop = asyncio.new_event_loop()
+        self._sockets = []
+        self._runner = None
+        self._port = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self._port}/link"
+
+    async def _handle(self, request):
+        from aiohttp import web, WSMsgType
+
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({
+            'type': 'hello', 'num_connections': len(self._sockets) + 1,
+            'connection_info': {'app_id': 'ABENCH'},
+        }))
+        self._sockets.append(ws)
+        self.connected.set()
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                if 'envelope_id' in data:
+                    self.acks += 1
+                    if self.on_ack:
+                        self.on_ack(data['envelope_id'], data.get('payload'))
+        finally:
+            self._sockets.remove(ws)
+            if not self._sockets:
+                self.connected.clear()
+        return ws
+
+    async def _start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get('/link', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self._port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def send(self, envelope):
+        """Entregar o envelope na conexão mais recente (sem esperar o envio)"""
+        data = json.dumps(envelope)
+
+        async def deliver():
+            if self._sockets:
+                await self._sockets[-1].send_str(data)
+
+        asyncio.run_coroutine_threadsafe(deliver(), self._loop)
+
+    def stop(self):
+        async def shutdown():
+            for ws in list(self._sockets):
+                await ws.close()
+            await self._runner.cleanup()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
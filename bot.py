@@ -1,4 +1,3 @@
-@ -0,0 +1,658 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
@@ -6,29 +5,47 @@ Bot Slack para armazenar mensagens diárias e responder à daily
 """
 
 import os
-import sqlite3
-import schedule
 import time
+import argparse
 import threading
-import hashlib
-import hmac
-from datetime import datetime, time as dt_time
-from slack_sdk import WebClient
-from slack_sdk.socket_mode import SocketModeClient
-from slack_sdk.socket_mode.request import SocketModeRequest
-from slack_sdk.socket_mode.response import SocketModeResponse
-from flask import Flask, request, jsonify
-from pyngrok import ngrok
+from datetime import datetime
 import logging
-import json
+from functools import partial
+from urllib.parse import parse_qs
 from typing import Optional
+from slack_sdk.errors import SlackApiError
+import metrics
+import transfer
+import retention
+from slack_client import InstrumentedWebClient
+from storage import open_storage
+from writer import GroupCommitWriter
+from dispatcher import EventDispatcher
+from cache import TTLCache, MISSING
+from digest import Digest, DigestCache
+from render import DigestRenderer
+from dedup import EventDeduplicator, event_key
+from event_filter import EventFilter
+from outbound import OutboundClient
+from subscriptions import SubscriptionRegistry
+from signing import SignatureVerifier, json_loads
+from history import HistoryService, QueryError, stream_page
+from retention import Retention
+from responses import DailyResponses
+from scheduler import Scheduler, get_timezone
+from leader import LeaderElection
+from logging_config import configure_logging, log_payload
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Configurar logging (níveis por componente via LOG_LEVELS, ex: "bot.events=DEBUG")
+configure_logging()
+logger = logging.getLogger('bot')
+# Caminho quente de eventos: por padrão só loga o que importa em INFO
+event_logger = logging.getLogger('bot.events')
 
 class DailyBot:
     def __init__(self):
+        self.created_at = time.perf_counter()
+        
         # Carregar configurações
         # self.bot_token = os.getenv('SLACK_BOT_TOKEN')
         self.bot_token = os.getenv('SLACK_BOT_TOKEN')
@@ -38,29 +55,74 @@ class DailyBot:
         self.user_id = os.getenv('USER_ID')
         self.daily_bot_name = os.getenv('DAILY_BOT_NAME', 'Slackbot')
         
+        # Cache de identidade dos bots (evita chamar bots_info a cada mensagem)
+        self.bot_cache = TTLCache(
+            maxsize=int(os.getenv('BOT_CACHE_SIZE', 256)),
+            ttl=float(os.getenv('BOT_CACHE_TTL', 3600))
+        )
+        self.bot_cache_negative_ttl = float(os.getenv('BOT_CACHE_NEGATIVE_TTL', 300))
+        self.bot_cache_persist = os.getenv('BOT_CACHE_PERSIST', 'True').lower() == 'true'
+        
         # Configurações do ngrok
         self.use_ngrok = os.getenv('USE_NGROK', 'False').lower() == 'true'
         self.ngrok_auth_token = os.getenv('NGROK_AUTH_TOKEN')
         self.webhook_mode = os.getenv('WEBHOOK_MODE', 'False').lower() == 'true'
         self.port = int(os.getenv('PORT', 3000))
         
+        # Runtime: "threaded" (Flask/threads) ou "async" (asyncio/aiohttp)
+        self.runtime = os.getenv('RUNTIME', 'threaded').lower()
+        
+        # Servidor HTTP do Webhook Mode: "dev" (app.run do Flask) ou "gunicorn"
+        self.server = os.getenv('SERVER', 'dev').lower()
+        
+        # Fuso horário padrão dos usuários (ex: America/Sao_Paulo); vazio = horário do sistema
+        self.timezone = get_timezone(os.getenv('TIMEZONE'))
+        
+        # Porta do /metrics no Socket Mode (no Webhook Mode fica no próprio servidor)
+        self.metrics_port = int(os.getenv('METRICS_PORT', 0)) or None
+        
         # Validar configurações baseadas no modo
+        # (usuários/canais são validados depois, ao carregar as assinaturas)
         if self.webhook_mode:
-            if not all([self.bot_token, self.signing_secret, self.channel_id, self.user_id]):
+            if not all([self.bot_token, self.signing_secret]):
                 raise ValueError("Configurações obrigatórias para Webhook Mode não encontradas.")
         else:
-            if not all([self.bot_token, self.app_token, self.channel_id, self.user_id]):
+            if not all([self.bot_token, self.app_token]):
                 raise ValueError("Configurações obrigatórias para Socket Mode não encontradas.")
         
+        # Validação das requisições do /events (janela do timestamp + HMAC)
+        self.verifier = SignatureVerifier.from_env(self.signing_secret)
+        
         # Inicializar clientes Slack
-        self.client = WebClient(token=self.bot_token)
+        # SLACK_API_URL permite apontar para um Slack falso em benchmarks
+        self.client = InstrumentedWebClient(
+            token=self.bot_token,
+            base_url=os.getenv('SLACK_API_URL', InstrumentedWebClient.BASE_URL)
+        )
+        
+        # Envios com rate limit por método, retry após 429 e debounce das confirmações
+        self.outbound = OutboundClient.from_env(self.client)
+        # Editar a confirmação já enviada no DM em vez de postar outra
+        self.dm_confirmation_update = os.getenv('DM_CONFIRMATION_UPDATE', 'True').lower() == 'true'
+        self.dm_confirmations = {}  # user_id -> (data, canal do DM, ts da confirmação)
+        self.dm_lock = threading.Lock()
+        
+        # Eventos são confirmados na hora e processados por um pool de workers
+        self.dispatcher = EventDispatcher.from_env(self.handle_message)
         
         # Inicializar Flask app se usando webhook mode
-        if self.webhook_mode:
+        # (no runtime async os clientes e o servidor são criados pelo AsyncRuntime).
+        # Imports tardios: cada modo só carrega o que usa (o Flask sozinho leva
+        # ~70 ms de import, o que pesa no cold start dos containers)
+        if self.runtime == 'async':
+            pass
+        elif self.webhook_mode:
+            from flask import Flask
             self.app = Flask(__name__)
             self.setup_flask_routes()
         else:
             if self.app_token:  # Verificar se app_token não é None
+                from slack_sdk.socket_mode import SocketModeClient
                 self.socket_client = SocketModeClient(
                     app_token=self.app_token,
                     web_client=self.client
@@ -70,148 +132,189 @@ class DailyBot:
             else:
                 raise ValueError("APP_TOKEN é obrigatório para Socket Mode")
         
-        # Inicializar banco de dados
+        # Inicializar banco de dados (pool compartilhado por Flask, Socket Mode e scheduler):
+        # SQLite em DB_PATH ou PostgreSQL em DATABASE_URL (réplicas compartilhando o banco)
+        self.storage = open_storage()
         self.init_database()
         
-        # Variável para controlar se já respondeu à daily hoje
-        self.daily_responded_today = False
+        # Mensagens dos workers gravadas em lotes por uma única thread (group commit)
+        self.writer = GroupCommitWriter.from_env(self.storage)
+        
+        # Digest do dia por usuário, atualizado a cada mensagem armazenada.
+        # Com gunicorn ou PostgreSQL outros processos também gravam: as leituras buscam as linhas novas
+        self.digests = DigestCache.from_env(self.storage, server=self.server)
+        
+        # Descarte de eventos reenviados pelo Slack (memória + tabela processed_events)
+        self.dedup = EventDeduplicator.from_env(self.storage)
+        
+        # Usuários/canais atendidos por este processo
+        self.subscriptions = SubscriptionRegistry.load(self.storage)
+        if not len(self.subscriptions):
+            raise ValueError(
+                "Nenhum usuário configurado: defina USER_ID e SLACK_CHANNEL_ID, "
+                "SUBSCRIPTIONS_FILE ou cadastre na tabela subscriptions."
+            )
+        
+        # Templates do digest por usuário (resposta, confirmação no DM e lembrete),
+        # com as renderizações em cache até chegar mensagem nova
+        self.renderer = DigestRenderer.from_env(self.subscriptions)
+        
+        # Descarte antecipado de edições, entradas, threads e de quem não é assinante
+        self.event_filter = EventFilter.from_env(self.subscriptions)
+        
+        # Daily respondida por usuário/dia: reserva atômica na tabela
+        # daily_responses (compartilhada entre processos) com cache local
+        self.responses = DailyResponses.from_env(self.storage)
+        
+        # Consultas ao histórico (/history, /search e slash command)
+        self.history = HistoryService.from_env(self.storage)
+        
+        # Retenção: arquiva os dias antigos e compacta o banco (job diário fora do horário de uso)
+        self.retention = Retention.from_env(self.storage)
+        self.retention_at = os.getenv('RETENTION_AT', '03:30')
+        metrics.DB_SIZE_BYTES.set_function(lambda: self.storage.db_size()[0])
+        
+        # Jobs diários (criados no start). Com várias réplicas no mesmo banco,
+        # só a que detém o lease "scheduler" os executa
+        self.leader = LeaderElection.from_env(self.storage)
+        self.scheduler: Optional[Scheduler] = None
         
         # URL do ngrok (será definida quando iniciado)
         self.ngrok_url: Optional[str] = None
         
-    def init_database(self):
-        """Inicializar banco de dados SQLite"""
-        conn = sqlite3.connect('messages.db')
-        cursor = conn.cursor()
-        
-        # Tabela para armazenar mensagens diárias
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                message TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabela para controlar respostas à daily
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                response_sent BOOLEAN DEFAULT FALSE,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Sinalizado quando o bot já pode receber eventos (servidor escutando
+        # ou Socket Mode conectado); o /health expõe como "ready"
+        self.ready = threading.Event()
         
-        conn.commit()
-        conn.close()
-        logger.info("Banco de dados inicializado com sucesso")
+    def init_database(self):
+        """Inicializar banco de dados (SQLite ou PostgreSQL)"""
+        self.storage.init_schema(default_user_id=self.user_id)
+        logger.info("Banco de dados (%s) inicializado com sucesso", self.storage.backend)
     
+    @metrics.timed(metrics.SIGNATURE_SECONDS)
     def verify_slack_signature(self, request_body, timestamp, signature):
-        """Verificar assinatura do Slack para webhook"""
-        if not self.signing_secret:
-            return False
-            
-        # Criar string de verificação
-        sig_basestring = f'v0:{timestamp}:{request_body.decode("utf-8")}'
-        
-        # Criar hash HMAC
-        my_signature = 'v0=' + hmac.new(
-            self.signing_secret.encode('utf-8'),
-            sig_basestring.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        
-        # Comparar assinaturas
-        return hmac.compare_digest(my_signature, signature)
+        """Verificar assinatura do Slack para webhook (HMAC direto sobre os bytes do corpo)"""
+        return self.verifier.verify(request_body, timestamp, signature)
     
     def setup_flask_routes(self):
         """Configurar rotas Flask para webhook mode"""
+        from flask import Response, request, jsonify
         
         @self.app.route('/events', methods=['POST'])
         def slack_events():
             """Endpoint para receber eventos do Slack"""
+            start = time.perf_counter()
+            result = 'error'
             try:
-                # Log da requisição recebida
-                logger.info("Requisição recebida no /events")
-                logger.info(f"Headers: {dict(request.headers)}")
-                
-                # Obter dados brutos da requisição
-                raw_body = request.get_data()
                 timestamp = request.headers.get('X-Slack-Request-Timestamp')
                 signature = request.headers.get('X-Slack-Signature')
                 
-                logger.info(f"Body size: {len(raw_body)}, Timestamp: {timestamp}")
-                logger.info(f"Body content: {raw_body.decode('utf-8')[:200]}...")
+                # Timestamp fora da janela (replay ou lixo): rejeitar sem ler o corpo.
+                # Rejeições são contadas nas métricas; o log fica em DEBUG para
+                # uma enxurrada de requisições inválidas não custar um log cada
+                if not self.verifier.fresh(timestamp):
+                    event_logger.debug("Timestamp fora da janela: %s", timestamp)
+                    result = 'stale'
+                    return jsonify({'error': 'Stale request'}), 401
+                
+                # Assinatura sobre os bytes brutos, antes de qualquer parsing
+                # (inclusive do challenge, que o Slack também assina)
+                raw_body = request.get_data()
+                if not self.verify_slack_signature(raw_body, timestamp, signature):
+                    event_logger.debug("Assinatura inválida (%d bytes)", len(raw_body))
+                    result = 'invalid'
+                    return jsonify({'error': 'Invalid signature'}), 401
                 
-                # Verificar assinatura (apenas se não for challenge)
                 try:
-                    event_data = json.loads(raw_body.decode('utf-8'))
-                except json.JSONDecodeError as e:
-                    logger.error(f"Erro ao decodificar JSON: {e}")
+                    event_data = json_loads(raw_body)
+                except ValueError as e:
+                    event_logger.error("Erro ao decodificar JSON: %s", e)
+                    result = 'invalid'
                     return jsonify({'error': 'Invalid JSON'}), 400
                 
                 # Verificar URL challenge (configuração inicial)
                 if 'challenge' in event_data:
                     logger.info("Challenge recebido, retornando challenge")
+                    result = 'challenge'
                     return jsonify({'challenge': event_data['challenge']})
                 
-                # Validar assinatura para eventos reais
-                if not self.verify_slack_signature(raw_body, timestamp, signature):
-                    logger.error("Assinatura inválida!")
-                    return jsonify({'error': 'Invalid signature'}), 401
+                # Reenvio de um evento não confirmado a tempo
+                retry_num = request.headers.get('X-Slack-Retry-Num')
+                if retry_num:
+                    metrics.EVENT_RETRIES.labels('webhook').inc()
+                    event_logger.debug("Retry %s do Slack: %s", retry_num, request.headers.get('X-Slack-Retry-Reason'))
                 
-                logger.info("Assinatura válida, processando evento")
-                logger.info(f"Evento completo: {json.dumps(event_data, indent=2)}")
-                
-                # Processar evento
+                # Processar evento (eventos irrelevantes param no filtro, antes de qualquer log)
+                result = 'ignored'
                 if 'event' in event_data:
                     event = event_data['event']
-                    logger.info(f"Tipo do evento: {event.get('type')}")
-                    logger.info(f"Detalhes do evento: {event}")
                     
-                    if event.get('type') == 'message':
-                        self.handle_message(event)
+                    if not self.event_filter.accept(event):
+                        result = 'filtered'
                     else:
-                        logger.info(f"Evento ignorado: {event.get('type')}")
+                        log_payload(event_logger, "Evento completo", event_data)
+                        # Fila cheia: não confirmar para o Slack reenviar depois
+                        if not self.dispatch_event(event, event_data.get('event_id')):
+                            result = 'rejected'
+                            return jsonify({'error': 'Busy'}), 503
+                        result = 'accepted'
                 
                 return jsonify({'status': 'ok'})
                 
             except Exception as e:
-                logger.error(f"Erro no endpoint /events: {e}")
-                logger.error(f"Traceback: ", exc_info=True)
+                event_logger.error("Erro no endpoint /events: %s", e, exc_info=True)
                 return jsonify({'error': str(e)}), 500
+            finally:
+                metrics.EVENTS_RECEIVED.labels('webhook', result).inc()
+                metrics.EVENT_ACK_SECONDS.labels('webhook').observe(time.perf_counter() - start)
+        
+        def history_response(query):
+            """Página do histórico em JSON gerado em partes; exige HISTORY_API_TOKEN"""
+            if not self.history.authorized(request.headers.get('Authorization')):
+                return jsonify({'error': 'Unauthorized'}), 401
+            args = request.args
+            try:
+                page = query(args.get('user_id'), start=args.get('from'), end=args.get('to'),
+                             cursor=args.get('cursor'), limit=args.get('limit'))
+            except QueryError as e:
+                return jsonify({'error': str(e)}), 400
+            return Response(stream_page(page), mimetype='application/json')
+        
+        @self.app.route('/history', methods=['GET'])
+        def history():
+            """Mensagens de um usuário por período: ?user_id=&from=&to=&cursor=&limit="""
+            return history_response(self.history.history)
+        
+        @self.app.route('/search', methods=['GET'])
+        def search():
+            """Busca textual no histórico de um usuário: ?user_id=&q=&from=&to=&cursor=&limit="""
+            return history_response(partial(self.history.search, text=request.args.get('q')))
+        
+        @self.app.route('/commands', methods=['POST'])
+        def slash_command():
+            """Slash command (ex: /daily historico, /daily buscar) do próprio usuário"""
+            timestamp = request.headers.get('X-Slack-Request-Timestamp')
+            signature = request.headers.get('X-Slack-Signature')
+            raw_body = request.get_data()
+            if not self.verifier.fresh(timestamp) or not self.verify_slack_signature(raw_body, timestamp, signature):
+                return jsonify({'error': 'Invalid signature'}), 401
+            form = {key: values[0] for key, values in parse_qs(raw_body.decode('utf-8')).items()}
+            return jsonify(self.command_response(form.get('user_id'), form.get('text')))
         
         @self.app.route('/health', methods=['GET'])
         def health_check():
             """Endpoint para verificação de saúde"""
-            return jsonify({
-                'status': 'ok',
-                'mode': 'webhook' if self.webhook_mode else 'socket',
-                'ngrok_url': self.ngrok_url,
-                'timestamp': datetime.now().isoformat()
-            })
+            return jsonify(self.health_payload())
         
         @self.app.route('/status', methods=['GET'])
         def status():
             """Endpoint para verificar status do bot"""
-            today = datetime.now().date().isoformat()
-            messages = self.get_today_messages()
-            
-            return jsonify({
-                'date': today,
-                'messages_today': len(messages),
-                'daily_responded': self.daily_responded_today,
-                'mode': 'webhook' if self.webhook_mode else 'socket',
-                'ngrok_url': self.ngrok_url,
-                'config': {
-                    'channel_id': self.channel_id,
-                    'user_id': self.user_id,
-                    'webhook_mode': self.webhook_mode,
-                    'use_ngrok': self.use_ngrok
-                }
-            })
+            return jsonify(self.status_payload())
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics_endpoint():
+            """Métricas no formato do Prometheus"""
+            return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
         
         @self.app.route('/debug', methods=['GET'])
         def debug():
@@ -240,14 +343,75 @@ class DailyBot:
         def test():
             """Endpoint para testar recebimento de dados"""
             logger.info("=== ENDPOINT DE TESTE ===")
-            logger.info(f"Headers: {dict(request.headers)}")
-            logger.info(f"Body: {request.get_data()}")
+            logger.info("Headers: %s", dict(request.headers))
+            logger.info("Body: %r", request.get_data())
             
             return jsonify({'status': 'test_ok', 'received': True})
     
+    def command_response(self, user_id, text):
+        """Resposta (só para quem chamou) do slash command de histórico"""
+        return {'response_type': 'ephemeral', 'text': self.history.command(user_id, text)}
+    
+    def health_payload(self):
+        """Conteúdo do /health (compartilhado pelos runtimes)"""
+        return {
+            'status': 'ok',
+            'mode': 'webhook' if self.webhook_mode else 'socket',
+            'runtime': self.runtime,
+            'ready': self.ready.is_set(),
+            'ngrok_url': self.ngrok_url,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def status_payload(self, dispatcher=None):
+        """Conteúdo do /status (compartilhado pelos runtimes)"""
+        users = [
+            {
+                'user_id': subscription.user_id,
+                'channel_id': subscription.channel_id,
+                'timezone': subscription.timezone,
+                'messages_today': len(self.get_today_digest(subscription.user_id)),
+                'daily_responded': self.has_responded_today(subscription.user_id, self.today(subscription.user_id))
+            }
+            for subscription in self.subscriptions
+        ]
+        
+        return {
+            'date': self.today(),
+            'users': users,
+            'dispatcher': (dispatcher or self.dispatcher).stats(),
+            'bot_cache': self.bot_cache.stats(),
+            'digest_cache': self.digests.stats(),
+            'renderer': self.renderer.stats(),
+            'dedup': self.dedup.stats(),
+            'writer': self.writer.stats(),
+            'event_filter': self.event_filter.stats(),
+            'outbound': self.outbound.stats(),
+            'daily_responses': self.responses.stats(),
+            'scheduler': self.scheduler.stats() if self.scheduler else None,
+            'leader': self.leader.stats() if self.scheduler else None,
+            'retention': self.retention.stats(),
+            'mode': 'webhook' if self.webhook_mode else 'socket',
+            'runtime': self.runtime,
+            'ngrok_url': self.ngrok_url,
+            'config': {
+                'channel_id': self.channel_id,
+                'user_id': self.user_id,
+                'webhook_mode': self.webhook_mode,
+                'use_ngrok': self.use_ngrok
+            }
+        }
+    
+    def mark_ready(self):
+        """Sinalizar que o bot já recebe eventos"""
+        self.ready.set()
+        logger.info("Bot pronto para receber eventos em %.2fs", time.perf_counter() - self.created_at)
+    
     def setup_ngrok(self):
         """Configurar e iniciar túnel ngrok"""
         try:
+            from pyngrok import ngrok
+            
             # Autenticar se token fornecido
             if self.ngrok_auth_token:
                 ngrok.set_auth_token(self.ngrok_auth_token)
@@ -268,308 +432,394 @@ class DailyBot:
     
     def process_events(self, client, req):
         """Processar eventos do Slack"""
+        start = time.perf_counter()
+        result = 'ignored'
         try:
+            accepted = True
+            payload = None
             if req.type == "events_api":
                 event = req.payload.get("event", {})
+                if req.retry_attempt:
+                    metrics.EVENT_RETRIES.labels('socket').inc()
                 
-                # Processar mensagens
-                if event.get("type") == "message":
-                    self.handle_message(event)
+                # Enfileirar mensagens relevantes para os workers
+                if not self.event_filter.accept(event):
+                    result = 'filtered'
+                else:
+                    accepted = self.dispatch_event(event, req.payload.get("event_id"))
+                    result = 'accepted' if accepted else 'rejected'
+            
+            elif req.type == "slash_commands":
+                # Resposta vai junto com o ack
+                payload = self.command_response(req.payload.get("user_id"), req.payload.get("text"))
+                result = 'command'
                     
-            # Sempre responder ao Slack para confirmar recebimento
-            response = SocketModeResponse(envelope_id=req.envelope_id)
-            client.send_socket_mode_response(response)
+            # Confirmar recebimento imediatamente; se a fila estiver cheia,
+            # não confirmar para que o Slack reenvie o evento
+            if accepted:
+                from slack_sdk.socket_mode.response import SocketModeResponse
+                response = SocketModeResponse(envelope_id=req.envelope_id, payload=payload)
+                client.send_socket_mode_response(response)
+                metrics.EVENT_ACK_SECONDS.labels('socket').observe(time.perf_counter() - start)
             
         except Exception as e:
-            logger.error(f"Erro ao processar evento: {e}")
+            result = 'error'
+            event_logger.error("Erro ao processar evento: %s", e)
+        finally:
+            metrics.EVENTS_RECEIVED.labels('socket', result).inc()
+    
+    def dispatch_event(self, event, event_id=None):
+        """Enviar evento para a fila de processamento"""
+        # Repetição recente: confirmar sem processar de novo
+        dedup_key = event_key(event, event_id)
+        if not self.dedup.check_in(dedup_key):
+            event_logger.debug("Evento duplicado ignorado: %s", dedup_key)
+            return True
+        
+        # Mesma chave para o mesmo usuário preserva a ordem das mensagens
+        key = event.get("user") or event.get("channel")
+        if self.dispatcher.submit(event, key):
+            return True
+        self.dedup.release(dedup_key)
+        return False
+    
+    def claim_event(self, event):
+        """Registrar o evento antes de armazenar/responder; False se já foi processado"""
+        if self.dedup.claim(event_key(event)):
+            return True
+        event_logger.debug("Evento já processado: %s", event_key(event))
+        return False
     
     def handle_message(self, event):
         """Processar mensagens recebidas"""
         try:
-            logger.info(f"=== PROCESSANDO MENSAGEM ===")
-            logger.info(f"Evento completo: {event}")
-            
-            # Log detalhado dos campos importantes
             user_id = event.get("user")
             bot_id = event.get("bot_id")
             channel = event.get("channel", "")
             text = event.get("text", "")
             
-            logger.info(f"User: {user_id}, Bot: {bot_id}, Channel: {channel}")
-            logger.info(f"Text: {text[:100]}...")
-            logger.info(f"User configurado: {self.user_id}")
-            logger.info(f"Canal configurado: {self.channel_id}")
+            # Argumentos só são formatados se o nível DEBUG estiver ativo
+            event_logger.debug("Mensagem: user=%s bot=%s channel=%s", user_id, bot_id, channel)
+            log_payload(event_logger, "Evento de mensagem", event)
             
             # Ignorar mensagens do próprio bot
             if bot_id:
-                logger.info(f"Mensagem de bot detectada: {bot_id}")
                 try:
                     # Verificar se é mensagem do bot da daily
-                    bot_info = self.client.bots_info(bot=bot_id)
-                    if (bot_info and 
-                        isinstance(bot_info, dict) and 
-                        "bot" in bot_info and 
-                        isinstance(bot_info["bot"], dict) and
-                        "name" in bot_info["bot"]):
-                        bot_name = bot_info["bot"]["name"].lower()
-                        logger.info(f"Nome do bot: {bot_name}")
-                        
+                    bot_name = self.resolve_bot_name(bot_id)
+                    if bot_name is not None:
                         if self.daily_bot_name.lower() in bot_name:
-                            logger.info("Bot da daily detectado, processando...")
-                            self.handle_daily_message(event)
+                            if not self.claim_event(event):
+                                return
+                            event_logger.info("Bot da daily detectado no canal %s", channel)
+                            # Responder por cada usuário cuja daily é neste canal
+                            for subscription in self.subscriptions.for_channel(channel):
+                                self.handle_daily_message(event, subscription)
                         else:
-                            logger.info(f"Bot ignorado: {bot_name}")
+                            event_logger.debug("Bot ignorado: %s", bot_name)
                     else:
-                        logger.info("Informações do bot não disponíveis")
+                        event_logger.debug("Informações do bot %s não disponíveis", bot_id)
                 except Exception as e:
-                    logger.error(f"Erro ao verificar bot info: {e}")
+                    event_logger.error("Erro ao verificar bot info: %s", e)
                 return
             
-            # Processar mensagens do usuário configurado (canal específico ou DM direto)
-            if user_id == self.user_id:
-                logger.info("Usuário correto detectado!")
-                
-                # Aceitar mensagens do canal configurado ou DM direto com o bot
-                if channel == self.channel_id:
-                    logger.info("Mensagem do canal configurado")
-                    self.store_user_message(text)
-                    logger.info(f"Mensagem processada do canal: {channel}")
-                elif channel.startswith("D"):
-                    logger.info("Mensagem de DM direto")
-                    self.store_user_message(text)
-                    logger.info(f"Mensagem processada do DM: {channel}")
+            # Processar mensagens de usuários cadastrados (canal da daily ou DM direto)
+            subscription = self.subscriptions.for_user(user_id)
+            if subscription:
+                # Aceitar mensagens do canal do usuário ou DM direto com o bot
+                if channel == subscription.channel_id or channel.startswith("D"):
+                    if self.claim_event(event):
+                        self.store_user_message(text, channel, user_id)
                 else:
-                    logger.info(f"Canal ignorado: {channel} (não é {self.channel_id} nem DM)")
+                    event_logger.debug("Canal ignorado: %s (não é %s nem DM)", channel, subscription.channel_id)
             else:
-                logger.info(f"Usuário ignorado: {user_id} (não é {self.user_id})")
+                event_logger.debug("Usuário ignorado: %s (não cadastrado)", user_id)
                 
         except Exception as e:
-            logger.error(f"Erro ao processar mensagem: {e}")
-            logger.error(f"Traceback: ", exc_info=True)
+            event_logger.error("Erro ao processar mensagem: %s", e, exc_info=True)
+    
+    def resolve_bot_name(self, bot_id):
+        """Obter o nome (minúsculo) de um bot: cache em memória, banco e por fim bots_info"""
+        bot_name = self.cached_bot_name(bot_id)
+        if bot_name is not MISSING:
+            return bot_name
+        
+        # Erros da API propagam e não são cacheados
+        return self.remember_bot_name(bot_id, self.outbound.call('bots.info', bot=bot_id))
+    
+    def cached_bot_name(self, bot_id):
+        """Nome do bot no cache em memória ou no banco; MISSING se precisar da API"""
+        bot_name = self.bot_cache.get(bot_id)
+        if bot_name is not MISSING:
+            return bot_name
+        
+        # Mapa persistido no banco sobrevive a reinícios
+        if self.bot_cache_persist:
+            row = self.storage.get_bot_identity(bot_id)
+            if row:
+                name, updated_at = row
+                ttl = self.bot_cache.ttl if name is not None else self.bot_cache_negative_ttl
+                remaining = updated_at + ttl - time.time()
+                if remaining > 0:
+                    self.bot_cache.set(bot_id, name, ttl=remaining)
+                    return name
+        
+        return MISSING
+    
+    def remember_bot_name(self, bot_id, bot_info):
+        """Extrair o nome da resposta do bots_info e guardar no cache"""
+        bot_name = None
+        if (bot_info and 
+            isinstance(bot_info.get("bot"), dict) and
+            "name" in bot_info["bot"]):
+            bot_name = bot_info["bot"]["name"].lower()
+        
+        # Bots sem informação ficam em cache negativo por menos tempo
+        ttl = self.bot_cache.ttl if bot_name is not None else self.bot_cache_negative_ttl
+        self.bot_cache.set(bot_id, bot_name, ttl=ttl)
+        if self.bot_cache_persist:
+            self.storage.save_bot_identity(bot_id, bot_name, time.time())
+        
+        return bot_name
     
-    def handle_daily_message(self, event):
+    def handle_daily_message(self, event, subscription):
         """Processar mensagem da daily e responder automaticamente"""
         try:
-            today = datetime.now().date().isoformat()
+            user_id = subscription.user_id
+            today = self.today(user_id)
             
-            # Verificar se já respondeu hoje
-            if self.daily_responded_today:
+            # Verificar se já respondeu hoje (normalmente sem tocar o banco)
+            if self.has_responded_today(user_id, today):
                 return
                 
-            # Buscar mensagens do usuário para hoje
-            messages = self.get_today_messages()
+            # Digest do dia já formatado
+            digest = self.get_today_digest(user_id)
             
-            if messages:
-                # Criar resposta baseada nas mensagens do dia
-                response = self.create_daily_response(messages)
-                
-                # Responder na thread da daily
-                if self.channel_id:
-                    self.client.chat_postMessage(
-                        channel=self.channel_id,
-                        thread_ts=event.get("ts"),
-                        text=response
-                    )
-                
-                # Marcar como respondido
-                self.mark_daily_as_responded(today)
-                self.daily_responded_today = True
+            # Reservar a resposta: só um worker/processo posta por usuário por dia
+            if digest and self.responses.claim(user_id, today):
+                posted = 0
+                try:
+                    # Responder na thread da daily (digests grandes em várias mensagens)
+                    for part in self.renderer.render(user_id, today, digest, 'reply'):
+                        self.outbound.call(
+                            'chat.postMessage',
+                            channel=subscription.channel_id,
+                            thread_ts=event.get("ts"),
+                            **part.message()
+                        )
+                        posted += 1
+                except Exception:
+                    # Nada enviado: liberar para a próxima mensagem da daily
+                    if not posted:
+                        self.responses.release(user_id, today)
+                    raise
                 
-                logger.info(f"Resposta à daily enviada para {today}")
+                logger.info("Resposta à daily de %s enviada para %s", user_id, today)
             
         except Exception as e:
-            logger.error(f"Erro ao responder à daily: {e}")
+            logger.error("Erro ao responder à daily: %s", e)
     
-    def store_user_message(self, message):
+    def store_user_message(self, message, channel, user_id):
         """Armazenar mensagem do usuário no banco"""
-        logger.info(f"=== ARMAZENANDO MENSAGEM ===")
-        logger.info(f"Mensagem recebida: '{message}'")
-        
         if not message.strip():
-            logger.warning("Mensagem vazia, ignorando")
+            event_logger.debug("Mensagem vazia de %s, ignorando", user_id)
             return
             
-        today = datetime.now().date().isoformat()
-        logger.info(f"Data atual: {today}")
+        today = self.today(user_id)
         
         try:
-            conn = sqlite3.connect('messages.db')
-            cursor = conn.cursor()
+            self.save_message(user_id, channel, today, message)
             
-            cursor.execute(
-                "INSERT INTO daily_messages (date, message) VALUES (?, ?)",
-                (today, message)
+            event_logger.info(
+                "Mensagem armazenada",
+                extra={'user_id': user_id, 'channel_id': channel, 'date': today}
             )
             
-            conn.commit()
-            conn.close()
-            
-            logger.info(f"✅ Mensagem armazenada para {today}: {message[:50]}...")
-            
-            # Enviar confirmação no DM
-            logger.info("Enviando confirmação no DM...")
-            self.send_dm_confirmation()
+            # Enviar confirmação no DM (uma só para uma rajada de mensagens)
+            self.outbound.debounce(user_id, partial(self.send_dm_confirmation, user_id))
             
         except Exception as e:
-            logger.error(f"Erro ao armazenar mensagem: {e}")
-            logger.error(f"Traceback: ", exc_info=True)
+            event_logger.error("Erro ao armazenar mensagem: %s", e, exc_info=True)
+    
+    def save_message(self, user_id, channel, date, message):
+        """Gravar a mensagem no banco e acrescentá-la ao digest do dia"""
+        future = self.writer.submit(user_id, channel, date, message)
+        try:
+            message_id = future.result(timeout=self.writer.timeout)
+        except Exception:
+            # Timeout ou erro: o commit ainda pode acontecer depois desta espera
+            self.digests.append_when_done(user_id, date, message, future)
+            raise
+        self.digests.append(user_id, date, message_id, message)
     
-    def send_dm_confirmation(self):
+    def send_dm_confirmation(self, user_id):
         """Enviar confirmação no DM mostrando como ficará a daily"""
         try:
-            logger.info("=== ENVIANDO CONFIRMAÇÃO DM ===")
-            
-            # Buscar todas as mensagens do dia atual
-            messages = self.get_today_messages()
-            logger.info(f"Mensagens encontradas: {len(messages)}")
-            logger.info(f"Mensagens: {messages}")
+            # Digest do dia atual (sem reler o banco)
+            digest = self.get_today_digest(user_id)
             
-            if messages:
-                daily_content = self.create_daily_response(messages)
-                logger.info(f"Conteúdo da daily: '{daily_content}'")
+            if digest:
+                # Montar mensagem de confirmação (prévia numa mensagem só)
+                confirmation, = self.renderer.render(user_id, self.today(user_id), digest, 'confirmation')
                 
-                # Montar mensagem de confirmação
-                confirmation = f"Beleza <@{self.user_id}>!\n\nEssa será sua daily de hoje:\n{daily_content}"
-                logger.info(f"Mensagem de confirmação: '{confirmation}'")
+                # Enviar no DM (canal direto com o usuário), editando a confirmação de hoje se houver
+                self.post_dm_confirmation(user_id, confirmation)
                 
-                # Enviar no DM (canal direto com o usuário)
-                logger.info(f"Enviando DM para usuário: {self.user_id}")
-                if self.user_id:
-                    response = self.client.chat_postMessage(
-                        channel=self.user_id,  # Enviar DM direto para o usuário
-                        text=confirmation
-                    )
-                    
-                    logger.info(f"Confirmação enviada no DM - Response: {response}")
+                event_logger.debug("Confirmação enviada no DM de %s (%d mensagens)", user_id, len(digest))
                 
             else:
-                logger.warning("Nenhuma mensagem encontrada, não enviando confirmação")
+                event_logger.warning("Nenhuma mensagem encontrada para %s, não enviando confirmação", user_id)
                 
         except Exception as e:
-            logger.error(f"Erro ao enviar confirmação no DM: {e}")
-            logger.error(f"Traceback: ", exc_info=True)
+            event_logger.error("Erro ao enviar confirmação no DM: %s", e, exc_info=True)
     
-    def get_today_messages(self):
-        """Buscar mensagens do usuário para hoje"""
-        today = datetime.now().date().isoformat()
-        logger.info(f"=== BUSCANDO MENSAGENS DO DIA ===")
-        logger.info(f"Data de busca: {today}")
+    def post_dm_confirmation(self, user_id, part):
+        """Atualizar a confirmação do dia no DM (chat.update) ou postar uma nova"""
+        today = self.today(user_id)
+        with self.dm_lock:
+            previous = self.dm_confirmations.get(user_id)
+        if self.dm_confirmation_update and previous and previous[0] == today:
+            try:
+                self.outbound.call('chat.update', channel=previous[1], ts=previous[2], **part.message())
+                return
+            except SlackApiError as e:
+                # Mensagem apagada ou não editável: postar uma nova
+                event_logger.debug("Não foi possível editar a confirmação de %s: %s", user_id, e)
+        
+        response = self.outbound.call('chat.postMessage', channel=user_id, **part.message())
+        with self.dm_lock:
+            self.dm_confirmations[user_id] = (today, response.get('channel'), response.get('ts'))
+    
+    def get_today_digest(self, user_id):
+        """Digest do usuário para hoje (mensagens e texto formatado)"""
+        today = self.today(user_id)
         
         try:
-            conn = sqlite3.connect('messages.db')
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT message FROM daily_messages WHERE date = ? ORDER BY timestamp",
-                (today,)
-            )
-            
-            messages = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            
-            logger.info(f"✅ {len(messages)} mensagens encontradas para {today}")
-            for i, msg in enumerate(messages, 1):
-                logger.info(f"  {i}. {msg}")
-            
-            return messages
+            digest = self.digests.get(user_id, today)
+            event_logger.debug("%d mensagens no digest de %s em %s", len(digest), user_id, today)
+            return digest
             
         except Exception as e:
-            logger.error(f"Erro ao buscar mensagens: {e}")
-            logger.error(f"Traceback: ", exc_info=True)
-            return []
+            event_logger.error("Erro ao buscar mensagens: %s", e, exc_info=True)
+            return Digest()
     
-    def create_daily_response(self, messages):
-        """Criar resposta para a daily baseada nas mensagens do dia"""
-        if not messages:
-            return ""
-        
-        # Apenas as mensagens formatadas, sem título e sem total
-        response = ""
-        
-        for i, message in enumerate(messages, 1):
-            response += f"• {message}\n"
-        
-        # Remove a última quebra de linha
-        response = response.rstrip('\n')
-                
-        return response
+    def get_today_messages(self, user_id):
+        """Buscar mensagens do usuário para hoje"""
+        return list(self.get_today_digest(user_id).messages)
     
-    def mark_daily_as_responded(self, date):
-        """Marcar daily como respondida no banco"""
-        conn = sqlite3.connect('messages.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT OR REPLACE INTO daily_responses (date, response_sent) VALUES (?, TRUE)",
-            (date,)
-        )
-        
-        conn.commit()
-        conn.close()
+    def create_daily_response(self, messages, user_id=None):
+        """Criar resposta para a daily baseada nas mensagens do dia (template do usuário, sem cache)"""
+        user_id = user_id or self.user_id
+        template = self.renderer.template_for(user_id)
+        parts = self.renderer.render_messages(template, user_id, self.today(user_id), messages)
+        return "\n".join(part.text for part in parts)
+    
+    def has_responded_today(self, user_id, today):
+        """Verificar se a daily foi respondida (cache local, depois o banco)"""
+        return self.responses.responded(user_id, today)
     
-    def reset_daily_flag(self):
-        """Resetar flag de daily respondida (executado à meia-noite)"""
-        self.daily_responded_today = False
+    def today(self, user_id=None):
+        """Data de hoje (ISO) no fuso do usuário, ou no fuso padrão"""
+        return datetime.now(self.user_timezone(user_id)).date().isoformat()
+    
+    def user_timezone(self, user_id=None):
+        """Fuso da assinatura do usuário, ou o TIMEZONE do processo"""
+        subscription = self.subscriptions.for_user(user_id) if user_id else None
+        if subscription is not None and subscription.timezone:
+            return get_timezone(subscription.timezone)
+        return self.timezone
+    
+    def reset_daily_flag(self, user_id=None):
+        """Resetar o estado do dia de um usuário (ou de todos), à meia-noite do seu fuso"""
+        # Respostas à daily são por data e não precisam ser resetadas
+        if user_id is None:
+            self.digests.clear()
+            with self.dm_lock:
+                self.dm_confirmations.clear()
+        else:
+            self.digests.invalidate(user_id)
+            with self.dm_lock:
+                self.dm_confirmations.pop(user_id, None)
         logger.info("Flag de daily resetada para novo dia")
     
     def check_missed_daily(self):
-        """Verificar se perdeu alguma daily (executado às 23:55)"""
-        today = datetime.now().date().isoformat()
-        
-        conn = sqlite3.connect('messages.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT response_sent FROM daily_responses WHERE date = ?",
-            (today,)
-        )
-        
-        result = cursor.fetchone()
-        conn.close()
-        
-        if not result or not result[0]:
-            # Ainda não respondeu - enviar lembrete
-            messages = self.get_today_messages()
-            if messages:
-                response = f"⚠️ **Lembrete:** Daily ainda não foi respondida hoje!\n\n"
-                response += self.create_daily_response(messages)
-                
-                if self.channel_id:
-                    self.client.chat_postMessage(
-                        channel=self.channel_id,
-                        text=response
+        """Verificar se algum usuário perdeu a daily"""
+        for subscription in self.subscriptions:
+            try:
+                self.remind_missed_daily(subscription, self.today(subscription.user_id))
+            except Exception as e:
+                logger.error("Erro ao verificar daily de %s: %s", subscription.user_id, e)
+    
+    def remind_missed_daily(self, subscription, today):
+        """Enviar lembrete no canal se a daily do usuário não foi respondida"""
+        if not self.responses.responded(subscription.user_id, today):
+            # Ainda não respondeu - enviar lembrete (digest da data do job, que
+            # pode ser a de ontem numa execução recuperada após a meia-noite)
+            digest = self.digests.get(subscription.user_id, today)
+            if digest:
+                # Partes seguintes de um digest grande vão na thread da primeira
+                thread_ts = None
+                for part in self.renderer.render(subscription.user_id, today, digest, 'reminder'):
+                    response = self.outbound.call(
+                        'chat.postMessage',
+                        channel=subscription.channel_id,
+                        thread_ts=thread_ts,
+                        **part.message()
                     )
+                    thread_ts = thread_ts or response.get('ts')
                 
-                logger.info("Lembrete de daily perdida enviado")
+                logger.info("Lembrete de daily perdida enviado para %s", subscription.user_id)
     
-    def schedule_tasks(self):
-        """Agendar tarefas automáticas"""
-        # Resetar flag à meia-noite
-        schedule.every().day.at("00:00").do(self.reset_daily_flag)
+    def create_scheduler(self, remind=None):
+        """Agendador com os jobs diários do bot, no fuso de cada usuário
+        
+        `remind(subscription, date)` envia o lembrete de daily perdida (o
+        runtime async passa a sua versão). Cada job recebe o horário agendado,
+        então uma execução recuperada usa a data em que deveria ter rodado.
+        """
+        remind = remind or self.remind_missed_daily
+        scheduler = Scheduler.from_env(self.storage, leader=self.leader)
+        
+        # Limpar eventos antigos da deduplicação
+        scheduler.add_daily('prune_events', '00:00', lambda run_at: self.dedup.prune(), tz=self.timezone)
+        
+        # Arquivar dias antigos e compactar o banco fora do horário de uso
+        if self.retention.enabled:
+            scheduler.add_daily(
+                'retention', self.retention_at,
+                lambda run_at: self.retention.run(run_at.date()), tz=self.timezone
+            )
         
-        # Verificar daily perdida às 23:55
-        schedule.every().day.at("23:55").do(self.check_missed_daily)
+        for subscription in self.subscriptions:
+            user_id = subscription.user_id
+            tz = self.user_timezone(user_id)
+            # Resetar o estado do dia à meia-noite do usuário (caches deste
+            # processo: roda em todas as réplicas, não só no líder)
+            scheduler.add_daily(
+                f'reset_daily_flag:{user_id}', '00:00',
+                lambda run_at, user_id=user_id: self.reset_daily_flag(user_id), tz=tz, local=True
+            )
+            # Verificar daily perdida às 23:55 do usuário
+            scheduler.add_daily(
+                f'remind_missed_daily:{user_id}', '23:55',
+                lambda run_at, subscription=subscription: remind(subscription, run_at.date().isoformat()),
+                tz=tz
+            )
         
         logger.info("Tarefas agendadas configuradas")
-    
-    def run_scheduler(self):
-        """Executar agendador em thread separada"""
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Verificar a cada minuto
+        return scheduler
     
     def start_flask_with_ngrok(self):
         """Iniciar Flask e depois configurar ngrok"""
-        def start_flask():
-            logger.info(f"Servidor Flask iniciando na porta {self.port}")
-            self.app.run(host='0.0.0.0', port=self.port, debug=False)
+        from werkzeug.serving import make_server
         
-        # Iniciar Flask em thread separada
-        flask_thread = threading.Thread(target=start_flask, daemon=True)
+        # O socket já está escutando quando make_server retorna: não há o que
+        # esperar antes de abrir o túnel (o mesmo servidor que o app.run usa)
+        server = make_server('0.0.0.0', self.port, self.app, threaded=True)
+        logger.info(f"Servidor Flask iniciado na porta {self.port}")
+        flask_thread = threading.Thread(target=server.serve_forever, daemon=True)
         flask_thread.start()
-        
-        # Aguardar um pouco para o Flask inicializar
-        time.sleep(2)
+        self.mark_ready()
         
         # Agora configurar ngrok
         if self.use_ngrok:
@@ -586,41 +836,90 @@ class DailyBot:
         
         # Manter o programa rodando
         try:
-            while True:
-                time.sleep(1)
+            flask_thread.join()
         except KeyboardInterrupt:
             logger.info("Bot interrompido pelo usuário")
+        finally:
+            server.shutdown()
+    
+    def start_scheduler(self):
+        """Iniciar a eleição de líder e o scheduler deste processo (recupera execuções perdidas)"""
+        self.scheduler = self.create_scheduler()
+        self.leader.start()
+        self.scheduler.start()
+    
+    def stop_scheduler(self):
+        """Parar o scheduler e liberar a liderança, se for o líder"""
+        if self.scheduler:
+            self.scheduler.stop()
+        self.leader.stop()
+    
+    def start_gunicorn(self):
+        """Servir o /events com gunicorn (vários processos e threads por processo)"""
+        # Import tardio: gunicorn só é necessário neste modo
+        from wsgi import GunicornServer, options_from_env
+        
+        def when_ready(server):
+            # Servidor já está escutando: seguro abrir o túnel (cada worker
+            # marca o próprio bot como pronto em load())
+            if self.use_ngrok and not self.setup_ngrok():
+                logger.warning("Falha ao configurar ngrok, rodando apenas localmente")
+        
+        logger.info(f"Servidor gunicorn iniciando na porta {self.port}")
+        GunicornServer(type(self), options_from_env(self.port), when_ready=when_ready).run()
     
     def start(self):
         """Iniciar o bot"""
+        if self.runtime == 'async':
+            # Import tardio: aiohttp só é necessário neste runtime
+            from async_runtime import AsyncRuntime
+            AsyncRuntime(self).run()
+            return
+        
+        # Workers do gunicorn saem via SystemExit por esta mesma pilha após o
+        # fork; só o processo que iniciou o bot deve fazer o cleanup
+        owner_pid = os.getpid()
+        
         try:
             logger.info(f"Iniciando bot em modo: {'Webhook' if self.webhook_mode else 'Socket'}")
             
-            # Configurar agendamentos
-            self.schedule_tasks()
+            if self.webhook_mode and self.server == 'gunicorn':
+                # Modo Webhook em produção: cada worker do gunicorn tem seus
+                # próprios workers de eventos, pool de conexões, eleição e
+                # scheduler, todos criados depois do fork. O master não deixa
+                # threads nem conexões abertas para os filhos herdarem
+                logger.info("Iniciando em modo Webhook (gunicorn)...")
+                self.storage.close()
+                self.start_gunicorn()
+                return
             
-            # Iniciar scheduler em thread separada
-            scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
-            scheduler_thread.start()
+            # Configurar e iniciar agendamentos (recupera execuções perdidas);
+            # a eleição primeiro, para um processo sozinho já começar líder
+            self.start_scheduler()
+            metrics.watch_dispatcher(self.dispatcher)
             
             if self.webhook_mode:
                 # Modo Webhook com Flask
                 logger.info("Iniciando em modo Webhook...")
+                self.dispatcher.start()
                 self.start_flask_with_ngrok()
                 
             else:
                 # Modo Socket (original)
                 logger.info("Iniciando em modo Socket...")
+                self.dispatcher.start()
+                if self.metrics_port:
+                    metrics.start_http_server(self.metrics_port)
                 
                 # Conectar ao Slack
                 self.socket_client.connect()
                 
                 logger.info("Bot conectado com sucesso!")
+                self.mark_ready()
                 logger.info("Pressione Ctrl+C para parar o bot")
                 
-                # Manter o bot rodando
-                while True:
-                    time.sleep(1)
+                # Manter o bot rodando (a conexão roda nas threads do cliente)
+                threading.Event().wait()
                 
         except KeyboardInterrupt:
             logger.info("Bot interrompido pelo usuário")
@@ -628,23 +927,38 @@ class DailyBot:
             logger.error(f"Erro ao iniciar bot: {e}")
         finally:
             # Cleanup
-            if hasattr(self, 'socket_client'):
-                self.socket_client.disconnect()
-            if self.use_ngrok and self.ngrok_url:
-                try:
-                    ngrok.disconnect(self.ngrok_url)
-                    ngrok.kill()
-                except:
-                    pass
+            if os.getpid() == owner_pid:
+                if hasattr(self, 'socket_client'):
+                    self.socket_client.disconnect()
+                self.stop_scheduler()
+                self.dispatcher.stop()
+                self.outbound.stop()
+                self.writer.stop()
+                self.storage.close()
+                if self.use_ngrok and self.ngrok_url:
+                    try:
+                        from pyngrok import ngrok
+                        ngrok.disconnect(self.ngrok_url)
+                        ngrok.kill()
+                    except:
+                        pass
 
-def main():
-    """Função principal"""
+def main(argv=None):
+    """Função principal: sem subcomando roda o bot (export/import/retention/compact mantêm o banco)"""
+    # Carregar variáveis de ambiente do arquivo .env se existir
+    if os.path.exists('.env'):
+        from dotenv import load_dotenv
+        load_dotenv()
+    
+    parser = argparse.ArgumentParser(description="Bot Slack da daily")
+    subparsers = parser.add_subparsers(dest='command')
+    transfer.add_commands(subparsers)
+    retention.add_commands(subparsers)
+    args = parser.parse_args(argv)
+    if args.command:
+        return args.handler(args)
+    
     try:
-        # Carregar variáveis de ambiente do arquivo .env se existir
-        if os.path.exists('.env'):
-            from dotenv import load_dotenv
-            load_dotenv()
-        
         bot = DailyBot()
         bot.start()
         
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deduplicação de eventos reenviados pelo Slack
+
+O Slack reenvia eventos que não foram confirmados a tempo (X-Slack-Retry-Num)
+e, no Socket Mode, pode reentregar eventos após uma reconexão. Na entrada, um
+conjunto em memória com expiração descarta as repetições em O(1) antes do
+ack; no worker, antes de armazenar ou responder, o evento é registrado na
+tabela processed_events (chave única), o que cobre reinícios do processo e
+vários workers do gunicorn.
+"""
+
+import os
+import time
+import logging
+
+from cache import TTLCache
+from metrics import EVENT_DUPLICATES
+
+logger = logging.getLogger(__name__)
+
+
+def event_key(event, event_id=None):
+    """Identidade do evento, igual em todas as reentregas
+
+    Mensagens são identificadas por canal + ts (o Slack mantém o mesmo ts
+    mesmo quando reentrega com outro event_id); sem ts, client_msg_id ou o
+    event_id do envelope.
+    """
+    channel, ts = event.get("channel"), event.get("ts")
+    if channel and ts:
+        return f"{channel}:{ts}"
+    return event.get("client_msg_id") or event_id
+
+
+class EventDeduplicator:
+    """Conjunto de eventos recentes em memória com registro persistente no banco"""
+
+    def __init__(self, storage, maxsize=10000, ttl=3600.0, persist=True, retention=86400.0):
+        self.storage = storage
+        self.recent = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.persist = persist
+        self.retention = retention
+
+    @classmethod
+    def from_env(cls, storage):
+        """Criar deduplicador a partir das variáveis de ambiente"""
+        return cls(
+            storage,
+            maxsize=int(os.getenv('EVENT_DEDUP_SIZE', 10000)),
+            ttl=float(os.getenv('EVENT_DEDUP_TTL', 3600)),
+            persist=os.getenv('EVENT_DEDUP_PERSIST', 'True').lower() == 'true',
+            retention=float(os.getenv('EVENT_DEDUP_RETENTION', 86400)),
+        )
+
+    def check_in(self, key):
+        """Entrada: marcar o evento como visto; False se for repetição recente"""
+        if key is None:
+            return True
+        if self.recent.add(key):
+            return True
+        EVENT_DUPLICATES.labels('memory').inc()
+        return False
+
+    def release(self, key):
+        """Esquecer um evento recusado (fila cheia) para aceitar o retry do Slack"""
+        if key is not None:
+            self.recent.discard(key)
+
+    def claim(self, key):
+        """Worker: registrar o evento no banco antes dos efeitos; False se já processado"""
+        if key is None or not self.persist:
+            return True
+        if self.storage.claim_event(key, time.time()):
+            return True
+        EVENT_DUPLICATES.labels('db').inc()
+        return False
+
+    def prune(self):
+        """Apagar do banco os eventos mais antigos que a retenção"""
+        if self.persist:
+            removed = self.storage.prune_events(time.time() - self.retention)
+            logger.info("%d eventos antigos removidos da deduplicação", removed)
+
+    def stats(self):
+        return dict(self.recent.stats(), persist=self.persist)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache incremental do resumo do dia (digest) de cada usuário
+
+Cada mensagem armazenada é acrescentada ao digest do usuário em memória, sem
+reler o dia inteiro do banco nem remontar o texto a cada mensagem. O banco
+continua sendo a fonte da verdade: um digest ausente é carregado dele na
+primeira leitura, e com vários processos gravando (gunicorn, PostgreSQL) as
+leituras buscam as linhas recentes no banco.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+
+def format_line(message):
+    return f"• {message}"
+
+
+def format_digest(messages):
+    """Texto da daily: uma linha "• mensagem" por mensagem"""
+    return "\n".join(format_line(message) for message in messages)
+
+
+class Digest:
+    """Mensagens de um usuário em um dia, com o texto formatado sob demanda"""
+
+    __slots__ = ('messages', 'last_id', 'ids', 'checkpoints', '_lines', '_text')
+
+    def __init__(self):
+        self.messages = []
+        self.last_id = 0
+        self.ids = set()
+        self.checkpoints = deque()  # (instante da leitura, último id visto), no modo compartilhado
+        self._lines = []
+        self._text = ""
+
+    def add(self, message_id, message):
+        self.ids.add(message_id)
+        self.messages.append(message)
+        self._lines.append(format_line(message))
+        self._text = None
+        self.last_id = max(self.last_id, message_id)
+
+    @property
+    def text(self):
+        # Remontado no máximo uma vez por mensagem nova, não a cada leitura
+        if self._text is None:
+            self._text = "\n".join(self._lines)
+        return self._text
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class DigestCache:
+    """Digest do dia corrente de cada usuário, em sincronia com o storage
+
+    Cada usuário tem no máximo uma entrada, a do dia mais recente pedido: com
+    fusos horários por usuário a virada do dia acontece em horas diferentes,
+    então uma data nova só substitui o digest daquele usuário. Datas
+    anteriores são lidas do banco sem passar pelo cache.
+
+    shared=False: só este processo grava mensagens; as gravações atualizam o
+    digest e as leituras não tocam o banco.
+    shared=True: outros processos também gravam; as leituras buscam as linhas
+    novas no banco. Os ids são reservados no INSERT, não no commit: no
+    PostgreSQL uma transação com id menor pode ficar visível depois de outra
+    com id maior, então buscar só "id > último visto" perderia essa linha.
+    Cada leitura guarda (instante, último id visto); uma linha com id menor
+    que esse já foi reservada antes da leitura e fica visível em até `grace`
+    segundos. As leituras então relêem a partir do último id visto numa
+    leitura de pelo menos `grace` segundos atrás (só as linhas recentes do
+    usuário no dia) e ignoram os ids já conhecidos; `grace` deve cobrir a
+    duração máxima de uma transação de gravação. Uma linha que chega fora
+    de ordem recarrega o digest, para manter a ordem do banco.
+    """
+
+    def __init__(self, storage, shared=False, grace=60.0):
+        self.storage = storage
+        self.shared = shared
+        self.grace = grace
+        self._digests = {}  # user_id -> (data, Digest)
+        # Leituras do banco seguram só o lock do usuário; o global protege os
+        # dicionários e é tomado depois do lock do usuário, nunca antes
+        self._user_locks = {}  # user_id -> Lock
+        self._lock = threading.Lock()
+        self._epoch = 0  # muda a cada clear(): cargas em andamento não publicam
+
+        self.hits = 0
+        self.loads = 0
+        self.reloads = 0
+
+    @classmethod
+    def from_env(cls, storage, server=None):
+        """Criar a partir das variáveis de ambiente (compartilhado por padrão com gunicorn ou PostgreSQL)"""
+        shared = server == 'gunicorn' or storage.backend == 'postgresql'
+        return cls(
+            storage,
+            shared=os.getenv('DIGEST_CACHE_SHARED', str(shared)).lower() == 'true',
+            grace=float(os.getenv('DIGEST_CACHE_GRACE', 60)),
+        )
+
+    def get(self, user_id, date):
+        """Digest do usuário na data (carregado do banco se necessário)"""
+        with self._user_lock(user_id):
+            with self._lock:
+                cached_date, digest = self._digests.get(user_id, (None, None))
+                epoch = self._epoch
+                if digest is not None and cached_date == date and not self.shared:
+                    self.hits += 1
+                    return digest
+
+            if digest is None or cached_date != date:
+                digest = self._load(user_id, date)
+                with self._lock:
+                    if epoch == self._epoch and (cached_date is None or date > cached_date):
+                        self._digests[user_id] = (date, digest)
+                    self.loads += 1
+            else:
+                digest = self._refresh(digest, user_id, date, epoch)
+                with self._lock:
+                    self.hits += 1
+            return digest
+
+    def append(self, user_id, date, message_id, message):
+        """Registrar uma mensagem recém-gravada no banco com o id `message_id`"""
+        if self.shared:
+            # A próxima leitura busca as linhas recentes no banco
+            return
+        with self._user_lock(user_id), self._lock:
+            cached_date, digest = self._digests.get(user_id, (None, None))
+            if digest is None or cached_date != date:
+                # Ainda não carregado (ou de outro dia): a primeira leitura traz a mensagem do banco
+                if cached_date is not None and date > cached_date:
+                    del self._digests[user_id]
+                return
+            if message_id > digest.last_id:
+                digest.add(message_id, message)
+            else:
+                # Fora de ordem (ou já carregada): recarregar do banco na próxima leitura
+                del self._digests[user_id]
+
+    def append_when_done(self, user_id, date, message, future):
+        """Registrar a mensagem quando a gravação do `future` terminar (espera que estourou o timeout)
+
+        A linha pode ser gravada depois que quem esperava desistiu: o digest em
+        cache é descartado agora e, no fim da gravação, recebe a mensagem (ou é
+        descartado de novo, se ela falhou).
+        """
+        self.invalidate(user_id)
+
+        def done(future):
+            try:
+                message_id = future.result()
+            except BaseException:
+                self.invalidate(user_id)
+            else:
+                self.append(user_id, date, message_id, message)
+        future.add_done_callback(done)
+
+    def invalidate(self, user_id=None):
+        """Descartar os digests de um usuário (ou todos) após mudanças externas no banco"""
+        if user_id is None:
+            self.clear()
+            return
+        with self._user_lock(user_id), self._lock:
+            self._digests.pop(user_id, None)
+
+    def clear(self):
+        """Descartar todos os digests"""
+        with self._lock:
+            self._digests.clear()
+            self._epoch += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._digests),
+                'hits': self.hits,
+                'loads': self.loads,
+                'reloads': self.reloads,
+                'shared': self.shared,
+            }
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def _load(self, user_id, date):
+        """Digest do dia lido inteiro do banco"""
+        started = time.monotonic()
+        digest = Digest()
+        for message_id, message in self.storage.get_messages_after(user_id, date, 0):
+            digest.add(message_id, message)
+        if self.shared:
+            digest.checkpoints.append((started, digest.last_id))
+        return digest
+
+    def _refresh(self, digest, user_id, date, epoch):
+        """Acrescentar as linhas que outros processos gravaram desde as últimas leituras (com o lock do usuário)"""
+        started = time.monotonic()
+        checkpoints = digest.checkpoints
+        # Último id de uma leitura feita há pelo menos `grace` segundos: abaixo
+        # dele todas as linhas já estão visíveis (sem nenhuma, relê o dia)
+        while len(checkpoints) > 1 and checkpoints[1][0] <= started - self.grace:
+            checkpoints.popleft()
+        stable_id = checkpoints[0][1] if checkpoints and checkpoints[0][0] <= started - self.grace else 0
+
+        rows = [row for row in self.storage.get_messages_after(user_id, date, stable_id) if row[0] not in digest.ids]
+        if any(message_id < digest.last_id for message_id, _ in rows):
+            # Commit fora de ordem: recarregar para manter a ordem do banco
+            digest = self._load(user_id, date)
+            with self._lock:
+                if epoch == self._epoch:
+                    self._digests[user_id] = (date, digest)
+                self.reloads += 1
+            return digest
+        for message_id, message in rows:
+            digest.add(message_id, message)
+        if not checkpoints or checkpoints[-1][1] != digest.last_id:
+            checkpoints.append((started, digest.last_id))
+        return digest
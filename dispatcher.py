@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Despacho assíncrono de eventos do Slack para um pool limitado de workers
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+import logging
+import zlib
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Sentinela para encerrar os workers
+_STOP = object()
+
+
+class EventDispatcher:
+    """Fila limitada de eventos processados por um pool de workers
+
+    Cada worker tem sua própria fila e os eventos são distribuídos pela
+    chave (usuário/canal), preservando a ordem das mensagens de um mesmo
+    usuário. Quando a fila está cheia o `submit` espera até `put_timeout`
+    e, se ainda não houver espaço, recusa o evento para que o chamador não
+    confirme o recebimento e o Slack reenvie mais tarde.
+    Com `workers=0` os eventos são processados na thread do chamador.
+    """
+
+    def __init__(self, handler, workers=4, max_queue=1000, put_timeout=0.5):
+        self.handler = handler
+        self.workers = max(0, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.put_timeout = put_timeout
+
+        per_worker = max(1, self.max_queue // max(1, self.workers))
+        self._queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_env(cls, handler):
+        """Criar dispatcher a partir das variáveis de ambiente"""
+        return cls(
+            handler,
+            workers=int(os.getenv('EVENT_WORKERS', 4)),
+            max_queue=int(os.getenv('EVENT_QUEUE_SIZE', 1000)),
+            put_timeout=float(os.getenv('EVENT_QUEUE_TIMEOUT', 0.5)),
+        )
+
+    def start(self):
+        """Iniciar as threads dos workers"""
+        for index, events in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker, args=(events,), name=f"event-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Dispatcher iniciado com %d workers", self.workers)
+
+    def submit(self, event, key=None):
+        """Enfileirar evento; retorna False se a fila estiver cheia"""
+        if not self.workers:
+            self._count('submitted')
+            self._run(event)
+            return True
+
+        shard = zlib.crc32(str(key).encode('utf-8')) % self.workers if key else 0
+        events = self._queues[shard]
+        try:
+            events.put((time.perf_counter(), event), timeout=self.put_timeout)
+        except queue.Full:
+            self._count('rejected')
+            logger.warning("Fila de eventos cheia (worker %d), evento recusado", shard)
+            return False
+
+        with self._lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self.queue_depth())
+        return True
+
+    def queue_depth(self):
+        """Total de eventos aguardando processamento"""
+        return sum(events.qsize() for events in self._queues)
+
+    def stats(self):
+        """Métricas da fila para o /status"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.max_queue,
+                'queue_depth': self.queue_depth(),
+                'max_depth': self.max_depth,
+                'busy': self.busy,
+                'submitted': self.submitted,
+                'processed': self.processed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+    def stop(self, timeout=5.0):
+        """Processar o que já está na fila e encerrar os workers"""
+        for events in self._queues:
+            events.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _run(self, event):
+        self._count('busy')
+        start = time.perf_counter()
+        result = 'ok'
+        try:
+            self.handler(event)
+            self._count('processed')
+        except Exception as e:
+            result = 'error'
+            self._count('failed')
+            logger.error("Erro no worker de eventos: %s", e, exc_info=True)
+        finally:
+            with self._lock:
+                self.busy -= 1
+            metrics.EVENT_HANDLE_SECONDS.labels(result).observe(time.perf_counter() - start)
+
+    def _worker(self, events):
+        while True:
+            item = events.get()
+            if item is _STOP:
+                return
+            enqueued_at, event = item
+            metrics.EVENT_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - enqueued_at)
+            self._run(event)
+
+
+class AsyncEventDispatcher:
+    """Equivalente asyncio do EventDispatcher, com coroutines no lugar de threads
+
+    Usado pelo runtime async: o handler é uma coroutine e cada worker é uma
+    tarefa do event loop, então a concorrência pode ser alta sem custo de
+    uma thread por evento.
+    """
+
+    def __init__(self, handler, workers=100, max_queue=1000, put_timeout=0.5):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.put_timeout = put_timeout
+
+        per_worker = max(1, self.max_queue // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = []
+
+        # Métricas (acesso apenas pelo event loop, sem lock)
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_env(cls, handler):
+        """Criar dispatcher a partir das variáveis de ambiente"""
+        return cls(
+            handler,
+            workers=int(os.getenv('ASYNC_CONCURRENCY', 100)),
+            max_queue=int(os.getenv('EVENT_QUEUE_SIZE', 1000)),
+            put_timeout=float(os.getenv('EVENT_QUEUE_TIMEOUT', 0.5)),
+        )
+
+    def start(self):
+        """Criar as tarefas dos workers no event loop atual"""
+        for events in self._queues:
+            self._tasks.append(asyncio.create_task(self._worker(events)))
+        logger.info("Dispatcher async iniciado com %d workers", self.workers)
+
+    async def submit(self, event, key=None):
+        """Enfileirar evento; retorna False se a fila continuar cheia após put_timeout"""
+        shard = zlib.crc32(str(key).encode('utf-8')) % self.workers if key else 0
+        events = self._queues[shard]
+        item = (time.perf_counter(), event)
+        try:
+            events.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(events.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning("Fila de eventos cheia (worker %d), evento recusado", shard)
+                return False
+
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.queue_depth())
+        return True
+
+    def queue_depth(self):
+        """Total de eventos aguardando processamento"""
+        return sum(events.qsize() for events in self._queues)
+
+    def stats(self):
+        """Métricas da fila para o /status"""
+        return {
+            'workers': self.workers,
+            'queue_size': self.max_queue,
+            'queue_depth': self.queue_depth(),
+            'max_depth': self.max_depth,
+            'busy': self.busy,
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+    async def stop(self):
+        """Processar o que já está na fila e encerrar os workers"""
+        for events in self._queues:
+            await events.put(_STOP)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self, events):
+        while True:
+            item = await events.get()
+            if item is _STOP:
+                return
+            enqueued_at, event = item
+            start = time.perf_counter()
+            metrics.EVENT_QUEUE_WAIT_SECONDS.observe(start - enqueued_at)
+            result = 'ok'
+            self.busy += 1
+            try:
+                await self.handler(event)
+                self.processed += 1
+            except Exception as e:
+                result = 'error'
+                self.failed += 1
+                logger.error("Erro no worker de eventos: %s", e, exc_info=True)
+            finally:
+                self.busy -= 1
+                metrics.EVENT_HANDLE_SECONDS.labels(result).observe(time.perf_counter() - start)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filtro dos eventos recebidos, antes de qualquer processamento
+
+O Slack entrega toda mensagem dos canais em que o bot está: edições e
+remoções, entradas no canal, respostas em threads, conversa de quem não é
+assinante. O filtro roda logo após o parsing (no /events e no Socket Mode)
+e descarta esses eventos com consultas a conjuntos montados a partir das
+assinaturas, antes da deduplicação, da fila de workers e dos logs do
+handler. Cada descarte é contado por motivo em
+dailybot_events_filtered_total.
+"""
+
+import os
+import logging
+
+from metrics import EVENTS_FILTERED
+
+# Filho de bot.events: LOG_LEVELS=bot.events=DEBUG mostra os descartes
+logger = logging.getLogger('bot.events.filter')
+
+# Subtipos que trazem uma mensagem nova; message_changed, message_deleted,
+# channel_join, channel_topic etc. são descartados
+MESSAGE_SUBTYPES = frozenset({None, 'bot_message', 'file_share', 'me_message', 'thread_broadcast'})
+
+REASONS = ('type', 'subtype', 'thread', 'channel', 'user')
+
+
+class EventFilter:
+    """Regras pré-compiladas por tipo, subtipo, thread, canal e usuário"""
+
+    def __init__(self, subscriptions=(), subtypes=MESSAGE_SUBTYPES, thread_replies=False):
+        self.subtypes = frozenset(subtypes)
+        self.thread_replies = thread_replies
+        self._dropped = {reason: EVENTS_FILTERED.labels(reason) for reason in REASONS}
+        self.refresh(subscriptions)
+
+    @classmethod
+    def from_env(cls, subscriptions):
+        """Criar a partir das variáveis de ambiente"""
+        return cls(
+            subscriptions,
+            thread_replies=os.getenv('EVENT_THREAD_REPLIES', 'False').lower() == 'true',
+        )
+
+    def refresh(self, subscriptions):
+        """Remontar os conjuntos a partir das assinaturas (usuário -> canal da daily)"""
+        subscriptions = list(subscriptions)
+        self.users = {subscription.user_id: subscription.channel_id for subscription in subscriptions}
+        self.channels = frozenset(subscription.channel_id for subscription in subscriptions)
+
+    def reason(self, event):
+        """Motivo do descarte do evento, ou None se ele deve ser processado"""
+        if event.get('type') != 'message':
+            return 'type'
+        subtype = event.get('subtype')
+        if subtype not in self.subtypes:
+            return 'subtype'
+        # Respostas em threads (inclusive as do próprio bot na thread da daily)
+        thread_ts = event.get('thread_ts')
+        if thread_ts and not self.thread_replies and subtype != 'thread_broadcast' and thread_ts != event.get('ts'):
+            return 'thread'
+        channel = event.get('channel') or ''
+        # Bots só interessam nos canais onde acontece alguma daily
+        if event.get('bot_id'):
+            return None if channel in self.channels else 'channel'
+        user_channel = self.users.get(event.get('user'))
+        if user_channel is None:
+            return 'user'
+        # Canal da daily do usuário ou DM direto com o bot
+        if channel != user_channel and not channel.startswith('D'):
+            return 'channel'
+        return None
+
+    def accept(self, event):
+        """True se o evento segue para o processamento; descartes são contados"""
+        reason = self.reason(event)
+        if reason is None:
+            return True
+        self._dropped[reason].inc()
+        logger.debug("Evento descartado (%s): %s/%s", reason, event.get('type'), event.get('subtype'))
+        return False
+
+    def stats(self):
+        return {
+            'users': len(self.users),
+            'channels': len(self.channels),
+            'thread_replies': self.thread_replies,
+            'dropped': {reason: int(child.value()) for reason, child in self._dropped.items()},
+        }
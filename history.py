@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consulta ao histórico de dailies: /history, /search e o slash command
+
+As páginas usam keyset: o cursor guarda a chave da última linha devolvida
+e a página seguinte continua do índice a partir dela, com custo constante
+em qualquer ponto de anos de histórico (com OFFSET o banco relê todas as
+linhas anteriores). A busca usa o índice FTS5 de daily_messages. Cada página tem
+tamanho limitado e a resposta JSON é gerada linha a linha.
+"""
+
+import os
+import json
+import hmac
+import base64
+import logging
+from datetime import date
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_DATE = '0000-01-01'
+MAX_DATE = '9999-12-31'
+
+HELP_TEXT = (
+    "Uso:\n"
+    "• `historico [AAAA-MM-DD] [AAAA-MM-DD]`: suas mensagens no período (mais recentes primeiro)\n"
+    "• `buscar <termos>`: mensagens com todos os termos"
+)
+
+
+class QueryError(ValueError):
+    """Parâmetro de consulta inválido (resposta 400)"""
+
+
+class Page(NamedTuple):
+    """Linhas (id, date, timestamp, message) e o cursor da próxima página, se houver"""
+    rows: list
+    next_cursor: Optional[str]
+
+
+def parse_date(value, default):
+    """Data ISO (AAAA-MM-DD) validada, ou o default se vazia"""
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise QueryError(f"Data inválida: {value!r} (use AAAA-MM-DD)")
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise QueryError("Cursor inválido")
+
+
+def is_row_id(value):
+    """Id de linha válido num cursor: inteiro (não bool) dentro do BIGINT"""
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < 2 ** 63
+
+
+def decode_history_cursor(cursor):
+    """Cursor do histórico: [date, timestamp, id] com os tipos das colunas, ou QueryError"""
+    after = decode_cursor(cursor)
+    if not (isinstance(after, list) and len(after) == 3):
+        raise QueryError("Cursor inválido")
+    day, timestamp, message_id = after
+    if not (isinstance(day, str) and isinstance(timestamp, str) and is_row_id(message_id)):
+        raise QueryError("Cursor inválido")
+    return after
+
+
+def stream_page(page):
+    """JSON da página gerado em partes: {"items": [...], "next_cursor": ...}"""
+    yield '{"items":['
+    for index, (message_id, day, timestamp, message) in enumerate(page.rows):
+        item = {'id': message_id, 'date': day, 'timestamp': timestamp, 'message': message}
+        yield (',' if index else '') + json.dumps(item, ensure_ascii=False)
+    yield '],"next_cursor":' + json.dumps(page.next_cursor) + '}'
+
+
+class HistoryService:
+    """Consultas paginadas ao histórico de um usuário"""
+
+    def __init__(self, storage, token=None, default_limit=50, max_limit=500):
+        self.storage = storage
+        self.token = token
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+
+    @classmethod
+    def from_env(cls, storage):
+        """Criar a partir das variáveis de ambiente"""
+        return cls(
+            storage,
+            token=os.getenv('HISTORY_API_TOKEN') or None,
+            max_limit=int(os.getenv('HISTORY_MAX_LIMIT', 500)),
+        )
+
+    def authorized(self, authorization):
+        """Header Authorization com o HISTORY_API_TOKEN; sem token configurado a API fica desligada"""
+        if not self.token or not authorization:
+            return False
+        return hmac.compare_digest(authorization, f"Bearer {self.token}")
+
+    def _limit(self, limit):
+        if not limit:
+            return self.default_limit
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise QueryError(f"Limite inválido: {limit!r}")
+        return max(1, min(limit, self.max_limit))
+
+    def history(self, user_id, start=None, end=None, cursor=None, limit=None):
+        """Mensagens do usuário no período, das mais recentes para as mais antigas"""
+        if not user_id:
+            raise QueryError("Informe o user_id")
+        limit = self._limit(limit)
+        after = None
+        if cursor:
+            after = decode_history_cursor(cursor)
+        rows = self.storage.history(
+            user_id, parse_date(start, MIN_DATE), parse_date(end, MAX_DATE), after, limit
+        )
+        next_cursor = encode_cursor(list(rows[-1][1:3]) + [rows[-1][0]]) if len(rows) == limit else None
+        return Page(rows, next_cursor)
+
+    def search(self, user_id, text, start=None, end=None, cursor=None, limit=None):
+        """Mensagens do usuário com todos os termos, das mais recentes para as mais antigas"""
+        if not user_id:
+            raise QueryError("Informe o user_id")
+        limit = self._limit(limit)
+        before_id = None
+        if cursor:
+            before_id = decode_cursor(cursor)
+            if not is_row_id(before_id):
+                raise QueryError("Cursor inválido")
+        terms = (text or '').split()
+        if not terms:
+            raise QueryError("Informe os termos da busca")
+        rows = self.storage.search(
+            user_id, terms, parse_date(start, MIN_DATE), parse_date(end, MAX_DATE), before_id, limit
+        )
+        next_cursor = encode_cursor(rows[-1][0]) if len(rows) == limit else None
+        return Page(rows, next_cursor)
+
+    def command(self, user_id, text, limit=20):
+        """Resposta em texto do slash command (só o histórico de quem chamou)"""
+        action, _, args = (text or '').strip().partition(' ')
+        action = action.lower()
+        try:
+            if action in ('historico', 'histórico', 'history'):
+                page = self.history(user_id, *args.split()[:2], limit=limit)
+            elif action in ('buscar', 'search'):
+                page = self.search(user_id, args, limit=limit)
+            else:
+                return HELP_TEXT
+        except QueryError as e:
+            return f"{e}\n\n{HELP_TEXT}"
+        return format_page(page)
+
+
+def format_page(page):
+    """Linhas agrupadas por data, para o Slack"""
+    if not page.rows:
+        return "Nenhuma mensagem encontrada."
+    lines = []
+    current = None
+    for _, day, _, message in page.rows:
+        if day != current:
+            lines.append(f"*{day}*")
+            current = day
+        lines.append(f"• {message}")
+    if page.next_cursor:
+        lines.append("_… mais resultados: refine o período ou os termos_")
+    return "\n".join(lines)
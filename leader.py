@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Eleição de líder entre réplicas por lease no banco compartilhado
+
+Cada processo tenta obter (ou renovar) o lease "scheduler" a cada
+LEADER_RENEW_INTERVAL segundos, com validade de LEADER_LEASE_TTL segundos.
+Quem o detém é o líder e roda os jobs agendados; todas as réplicas
+continuam recebendo e processando eventos.
+
+- O token do lease só aumenta quando o holder muda (fencing token): o
+  compare-and-set dos jobs confere o token no banco, então um líder antigo
+  (pausado, sem rede) não executa nada depois que outro assumiu.
+- O líder deixa de se considerar líder quando a validade local vence sem
+  renovação (banco fora do ar), antes de outro poder assumir.
+- Ao parar, o lease é liberado: outra réplica assume na próxima tentativa,
+  sem esperar o TTL. Numa queda, assume depois do TTL.
+
+A validade usa o relógio de cada host: o TTL deve ser bem maior que a
+diferença entre os relógios das réplicas (NTP).
+"""
+
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+
+from metrics import LEADER, LEADER_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'scheduler'
+
+
+class LeaderElection:
+    """Lease renovado por uma thread; `is_leader` e `fence` para quem só roda no líder"""
+
+    def __init__(self, storage, name=LEASE_NAME, holder=None, ttl=10.0, renew=2.0,
+                 enabled=True, clock=time.time):
+        self.storage = storage
+        self.name = name
+        self.holder = holder or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.ttl = ttl
+        self.renew = min(renew, ttl / 2)
+        self.enabled = enabled
+        self.clock = clock
+
+        self._token = None
+        self._valid_until = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Métricas
+        self.acquired = 0
+        self.lost = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, storage):
+        """Criar a partir das variáveis de ambiente"""
+        ttl = float(os.getenv('LEADER_LEASE_TTL', 10))
+        return cls(
+            storage,
+            holder=os.getenv('LEADER_ID') or None,
+            ttl=ttl,
+            renew=float(os.getenv('LEADER_RENEW_INTERVAL', 2)),
+            enabled=os.getenv('LEADER_ELECTION', 'True').lower() == 'true',
+        )
+
+    @property
+    def is_leader(self):
+        """Este processo detém o lease e ele ainda está dentro da validade"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            return self._token is not None and self.clock() < self._valid_until
+
+    @property
+    def fence(self):
+        """(lease, token) para o compare-and-set no banco; None sem eleição ou fora da liderança"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._token is None or self.clock() >= self._valid_until:
+                return None
+            return self.name, self._token
+
+    def add_listener(self, callback):
+        """`callback(is_leader)` a cada mudança de liderança, na thread da eleição"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Primeira tentativa na hora (o processo sozinho já começa líder) e thread de renovação"""
+        LEADER.set_function(lambda: int(self.is_leader))
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._attempt()
+        self._thread = threading.Thread(target=self._run, name='leader-election', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Parar as renovações e liberar o lease, se for o líder"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            was_leader, self._token = self._token is not None, None
+        if was_leader:
+            try:
+                self.storage.release_lease(self.name, self.holder)
+                LEADER_TRANSITIONS.labels('released').inc()
+                logger.info("Liderança liberada por %s", self.holder)
+            except Exception as e:
+                logger.warning("Erro ao liberar o lease %s: %s", self.name, e)
+
+    def stats(self):
+        with self._lock:
+            token = self._token
+        return {
+            'enabled': self.enabled,
+            'holder': self.holder,
+            'leader': self.is_leader,
+            'token': token,
+            'ttl': self.ttl,
+            'acquired': self.acquired,
+            'lost': self.lost,
+            'errors': self.errors,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.renew):
+            self._attempt()
+
+    def _attempt(self):
+        """Obter ou renovar o lease; avisa os listeners quando a liderança muda"""
+        # Validade contada a partir de antes da escrita: nunca além da do banco
+        now = self.clock()
+        try:
+            token = self.storage.acquire_lease(self.name, self.holder, now, self.ttl)
+        except Exception as e:
+            # Sem banco não há renovação: a liderança vence sozinha em _valid_until
+            self.errors += 1
+            logger.warning("Erro ao renovar o lease %s: %s", self.name, e)
+            token = None if self.clock() >= self._valid_until else self._token
+
+        with self._lock:
+            was_leader = self._token is not None
+            if token is not None and token == self._token:
+                self._valid_until = max(self._valid_until, now + self.ttl)
+            elif token is not None:
+                self._token, self._valid_until = token, now + self.ttl
+            else:
+                self._token, self._valid_until = None, 0.0
+            is_leader = self._token is not None
+
+        if is_leader == was_leader:
+            return
+        if is_leader:
+            self.acquired += 1
+            LEADER_TRANSITIONS.labels('acquired').inc()
+            logger.info("Liderança obtida por %s (token %d)", self.holder, token)
+        else:
+            self.lost += 1
+            LEADER_TRANSITIONS.labels('lost').inc()
+            logger.warning("Liderança perdida por %s", self.holder)
+        for callback in self._listeners:
+            try:
+                callback(is_leader)
+            except Exception as e:
+                logger.error("Erro ao notificar mudança de liderança: %s", e, exc_info=True)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Configuração de logging: níveis por componente, saída JSON e amostragem de payloads
+"""
+
+import os
+import json
+import random
+import logging
+from datetime import datetime, timezone
+
+# Atributos padrão do LogRecord; o que sobrar veio de `extra=` e vira campo do JSON
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+# Fração dos eventos cujo payload completo é logado em DEBUG
+_payload_sample_rate = 0.0
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro; campos passados em `extra` viram chaves"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Configurar o logging a partir de LOG_LEVEL, LOG_LEVELS, LOG_FORMAT e LOG_PAYLOAD_SAMPLE_RATE"""
+    global _payload_sample_rate
+
+    handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    # Níveis por componente no formato "bot.events=DEBUG,storage=WARNING"
+    for item in os.getenv('LOG_LEVELS', '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _payload_sample_rate = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', 0.0))
+
+
+def log_payload(logger, msg, payload):
+    """Logar um payload completo em DEBUG, apenas para a fração amostrada dos eventos
+
+    A serialização só acontece se o registro for de fato emitido.
+    """
+    if (_payload_sample_rate > 0
+            and logger.isEnabledFor(logging.DEBUG)
+            and random.random() < _payload_sample_rate):
+        logger.debug("%s: %s", msg, json.dumps(payload, ensure_ascii=False, default=str))
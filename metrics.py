@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas em processo no formato de texto do Prometheus (/metrics)
+
+Contadores e histogramas guardam os valores em células por thread: cada
+thread só escreve na própria célula, sem lock no caminho quente, e a coleta
+soma as células. Gauges são lidos por callback no momento da coleta.
+"""
+
+import time
+import bisect
+import logging
+import weakref
+import threading
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Segundos: de sub-milissegundo (cache, SQLite) a vários segundos (API do Slack)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Linhas por transação do escritor agrupado
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class _Cells:
+    """Vetor de valores com uma cópia por thread
+
+    Servidores com uma thread por requisição criam threads o tempo todo: quando
+    uma thread termina, a sua célula é somada a um total acumulado e descartada,
+    então o número de células acompanha as threads vivas.
+    """
+
+    __slots__ = ('size', '_local', '_cells', '_retired', '_lock')
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._cells = {}  # id(célula) -> célula das threads vivas
+        self._retired = [0.0] * size
+        # Reentrante: o finalizer pode rodar (coleta de lixo) com o lock já tomado
+        self._lock = threading.RLock()
+
+    def cell(self):
+        try:
+            return self._local.holder.cell
+        except AttributeError:
+            holder = _CellHolder([0.0] * self.size)
+            with self._lock:
+                self._cells[id(holder.cell)] = holder.cell
+            # O thread-local é liberado quando a thread termina, e com ele o holder
+            weakref.finalize(holder, self._retire, holder.cell)
+            self._local.holder = holder
+            return holder.cell
+
+    def _retire(self, cell):
+        with self._lock:
+            self._cells.pop(id(cell), None)
+            for i, value in enumerate(cell):
+                self._retired[i] += value
+
+    def totals(self):
+        with self._lock:
+            cells = list(self._cells.values())
+            totals = list(self._retired)
+        for cell in cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class _CellHolder:
+    """Guarda a célula no thread-local; o finalizer dele aposenta a célula"""
+
+    __slots__ = ('cell', '__weakref__')
+
+    def __init__(self, cell):
+        self.cell = cell
+
+
+class _Metric:
+    """Base: nome, ajuda e filhos por combinação de labels"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+
+    def labels(self, *labelvalues):
+        """Filho para os valores de labels (criado na primeira vez)"""
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_pairs(self, labelvalues, extra=()):
+        pairs = list(zip(self.labelnames, labelvalues)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    def _items(self):
+        if not self.labelnames:
+            return [((), self._default)]
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('_cells',)
+
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return self._cells.totals()[0]
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _samples(self):
+        for labelvalues, child in self._items():
+            yield f"{self.name}{self._label_pairs(labelvalues)} {_number(child.value())}"
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_cells')
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # Uma posição por bucket, +Inf e a soma
+        self._cells = _Cells(len(buckets) + 2)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        """(contagens cumulativas por bucket, total, soma)"""
+        totals = self._cells.totals()
+        cumulative, running = [], 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _samples(self):
+        for labelvalues, child in self._items():
+            cumulative, count, total = child.snapshot()
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), cumulative):
+                le = self._label_pairs(labelvalues, [('le', _number(bound))])
+                yield f"{self.name}_bucket{le} {_number(bucket_count)}"
+            labels = self._label_pairs(labelvalues)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {_number(count)}"
+
+
+class Gauge(_Metric):
+    """Valor instantâneo lido por callback na coleta"""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self._callback = None
+
+    def _new_child(self):
+        return None
+
+    def set_function(self, callback):
+        self._callback = callback
+
+    def _samples(self):
+        if self._callback is None:
+            return
+        try:
+            value = self._callback()
+        except Exception as e:
+            logger.debug("Erro ao coletar %s: %s", self.name, e)
+            return
+        yield f"{self.name} {_number(value)}"
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+def timed(histogram, *labelvalues):
+    """Decorator: observar a duração de cada chamada no histograma"""
+    child = histogram.labels(*labelvalues) if labelvalues else histogram._default
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ----------------------------------------------------------------------
+# Métricas do bot
+# ----------------------------------------------------------------------
+
+EVENTS_RECEIVED = Counter(
+    'dailybot_events_received_total', 'Eventos recebidos do Slack', ('mode', 'result'))
+EVENT_RETRIES = Counter(
+    'dailybot_event_retries_total', 'Reentregas sinalizadas pelo Slack (X-Slack-Retry-Num)', ('mode',))
+EVENT_DUPLICATES = Counter(
+    'dailybot_event_duplicates_total', 'Eventos duplicados descartados', ('stage',))
+EVENTS_FILTERED = Counter(
+    'dailybot_events_filtered_total', 'Eventos descartados pelo filtro antes do processamento', ('reason',))
+EVENT_ACK_SECONDS = Histogram(
+    'dailybot_event_ack_seconds', 'Tempo do recebimento do evento até o ack', ('mode',))
+SIGNATURE_SECONDS = Histogram(
+    'dailybot_signature_verify_seconds', 'Tempo de verificação da assinatura do Slack')
+EVENT_QUEUE_WAIT_SECONDS = Histogram(
+    'dailybot_event_queue_wait_seconds', 'Tempo do evento na fila até um worker pegá-lo')
+EVENT_HANDLE_SECONDS = Histogram(
+    'dailybot_event_handle_seconds', 'Tempo de processamento do evento no worker', ('result',))
+EVENT_QUEUE_DEPTH = Gauge(
+    'dailybot_event_queue_depth', 'Eventos aguardando na fila')
+EVENT_WORKERS_BUSY = Gauge(
+    'dailybot_event_workers_busy', 'Workers processando eventos agora')
+DB_QUERY_SECONDS = Histogram(
+    'dailybot_db_query_seconds', 'Duração das operações no banco', ('op',))
+SLACK_API_SECONDS = Histogram(
+    'dailybot_slack_api_seconds', 'Duração das chamadas à API do Slack', ('method',))
+SLACK_API_CALLS = Counter(
+    'dailybot_slack_api_calls_total', 'Chamadas à API do Slack', ('method', 'status'))
+SLACK_THROTTLE_SECONDS = Histogram(
+    'dailybot_slack_throttle_seconds', 'Espera imposta pelo rate limit antes de uma chamada', ('method',))
+OUTBOUND_COALESCED = Counter(
+    'dailybot_outbound_coalesced_total', 'Envios agrupados pelo debounce (ex: confirmações no DM)')
+DAILY_CLAIMS = Counter(
+    'dailybot_daily_claims_total', 'Tentativas de responder à daily', ('result',))
+JOB_SECONDS = Histogram(
+    'dailybot_scheduler_job_seconds', 'Duração dos jobs agendados', ('job',), buckets=JOB_BUCKETS)
+JOB_FAILURES = Counter(
+    'dailybot_scheduler_job_failures_total', 'Jobs agendados que falharam', ('job',))
+RETENTION_ROWS = Counter(
+    'dailybot_retention_rows_total', 'Linhas removidas pela retenção (arquivadas ou apagadas)', ('table',))
+DB_WRITE_BATCH_SIZE = Histogram(
+    'dailybot_db_write_batch_size', 'Mensagens gravadas por transação (group commit)', buckets=BATCH_BUCKETS)
+DB_RECLAIMED_BYTES = Counter(
+    'dailybot_db_reclaimed_bytes_total', 'Bytes devolvidos ao sistema pela compactação do banco')
+DB_SIZE_BYTES = Gauge(
+    'dailybot_db_size_bytes', 'Tamanho do banco SQLite')
+DIGEST_RENDERS = Counter(
+    'dailybot_digest_renders_total', 'Renderizações do digest servidas do cache (hit) ou montadas (miss)', ('result',))
+LEADER = Gauge(
+    'dailybot_leader', 'Este processo é o líder que roda os jobs agendados (1) ou não (0)')
+LEADER_TRANSITIONS = Counter(
+    'dailybot_leader_transitions_total', 'Mudanças de liderança deste processo', ('event',))
+
+REGISTRY = [
+    EVENTS_RECEIVED, EVENT_RETRIES, EVENT_DUPLICATES, EVENTS_FILTERED, EVENT_ACK_SECONDS, SIGNATURE_SECONDS,
+    EVENT_QUEUE_WAIT_SECONDS, EVENT_HANDLE_SECONDS, EVENT_QUEUE_DEPTH, EVENT_WORKERS_BUSY,
+    DB_QUERY_SECONDS, DB_WRITE_BATCH_SIZE, SLACK_API_SECONDS, SLACK_API_CALLS, SLACK_THROTTLE_SECONDS,
+    OUTBOUND_COALESCED, DAILY_CLAIMS, DIGEST_RENDERS, JOB_SECONDS, JOB_FAILURES,
+    RETENTION_ROWS, DB_RECLAIMED_BYTES, DB_SIZE_BYTES, LEADER, LEADER_TRANSITIONS,
+]
+
+
+def watch_dispatcher(dispatcher):
+    """Expor a profundidade da fila e os workers ocupados do dispatcher"""
+    EVENT_QUEUE_DEPTH.set_function(dispatcher.queue_depth)
+    EVENT_WORKERS_BUSY.set_function(lambda: dispatcher.busy)
+
+
+def render():
+    """Todas as métricas no formato de texto do Prometheus"""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port):
+    """Servidor só para o /metrics (Socket Mode não tem servidor HTTP próprio)"""
+    server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info("Métricas disponíveis em http://0.0.0.0:%d/metrics", port)
+    return server
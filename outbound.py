@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Envio de chamadas ao Slack respeitando os rate limits da API
+
+Cada método tem um token bucket com o limite do seu tier (o chat.postMessage
+é limitado por canal). Uma resposta 429 bloqueia o método pelo tempo do
+Retry-After e a chamada é refeita depois. Envios repetidos para a mesma
+chave (ex: a confirmação no DM de um usuário) passam por um debounce: uma
+rajada de mensagens gera um único envio, com o conteúdo mais recente.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import logging
+
+from slack_sdk.errors import SlackApiError
+
+from metrics import OUTBOUND_COALESCED, SLACK_THROTTLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Chamadas por minuto de cada método, segundo os tiers da API Web do Slack
+DEFAULT_RATE_LIMITS = {
+    'chat.postMessage': 60,  # limite especial: ~1 mensagem por segundo por canal
+    'chat.update': 50,       # Tier 3
+    'bots.info': 20,         # Tier 2
+}
+DEFAULT_RATE_LIMIT = 50      # Tier 3 para os demais métodos
+
+# Métodos cujo limite vale por canal
+PER_CHANNEL_METHODS = {'chat.postMessage'}
+
+
+def rate_limits_from_env():
+    """Limites por método, com ajustes no formato "chat.update=50,bots.info=20" (por minuto)"""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in os.getenv('SLACK_RATE_LIMITS', '').split(','):
+        if '=' in item:
+            method, per_minute = item.split('=', 1)
+            limits[method.strip()] = float(per_minute)
+    return limits
+
+
+def retry_after(error):
+    """Segundos do Retry-After de um erro 429; None se não for rate limit"""
+    response = getattr(error, 'response', None)
+    if response is None or response.status_code != 429:
+        return None
+    for name, value in (response.headers or {}).items():
+        if name.lower() == 'retry-after':
+            if isinstance(value, (list, tuple)):
+                value = value[0]
+            return float(value)
+    return 1.0
+
+
+def method_attr(method):
+    """Nome do método do WebClient: chat.postMessage -> chat_postMessage"""
+    return method.replace('.', '_')
+
+
+class TokenBucket:
+    """Token bucket que aceita reservas: a espera cresce com a fila de chamadas"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def reserve(self, now):
+        """Consumir um token; retorna quantos segundos esperar antes da chamada"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Token buckets por método (e por canal) e bloqueios vindos do Retry-After"""
+
+    def __init__(self, limits=None, burst=3, clock=time.monotonic):
+        self.limits = dict(DEFAULT_RATE_LIMITS if limits is None else limits)
+        self.burst = max(1, burst)
+        self.clock = clock
+        self._buckets = {}
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+
+    def _key(self, method, channel):
+        return (method, channel if method in PER_CHANNEL_METHODS else None)
+
+    def reserve(self, method, channel=None):
+        """Reservar uma chamada; retorna a espera em segundos"""
+        key = self._key(method, channel)
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = self.limits.get(method, DEFAULT_RATE_LIMIT) / 60.0
+                bucket = self._buckets[key] = TokenBucket(rate, self.burst, now)
+            wait = bucket.reserve(now)
+            return max(wait, self._blocked_until.get(key, now) - now)
+
+    def block(self, method, seconds, channel=None):
+        """Bloquear o método (ou método + canal) até passar o Retry-After"""
+        key = self._key(method, channel)
+        with self._lock:
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0), self.clock() + seconds)
+
+
+class OutboundClient:
+    """Chamadas com rate limit e retry, e envios com debounce em threads próprias"""
+
+    def __init__(self, client, limiter=None, debounce=2.0, max_retries=3, senders=2):
+        self.client = client
+        self.limiter = limiter or RateLimiter()
+        self.debounce_delay = debounce
+        self.max_retries = max_retries
+        self.senders = max(1, senders)
+
+        self._pending = {}      # chave -> função de envio
+        self._heap = []         # (quando, seq, chave)
+        self._inflight = set()  # chaves sendo enviadas agora
+        self._waiting = set()   # chaves vencidas esperando o envio em andamento terminar
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+        self.sent = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls, client):
+        """Criar cliente a partir das variáveis de ambiente"""
+        return cls(
+            client,
+            limiter=RateLimiter(rate_limits_from_env(), burst=int(os.getenv('SLACK_RATE_BURST', 3))),
+            debounce=float(os.getenv('DM_CONFIRMATION_DEBOUNCE', 2.0)),
+            max_retries=int(os.getenv('SLACK_MAX_RETRIES', 3)),
+        )
+
+    def call(self, method, **kwargs):
+        """Chamar o método da API esperando o rate limit e refazendo após 429"""
+        channel = kwargs.get('channel')
+        for attempt in itertools.count():
+            wait = self.limiter.reserve(method, channel)
+            if wait > 0:
+                SLACK_THROTTLE_SECONDS.labels(method).observe(wait)
+                time.sleep(wait)
+            try:
+                return getattr(self.client, method_attr(method))(**kwargs)
+            except SlackApiError as e:
+                delay = retry_after(e)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                logger.warning("Rate limit em %s, nova tentativa em %.1fs", method, delay)
+                self.limiter.block(method, delay, channel)
+
+    def debounce(self, key, send):
+        """Agendar `send()` para daqui a `debounce` segundos; pedidos repetidos são agrupados"""
+        if self.debounce_delay <= 0:
+            send()
+            return
+
+        with self._cond:
+            if key in self._pending:
+                self.coalesced += 1
+                OUTBOUND_COALESCED.inc()
+                return
+            self._pending[key] = send
+            heapq.heappush(self._heap, (time.monotonic() + self.debounce_delay, next(self._seq), key))
+            if not self._threads:
+                self._start()
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {'pending': len(self._pending), 'sent': self.sent, 'coalesced': self.coalesced}
+
+    def stop(self, timeout=10.0):
+        """Enviar o que está pendente e encerrar as threads"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+        self._stopping = False
+
+    def _start(self):
+        for index in range(self.senders):
+            thread = threading.Thread(target=self._sender, name=f"outbound-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_key(self):
+        """Próxima chave vencida que não está sendo enviada (None = encerrar); chamar com o lock"""
+        while True:
+            if self._heap and (self._stopping or self._heap[0][0] <= time.monotonic()):
+                _, _, key = heapq.heappop(self._heap)
+                if key not in self._inflight:
+                    return key
+                # Outra thread ainda envia esta chave: só volta para a fila quando ela terminar,
+                # para dois envios da mesma chave nunca rodarem ao mesmo tempo
+                self._waiting.add(key)
+                continue
+            if self._stopping:
+                return None
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            self._cond.wait(timeout)
+
+    def _sender(self):
+        while True:
+            with self._cond:
+                key = self._next_key()
+                if key is None:
+                    return
+                # Retirar antes de enviar: mensagens que chegarem durante o envio agendam outro
+                send = self._pending.pop(key)
+                self._inflight.add(key)
+
+            try:
+                send()
+                with self._cond:
+                    self.sent += 1
+            except Exception as e:
+                logger.error("Erro no envio agendado para %s: %s", key, e, exc_info=True)
+            finally:
+                with self._cond:
+                    self._inflight.discard(key)
+                    if key in self._waiting:
+                        self._waiting.discard(key)
+                        heapq.heappush(self._heap, (time.monotonic(), next(self._seq), key))
+                        self._cond.notify()
+
+
+class AsyncOutboundClient:
+    """Equivalente asyncio do OutboundClient (chamadas e debounce no event loop)"""
+
+    def __init__(self, client, limiter=None, debounce=2.0, max_retries=3):
+        self.client = client
+        self.limiter = limiter or RateLimiter()
+        self.debounce_delay = debounce
+        self.max_retries = max_retries
+
+        self._pending = {}      # chave -> tarefa (da espera até o fim do envio)
+        self._inflight = set()  # chaves sendo enviadas agora
+        self._waiting = {}      # chave -> envio pedido durante o envio em andamento
+        self._flush = asyncio.Event()
+
+        self.sent = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls, client):
+        """Criar cliente a partir das variáveis de ambiente"""
+        return cls(
+            client,
+            limiter=RateLimiter(rate_limits_from_env(), burst=int(os.getenv('SLACK_RATE_BURST', 3))),
+            debounce=float(os.getenv('DM_CONFIRMATION_DEBOUNCE', 2.0)),
+            max_retries=int(os.getenv('SLACK_MAX_RETRIES', 3)),
+        )
+
+    async def call(self, method, **kwargs):
+        """Chamar o método da API esperando o rate limit e refazendo após 429"""
+        channel = kwargs.get('channel')
+        for attempt in itertools.count():
+            wait = self.limiter.reserve(method, channel)
+            if wait > 0:
+                SLACK_THROTTLE_SECONDS.labels(method).observe(wait)
+                await asyncio.sleep(wait)
+            try:
+                return await getattr(self.client, method_attr(method))(**kwargs)
+            except SlackApiError as e:
+                delay = retry_after(e)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                logger.warning("Rate limit em %s, nova tentativa em %.1fs", method, delay)
+                self.limiter.block(method, delay, channel)
+
+    async def debounce(self, key, send):
+        """Agendar a coroutine `send()`; pedidos repetidos dentro da janela são agrupados"""
+        if self.debounce_delay <= 0:
+            await send()
+            return
+
+        if key in self._inflight:
+            # Pedido durante o envio: mais um envio depois que este terminar
+            if key in self._waiting:
+                self.coalesced += 1
+                OUTBOUND_COALESCED.inc()
+            self._waiting[key] = send
+            return
+        if key in self._pending:
+            self.coalesced += 1
+            OUTBOUND_COALESCED.inc()
+            return
+        self._pending[key] = asyncio.create_task(self._send_later(key, send))
+
+    def stats(self):
+        return {'pending': len(self._pending), 'sent': self.sent, 'coalesced': self.coalesced}
+
+    async def stop(self):
+        """Enviar o que está pendente"""
+        self._flush.set()
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
+
+    async def _send_later(self, key, send):
+        # A chave fica reservada até o fim do envio: dois envios da mesma chave nunca rodam juntos
+        try:
+            while send is not None:
+                try:
+                    await asyncio.wait_for(self._flush.wait(), self.debounce_delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._inflight.add(key)
+                try:
+                    await send()
+                    self.sent += 1
+                except Exception as e:
+                    logger.error("Erro no envio agendado para %s: %s", key, e, exc_info=True)
+                finally:
+                    self._inflight.discard(key)
+                send = self._waiting.pop(key, None)
+        finally:
+            self._inflight.discard(key)
+            self._waiting.pop(key, None)
+            del self._pending[key]
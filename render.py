@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Renderização do digest: templates por usuário, Block Kit e divisão em partes
+
+O mesmo digest é mostrado em três lugares: na resposta à daily (thread), na
+confirmação do DM e no lembrete das 23:55. Cada um é um "tipo" de
+renderização do template do usuário (intro diferente, mesmo corpo).
+
+Templates ficam num JSON (TEMPLATES_FILE), um objeto por nome:
+
+    {"standup": {
+        "header": "Daily de {date}",
+        "sections": [{"title": "Ontem", "prefixes": ["ontem", "yesterday"]},
+                     {"title": "Hoje", "prefixes": ["hoje", "today"]},
+                     {"title": "Impedimentos", "prefixes": ["impedimentos", "blockers"]}],
+        "other": "Outros",
+        "footer": "{count} mensagens",
+        "blocks": true}}
+
+Com seções, cada linha das mensagens que começa com um prefixo seguido de
+":" ou "-" (ex: "Hoje: revisar PR") vai para aquela seção, e as linhas
+seguintes da mesma mensagem também; o resto fica em "other". Sem seções,
+cada mensagem é um item, como no formato original. Campos disponíveis:
+{user}, {date} e {count}; {message} na linha de cada item.
+
+Templates são compilados uma vez no início (erros aparecem na hora) e
+resolvidos por usuário (campo "template" da assinatura, ou DIGEST_TEMPLATE).
+O resultado de cada renderização fica num cache pela chave (usuário, data,
+tipo, template, versão das mensagens): uma nova mensagem muda a versão, e
+renderizar de novo o mesmo dia não custa nada. Textos e blocos acima dos
+limites do Slack são divididos em várias mensagens.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+from cache import TTLCache, MISSING
+from metrics import DIGEST_RENDERS
+
+logger = logging.getLogger(__name__)
+
+# Limites do Slack: blocos por mensagem, texto de um bloco section, texto de
+# um header e texto de uma mensagem (acima disso o Slack trunca)
+MAX_BLOCKS = 50
+MAX_SECTION_TEXT = 3000
+MAX_HEADER_TEXT = 150
+MAX_MESSAGE_TEXT = 40000
+
+DEFAULT_TEMPLATE = 'padrao'
+
+# Formato original: só as mensagens, uma por linha, sem título nem total. A
+# linha é a mesma de digest.format_line, então o texto do Digest serve de corpo
+DEFAULT_SPEC = {
+    'line': '• {message}',
+    'confirmation': 'Beleza <@{user}>!\n\nEssa será sua daily de hoje:',
+    'reminder': '⚠️ **Lembrete:** Daily ainda não foi respondida hoje!\n',
+}
+
+# Marcadores de lista removidos dos itens de uma seção ("- revisar PR")
+_BULLET = re.compile(r'^\s*(?:[-*•]\s+)?')
+
+
+class Part(NamedTuple):
+    """Uma mensagem do Slack: texto e, em templates com Block Kit, os blocos"""
+    text: str
+    blocks: Optional[list] = None
+
+    def message(self):
+        """Argumentos de texto do chat.postMessage / chat.update"""
+        if self.blocks:
+            return {'text': self.text, 'blocks': self.blocks}
+        return {'text': self.text}
+
+
+class Template:
+    """Template compilado: formatos validados e regex dos prefixos das seções"""
+
+    __slots__ = ('name', 'header', 'footer', 'line', 'intros', 'sections', 'other',
+                 'blocks', 'divider', 'plain', '_prefixes')
+
+    def __init__(self, name, spec):
+        unknown = set(spec) - {'header', 'footer', 'line', 'sections', 'other', 'blocks', 'divider',
+                               'confirmation', 'reminder'}
+        if unknown:
+            raise ValueError(f"Template {name}: chaves desconhecidas {sorted(unknown)}")
+        spec = {**DEFAULT_SPEC, **spec}
+
+        self.name = name
+        self.header = _checked(name, spec.get('header'))
+        self.footer = _checked(name, spec.get('footer'))
+        self.line = _checked(name, spec['line'], message='')
+        self.intros = {
+            'reply': None,
+            'confirmation': _checked(name, spec['confirmation']),
+            'reminder': _checked(name, spec['reminder']),
+        }
+        self.other = spec.get('other')
+        self.blocks = bool(spec.get('blocks', False))
+        self.divider = bool(spec.get('divider', True))
+
+        self.sections = []
+        alternatives = []
+        for index, section in enumerate(spec.get('sections') or ()):
+            prefixes = [prefix for prefix in section.get('prefixes', ()) if prefix]
+            if not section.get('title') or not prefixes:
+                raise ValueError(f"Template {name}: seção {index} sem title ou prefixes")
+            self.sections.append(section['title'])
+            alternatives.append(f"(?P<s{index}>{'|'.join(re.escape(prefix) for prefix in prefixes)})")
+        # "Hoje: texto", "hoje - texto" ou só "Hoje:" (as linhas seguintes são da seção)
+        self._prefixes = re.compile(
+            rf"^\s*(?:{'|'.join(alternatives)})\s*[:\-–]\s*(?P<rest>.*)$", re.IGNORECASE | re.DOTALL
+        ) if alternatives else None
+        # Só as linhas no formato do Digest: o texto já montado por ele é o corpo
+        self.plain = (not self.sections and not self.header and not self.footer and not self.blocks
+                      and self.line == DEFAULT_SPEC['line'])
+
+    def group(self, messages):
+        """[(título ou None, [itens])] na ordem do template, sem seções vazias"""
+        if self._prefixes is None:
+            return [(None, list(messages))] if messages else []
+
+        other, items = [], [[] for _ in self.sections]
+        for message in messages:
+            target = other
+            for line in message.split('\n'):
+                match = self._prefixes.match(line)
+                if match:
+                    index = int(next(key for key, value in match.groupdict().items()
+                                     if value is not None and key != 'rest')[1:])
+                    target, line = items[index], match.group('rest')
+                line = _BULLET.sub('', line, count=1).strip()
+                if line:
+                    target.append(line)
+
+        groups = [(self.other, other)] if other else []
+        groups.extend((title, lines) for title, lines in zip(self.sections, items) if lines)
+        return groups
+
+
+class DigestRenderer:
+    """Templates por usuário e cache das renderizações do digest"""
+
+    def __init__(self, templates=None, default=DEFAULT_TEMPLATE, subscriptions=None,
+                 max_chars=4000, cache_size=1000, cache_ttl=86400.0):
+        self.templates = {DEFAULT_TEMPLATE: Template(DEFAULT_TEMPLATE, {})}
+        for name, spec in (templates or {}).items():
+            self.templates[name] = Template(name, spec)
+        if default not in self.templates:
+            raise ValueError(f"DIGEST_TEMPLATE desconhecido: {default}")
+        self.default = default
+        self.subscriptions = subscriptions
+        self.max_chars = max(200, min(int(max_chars), MAX_MESSAGE_TEXT))
+
+        self._by_user = {}  # user_id -> Template
+        self._lock = threading.Lock()
+        # (user_id, data, tipo, template, versão) -> [Part]
+        self._rendered = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @classmethod
+    def from_env(cls, subscriptions=None):
+        """Criar a partir das variáveis de ambiente"""
+        templates = {}
+        path = os.getenv('TEMPLATES_FILE')
+        if path:
+            with open(path, encoding='utf-8') as f:
+                templates = json.load(f)
+        return cls(
+            templates,
+            default=os.getenv('DIGEST_TEMPLATE', DEFAULT_TEMPLATE),
+            subscriptions=subscriptions,
+            max_chars=int(os.getenv('DIGEST_MAX_CHARS', 4000)),
+            cache_size=int(os.getenv('DIGEST_RENDER_CACHE_SIZE', 1000)),
+        )
+
+    def template_for(self, user_id):
+        """Template compilado do usuário (campo "template" da assinatura ou o padrão)"""
+        template = self._by_user.get(user_id)
+        if template is not None:
+            return template
+        subscription = self.subscriptions.for_user(user_id) if self.subscriptions is not None else None
+        name = getattr(subscription, 'template', None) or self.default
+        template = self.templates.get(name)
+        if template is None:
+            logger.warning("Template %s de %s não existe, usando %s", name, user_id, self.default)
+            template = self.templates[self.default]
+        with self._lock:
+            self._by_user[user_id] = template
+        return template
+
+    def invalidate(self, user_id=None):
+        """Esquecer o template resolvido de um usuário (ou de todos) após mudar as assinaturas"""
+        with self._lock:
+            if user_id is None:
+                self._by_user.clear()
+            else:
+                self._by_user.pop(user_id, None)
+
+    def render(self, user_id, date, digest, kind='reply'):
+        """Partes (mensagens do Slack) do digest; a confirmação do DM cabe sempre numa só"""
+        template = self.template_for(user_id)
+        key = (user_id, date, kind, template.name, len(digest), digest.last_id)
+        parts = self._rendered.get(key)
+        if parts is not MISSING:
+            DIGEST_RENDERS.labels('hit').inc()
+            return parts
+
+        DIGEST_RENDERS.labels('miss').inc()
+        parts = None
+        if template.plain:
+            # Sem percorrer as mensagens: o Digest mantém o texto a cada mensagem nova
+            intro = template.intros[kind]
+            text = f"{intro.format(user=user_id, date=date, count=len(digest))}\n{digest.text}" if intro else digest.text
+            if len(text) <= self.max_chars:
+                parts = [Part(text)]
+        if parts is None:
+            parts = self.render_messages(template, user_id, date, digest.messages, kind)
+        self._rendered.set(key, parts)
+        return parts
+
+    def render_messages(self, template, user_id, date, messages, kind='reply'):
+        """Renderizar sem cache (ex: mensagens que não vieram de um Digest)"""
+        fields = {'user': user_id, 'date': date, 'count': len(messages)}
+        groups = template.group(messages)
+        intro = template.intros[kind].format(**fields) if template.intros[kind] else None
+        header = template.header.format(**fields) if template.header else None
+        footer = template.footer.format(**fields) if template.footer else None
+        lines = [[template.line.format(message=item, **fields) for item in items] for _, items in groups]
+        titles = [title for title, _ in groups]
+
+        if template.blocks:
+            parts = self._blocks(intro, header, titles, lines, footer, template.divider)
+        else:
+            parts = self._text(intro, header, titles, lines, footer)
+        if kind == 'confirmation' and len(parts) > 1:
+            parts = [_truncated(parts, self.max_chars)]
+        return parts
+
+    def stats(self):
+        with self._lock:
+            users = len(self._by_user)
+        return {'templates': len(self.templates), 'default': self.default, 'users': users,
+                'cache': self._rendered.stats()}
+
+    def _text(self, intro, header, titles, lines, footer):
+        """Texto em mrkdwn dividido em partes de até max_chars"""
+        units = []  # (linha, título da seção para repetir na continuação)
+        if intro:
+            units.append((intro, None))
+        if header:
+            units.append((f'*{header}*', None))
+        for title, items in zip(titles, lines):
+            if title:
+                units.append((f'*{title}*', None))
+            units.extend((item, title) for item in items)
+        if footer:
+            units.append((f'_{footer}_', None))
+
+        parts, current, size = [], [], 0
+        for text, title in units:
+            for piece in _chunks(text, self.max_chars):
+                if current and size + 1 + len(piece) > self.max_chars:
+                    parts.append('\n'.join(current))
+                    current, size = [], 0
+                    heading = f'*{title}* (cont.)' if title else None
+                    if heading and len(heading) + 1 + len(piece) <= self.max_chars:
+                        current, size = [heading], len(heading)
+                size += len(piece) + (1 if current else 0)
+                current.append(piece)
+        if current:
+            parts.append('\n'.join(current))
+        return [Part(text) for text in parts]
+
+    def _blocks(self, intro, header, titles, lines, footer, divider):
+        """Blocos (header, uma section por seção, context) em partes de até MAX_BLOCKS"""
+        blocks = []
+        if intro:
+            blocks.extend(_section(piece) for piece in _chunks(intro, MAX_SECTION_TEXT))
+        if header:
+            blocks.append({'type': 'header', 'text': {'type': 'plain_text', 'text': header[:MAX_HEADER_TEXT],
+                                                      'emoji': True}})
+        for index, (title, items) in enumerate(zip(titles, lines)):
+            if index and divider:
+                blocks.append({'type': 'divider'})
+            text = f'*{title}*' if title else ''
+            for item in items:
+                for piece in _chunks(item, MAX_SECTION_TEXT):
+                    if text and len(text) + 1 + len(piece) > MAX_SECTION_TEXT:
+                        blocks.append(_section(text))
+                        text = ''
+                    text = f'{text}\n{piece}' if text else piece
+            if text:
+                blocks.append(_section(text))
+        if footer:
+            blocks.append({'type': 'context', 'elements': [{'type': 'mrkdwn', 'text': footer}]})
+
+        # Texto das notificações: a intro, o título ou o primeiro item
+        summary = intro or header or next((item for items in lines for item in items), '')
+        summary = summary[:MAX_HEADER_TEXT]
+        pages = [blocks[start:start + MAX_BLOCKS] for start in range(0, len(blocks), MAX_BLOCKS)] or [[]]
+        if len(pages) == 1:
+            return [Part(summary, pages[0])]
+        return [Part(f'{summary} ({number}/{len(pages)})', page) for number, page in enumerate(pages, 1)]
+
+
+def _checked(name, fmt, **extra):
+    """Validar um formato do template com campos de exemplo"""
+    if fmt is None:
+        return None
+    try:
+        fmt.format(user='U', date='2024-01-01', count=0, **extra)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"Template {name}: formato inválido {fmt!r} ({e})") from None
+    return fmt
+
+
+def _chunks(text, size):
+    """Dividir um texto maior que `size`, de preferência em quebras de linha"""
+    while len(text) > size:
+        cut = text.rfind('\n', 0, size)
+        cut = cut if cut > 0 else size
+        yield text[:cut]
+        text = text[cut:].lstrip('\n')
+    yield text
+
+
+def _section(text):
+    return {'type': 'section', 'text': {'type': 'mrkdwn', 'text': text}}
+
+
+def _truncated(parts, max_chars):
+    """Só a primeira parte, avisando quantas ficaram de fora (prévia no DM)"""
+    note = f'… e mais {len(parts) - 1} parte(s) na daily'
+    first = parts[0]
+    if first.blocks:
+        blocks = first.blocks[:MAX_BLOCKS - 1]
+        blocks.append({'type': 'context', 'elements': [{'type': 'mrkdwn', 'text': f'_{note}_'}]})
+        return Part(first.text, blocks)
+    text = first.text
+    if len(text) + len(note) + 3 > max_chars:
+        text = text[:max_chars - len(note) - 3].rsplit('\n', 1)[0]
+    return Part(f'{text}\n_{note}_')
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controle de "daily já respondida" por usuário e dia
+
+A tabela daily_responses é a fonte da verdade: antes de postar, o worker
+reserva a resposta com um compare-and-set em (user_id, date), então só um
+evento (ou worker, ou processo) responde por usuário por dia, mesmo com
+mensagens da daily processadas em paralelo. Se o envio falhar a reserva é
+desfeita. Respostas confirmadas ficam num cache em memória: como nunca voltam
+a "não respondida", a maioria das consultas não toca o banco.
+"""
+
+import os
+import logging
+
+from cache import TTLCache, MISSING
+from metrics import DAILY_CLAIMS
+
+logger = logging.getLogger(__name__)
+
+
+class DailyResponses:
+    """Reserva atômica da resposta do dia no banco com cache read-through"""
+
+    def __init__(self, storage, maxsize=10000, ttl=86400.0):
+        self.storage = storage
+        # (user_id, data) -> True; só respostas confirmadas são cacheadas
+        self.answered = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @classmethod
+    def from_env(cls, storage):
+        """Criar a partir das variáveis de ambiente"""
+        return cls(storage, maxsize=int(os.getenv('DAILY_RESPONSE_CACHE_SIZE', 10000)))
+
+    def responded(self, user_id, date):
+        """A daily do usuário na data já foi respondida (por qualquer processo)?"""
+        key = (user_id, date)
+        if self.answered.get(key) is not MISSING:
+            return True
+        if self.storage.response_sent(user_id, date):
+            self.answered.set(key, True)
+            return True
+        return False
+
+    def claim(self, user_id, date):
+        """Reservar a resposta do dia; False se outro worker ou processo já reservou"""
+        key = (user_id, date)
+        if self.answered.get(key) is not MISSING:
+            DAILY_CLAIMS.labels('taken').inc()
+            return False
+        claimed = self.storage.claim_response(user_id, date)
+        self.answered.set(key, True)
+        DAILY_CLAIMS.labels('claimed' if claimed else 'taken').inc()
+        return claimed
+
+    def release(self, user_id, date):
+        """Desfazer a reserva de uma resposta que não foi enviada"""
+        self.storage.release_response(user_id, date)
+        self.answered.discard((user_id, date))
+
+    def stats(self):
+        return self.answered.stats()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retenção do histórico: arquivamento dos dias antigos e compactação do banco
+
+Um job diário do scheduler (RETENTION_AT, fora do horário de uso) move os
+usuário/dias mais antigos que RETENTION_DAYS de daily_messages e
+daily_responses para o arquivo:
+
+- "table": tabela daily_archive no próprio banco, um blob comprimido por
+  usuário/dia (as mensagens somem das tabelas quentes e dos índices);
+- "file": arquivos NDJSON gzip por mês em RETENTION_ARCHIVE_DIR;
+- "none": só apaga.
+
+Cada lote de RETENTION_BATCH usuário/dias é uma transação curta, com uma
+pausa entre lotes, para não segurar o lock de escrita que o caminho dos
+eventos usa. Depois, as páginas livres são devolvidas ao sistema aos poucos
+(PRAGMA incremental_vacuum) e o PRAGMA optimize atualiza as estatísticas.
+"""
+
+import os
+import gzip
+import json
+import time
+import zlib
+import logging
+from datetime import date, timedelta
+
+from metrics import RETENTION_ROWS, DB_RECLAIMED_BYTES
+from storage import open_storage
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MODES = ('table', 'file', 'none')
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def encode_messages(messages):
+    """[(id, channel_id, message, timestamp), ...] -> blob zlib de JSON"""
+    return zlib.compress(json.dumps(messages, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_messages(blob):
+    """Inverso de encode_messages: lista de [id, channel_id, message, timestamp]"""
+    return json.loads(zlib.decompress(blob))
+
+
+def archive_record(user_id, day, messages, response_sent):
+    """Registro de um usuário/dia no arquivo NDJSON"""
+    return {
+        'user_id': user_id,
+        'date': day,
+        'response_sent': response_sent,
+        'messages': [
+            {'id': message_id, 'channel_id': channel_id, 'message': message, 'timestamp': timestamp}
+            for message_id, channel_id, message, timestamp in messages
+        ],
+    }
+
+
+class Retention:
+    """Job de retenção e compactação do banco"""
+
+    def __init__(self, storage, days=0, archive='table', archive_dir='archive',
+                 batch=50, pause=0.05, vacuum_pages=1000):
+        if archive not in ARCHIVE_MODES:
+            raise ValueError(f"RETENTION_ARCHIVE inválido: {archive!r} (use {', '.join(ARCHIVE_MODES)})")
+        self.storage = storage
+        self.days = days
+        self.archive = archive
+        self.archive_dir = archive_dir
+        self.batch = max(1, batch)
+        self.pause = pause
+        self.vacuum_pages = max(1, vacuum_pages)
+        self.last_run = None
+
+    @classmethod
+    def from_env(cls, storage):
+        """Criar a partir das variáveis de ambiente"""
+        return cls(
+            storage,
+            days=int(os.getenv('RETENTION_DAYS', 0)),
+            archive=os.getenv('RETENTION_ARCHIVE', 'table').lower(),
+            archive_dir=os.getenv('RETENTION_ARCHIVE_DIR', 'archive'),
+            batch=int(os.getenv('RETENTION_BATCH', 50)),
+            pause=float(os.getenv('RETENTION_PAUSE', 0.05)),
+            vacuum_pages=int(os.getenv('RETENTION_VACUUM_PAGES', 1000)),
+        )
+
+    @property
+    def enabled(self):
+        return self.days > 0
+
+    def cutoff(self, today):
+        """Primeiro dia mantido: dias anteriores a ele saem das tabelas"""
+        return (today - timedelta(days=self.days)).isoformat()
+
+    def run(self, today=None):
+        """Arquivar os dias antigos e compactar; retorna o relatório da execução"""
+        start = time.perf_counter()
+        before = self.cutoff(today or date.today())
+        days = messages = responses = 0
+        while True:
+            records = self.storage.take_old_days(before, self.batch, self._archiver())
+            if not records:
+                break
+            days += len(records)
+            count = sum(len(record[2]) for record in records)
+            responded = sum(1 for record in records if record[3])
+            messages += count
+            responses += responded
+            RETENTION_ROWS.labels('messages').inc(count)
+            RETENTION_ROWS.labels('responses').inc(responded)
+            # Deixar os escritores do caminho dos eventos pegarem o lock
+            time.sleep(self.pause)
+
+        reclaimed = self.compact()
+        size_after, free = self.storage.db_size()
+        report = {
+            'before': before,
+            'days': days,
+            'messages': messages,
+            'responses': responses,
+            'archive': self.archive,
+            'size_bytes': size_after,
+            'free_bytes': free,
+            'reclaimed_bytes': reclaimed,
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+        self.last_run = report
+        logger.info(
+            "Retenção: %d usuário/dias anteriores a %s (%d mensagens, %d respostas) -> %s; "
+            "%d bytes devolvidos, banco com %d bytes (%d livres) em %.1fs",
+            days, before, messages, responses, self.archive, reclaimed,
+            size_after, free, report['seconds'], extra={'job': 'retention'}
+        )
+        if free and self.storage.auto_vacuum() != AUTO_VACUUM_INCREMENTAL:
+            logger.warning(
+                "Banco sem auto_vacuum incremental: %d bytes livres não são devolvidos ao sistema. "
+                "Com o bot parado, rode `python bot.py compact` uma vez", free
+            )
+        return report
+
+    def _archiver(self):
+        """Callback de take_old_days conforme o modo de arquivamento"""
+        if self.archive == 'table':
+            return lambda records: [
+                (user_id, day, encode_messages(messages), len(messages), response_sent)
+                for user_id, day, messages, response_sent in records
+            ]
+        if self.archive == 'file':
+            return self._write_files
+        return None
+
+    def _write_files(self, records):
+        """Anexar os registros aos arquivos do mês, gravados em disco antes de apagar do banco"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        by_month = {}
+        for user_id, day, messages, response_sent in records:
+            by_month.setdefault(day[:7], []).append(archive_record(user_id, day, messages, response_sent))
+        for month, items in by_month.items():
+            path = os.path.join(self.archive_dir, f'daily-{month}.ndjson.gz')
+            # Cada lote vira um membro gzip: o arquivo continua legível com zcat/gzip.open
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as stream:
+                    for item in items:
+                        stream.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+                raw.flush()
+                os.fsync(raw.fileno())
+        return []
+
+    def compact(self):
+        """Devolver as páginas livres ao sistema em passos curtos e atualizar estatísticas; retorna bytes"""
+        reclaimed = 0
+        if self.storage.auto_vacuum() == AUTO_VACUUM_INCREMENTAL:
+            size, _ = self.storage.db_size()
+            free_pages = None
+            while True:
+                # Cada passo é uma transação curta que libera até vacuum_pages páginas
+                remaining = self.storage.incremental_vacuum(self.vacuum_pages)
+                if not remaining or remaining == free_pages:
+                    break
+                free_pages = remaining
+                time.sleep(self.pause)
+            reclaimed = max(0, size - self.storage.db_size()[0])
+            DB_RECLAIMED_BYTES.inc(reclaimed)
+        self.storage.optimize()
+        return reclaimed
+
+    def archived(self, user_id, day):
+        """Mensagens arquivadas na tabela para o usuário/dia: (mensagens, response_sent)"""
+        messages, responded = [], False
+        for blob, response_sent in self.storage.get_archive(user_id, day):
+            messages.extend(decode_messages(blob))
+            responded = responded or bool(response_sent)
+        return messages, responded
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'days': self.days,
+            'archive': self.archive,
+            'last_run': self.last_run,
+        }
+
+
+def add_commands(subparsers):
+    """Subcomandos retention/compact do `python bot.py`"""
+    parser = subparsers.add_parser('retention', help='aplicar a retenção agora (RETENTION_DAYS)')
+    parser.add_argument('--days', type=int, help='dias mantidos (default: RETENTION_DAYS)')
+    parser.set_defaults(handler=run_command)
+    parser = subparsers.add_parser(
+        'compact', help='VACUUM completo e auto_vacuum incremental (com o bot parado)')
+    parser.set_defaults(handler=run_command)
+
+
+def run_command(args):
+    """Executar retention/compact com o banco configurado; retorna o código de saída"""
+    storage = open_storage()
+    storage.init_schema(os.getenv('USER_ID'))
+    try:
+        if args.command == 'compact':
+            size, free = storage.db_size()
+            start = time.perf_counter()
+            storage.vacuum()
+            after, _ = storage.db_size()
+            logger.info("Banco compactado: %d -> %d bytes (%d livres antes) em %.1fs",
+                        size, after, free, time.perf_counter() - start)
+            return 0
+        retention = Retention.from_env(storage)
+        if args.days is not None:
+            retention.days = args.days
+        if not retention.enabled:
+            logger.error("Defina RETENTION_DAYS (ou --days) maior que zero")
+            return 1
+        retention.run()
+        return 0
+    finally:
+        storage.close()
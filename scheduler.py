@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agendador de jobs diários com estado persistido no banco
+
+Os próximos horários ficam num heap e uma única thread dorme até o primeiro
+deles (Condition.wait com timeout): precisão abaixo de um segundo sem
+polling. Os jobs rodam num pool de threads, então um job lento não atrasa os
+outros. O próximo horário de cada job fica na tabela scheduled_jobs: ao
+iniciar, execuções perdidas com o processo parado rodam uma vez (dentro da
+janela de tolerância) e, com vários processos, só quem avança o horário no
+banco (compare-and-set) executa.
+
+Com eleição de líder (leader.py), só o líder tenta executar os jobs do
+cluster, e o compare-and-set confere o token do seu lease; as outras réplicas
+só acompanham os horários. Ao virar líder, o agendador relê o banco e
+recupera o horário que o líder anterior não chegou a executar. Jobs locais
+(`local=True`, ex: limpar caches em memória) rodam em todo processo, sem banco.
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from metrics import JOB_SECONDS, JOB_FAILURES
+
+logger = logging.getLogger(__name__)
+
+
+def get_timezone(name):
+    """ZoneInfo a partir do nome (ex: America/Sao_Paulo); None = horário local do sistema"""
+    return ZoneInfo(name) if name else None
+
+
+def next_daily_run(at, tz, after):
+    """Próximo instante (epoch) em que o relógio de `tz` marca HH:MM, depois de `after`"""
+    hour, minute = map(int, at.split(':'))
+    now = datetime.fromtimestamp(after, tz)
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate.timestamp() <= after:
+        # Somar no calendário (não 24h) para acertar o horário em mudanças de horário de verão
+        day = now.date() + timedelta(days=1)
+        candidate = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz)
+    return candidate.timestamp()
+
+
+class Job:
+    """Job diário: `func(scheduled_for)` recebe o horário agendado no fuso do job"""
+
+    __slots__ = ('name', 'at', 'tz', 'func', 'grace', 'local', 'next_run', 'running')
+
+    def __init__(self, name, at, func, tz=None, grace=3600.0, local=False):
+        self.name = name
+        self.at = at
+        self.tz = tz
+        self.func = func
+        self.grace = grace
+        self.local = local
+        self.next_run = None
+        self.running = False
+
+    @property
+    def kind(self):
+        # Label das métricas: "remind_missed_daily:U123" -> "remind_missed_daily"
+        return self.name.split(':', 1)[0]
+
+    def next_after(self, after):
+        return next_daily_run(self.at, self.tz, after)
+
+
+class Scheduler:
+    """Heap de jobs diários, thread de timer e pool de execução"""
+
+    def __init__(self, storage, workers=4, grace=3600.0, clock=time.time, leader=None):
+        self.storage = storage
+        self.workers = max(1, workers)
+        self.grace = grace
+        self.clock = clock
+        self.leader = leader
+
+        self._jobs = {}
+        self._heap = []  # (próxima execução, seq, nome)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+        self._stopping = False
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.standby = 0
+
+        if leader is not None:
+            leader.add_listener(self._on_leadership)
+
+    @classmethod
+    def from_env(cls, storage, leader=None):
+        """Criar agendador a partir das variáveis de ambiente"""
+        return cls(
+            storage,
+            workers=int(os.getenv('SCHEDULER_WORKERS', 4)),
+            grace=float(os.getenv('SCHEDULER_CATCHUP_GRACE', 3600)),
+            leader=leader,
+        )
+
+    def add_daily(self, name, at, func, tz=None, grace=None, local=False):
+        """Registrar um job diário às HH:MM no fuso `tz` (antes ou depois do start)"""
+        return self.add_job(Job(name, at, func, tz, self.grace if grace is None else grace, local))
+
+    def add_job(self, job):
+        """Registrar um Job (ou subclasse com outro `next_after`)"""
+        with self._cond:
+            self._jobs[job.name] = job
+            if self._thread is not None:
+                self._schedule(job, self.clock())
+                self._cond.notify()
+        return job
+
+    def remove(self, name):
+        """Remover um job (a entrada no heap é descartada quando chegar a vez)"""
+        with self._cond:
+            self._jobs.pop(name, None)
+
+    def start(self):
+        """Carregar o estado salvo, recuperar execuções perdidas e iniciar o timer"""
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='scheduler')
+        now = self.clock()
+        with self._cond:
+            self._stopping = False
+            for job in self._jobs.values():
+                self._schedule(job, now)
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+        logger.info("Agendador iniciado com %d jobs e %d workers", len(self._jobs), self.workers)
+
+    def stop(self, timeout=30.0):
+        """Parar o timer e esperar os jobs em execução"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stats(self):
+        with self._cond:
+            return {
+                'jobs': len(self._jobs),
+                'next_run': datetime.fromtimestamp(self._heap[0][0]).isoformat() if self._heap else None,
+                'runs': self.runs,
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'standby': self.standby,
+                'leader': self.leader.is_leader if self.leader is not None else True,
+            }
+
+    def _fence(self):
+        """(True, fence) se este processo pode executar jobs do cluster agora"""
+        if self.leader is None or not self.leader.enabled:
+            return True, None
+        fence = self.leader.fence
+        return fence is not None, fence
+
+    def _on_leadership(self, is_leader):
+        """Ao virar líder, reler os horários do banco para recuperar o que ficou para trás"""
+        if not is_leader:
+            return
+        with self._cond:
+            if self._thread is None or self._stopping:
+                return
+            now = self.clock()
+            for job in self._jobs.values():
+                if not job.local:
+                    self._schedule(job, now)
+            self._cond.notify()
+
+    def _schedule(self, job, now):
+        """Definir a próxima execução a partir do banco, tratando execuções perdidas"""
+        if job.local:
+            job.next_run = job.next_after(now)
+            heapq.heappush(self._heap, (job.next_run, next(self._seq), job.name))
+            return
+
+        next_run = self.storage.init_job(job.name, job.next_after(now))
+        if next_run < now - job.grace:
+            # Perdida há mais tempo que a tolerância: pular para a próxima
+            logger.warning("Execução de %s às %s perdida, pulando",
+                           job.name, datetime.fromtimestamp(next_run, job.tz).isoformat())
+            new_run = job.next_after(now)
+            if self.storage.claim_job_run(job.name, next_run, new_run, None):
+                self.skipped += 1
+                next_run = new_run
+            else:
+                next_run = self.storage.get_job_next_run(job.name)
+        elif next_run < now:
+            logger.info("Recuperando execução perdida de %s", job.name)
+
+        job.next_run = next_run
+        heapq.heappush(self._heap, (next_run, next(self._seq), job.name))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    if self._heap:
+                        wait = self._heap[0][0] - self.clock()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+                scheduled_for, _, name = heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+                if job is None or job.next_run != scheduled_for:
+                    # Job removido ou reagendado
+                    continue
+
+                now = self.clock()
+                next_run = job.next_after(max(now, scheduled_for))
+                allowed, fence = (True, None) if job.local else self._fence()
+                # Compare-and-set no banco: só um processo executa cada horário
+                claimed = allowed and (job.local or self.storage.claim_job_run(
+                    name, scheduled_for, next_run, now, fence))
+                if claimed:
+                    if job.running:
+                        logger.warning("Job %s ainda em execução, pulando este horário", name)
+                        self.skipped += 1
+                    else:
+                        job.running = True
+                        self._pool.submit(self._execute, job, scheduled_for)
+                elif not allowed:
+                    # Fora da liderança: só acompanhar o horário, sem tocar no banco
+                    self.standby += 1
+                else:
+                    # Outro processo avançou o horário; se nada mudou no banco, o lease
+                    # trocou de mãos e o novo líder recupera este horário
+                    stored = self.storage.get_job_next_run(name)
+                    if stored is not None and stored != scheduled_for:
+                        next_run = stored
+                job.next_run = next_run
+                heapq.heappush(self._heap, (next_run, next(self._seq), name))
+
+    def _execute(self, job, scheduled_for):
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            job.func(datetime.fromtimestamp(scheduled_for, job.tz))
+        except Exception as e:
+            status = 'error'
+            JOB_FAILURES.labels(job.kind).inc()
+            logger.error("Erro no job agendado %s: %s", job.name, e, exc_info=True)
+        finally:
+            duration = time.perf_counter() - start
+            JOB_SECONDS.labels(job.kind).observe(duration)
+            with self._cond:
+                job.running = False
+                self.runs += 1
+                if status != 'ok':
+                    self.failures += 1
+            if not job.local:
+                try:
+                    self.storage.finish_job(job.name, status, duration)
+                except Exception as e:
+                    logger.error("Erro ao registrar execução de %s: %s", job.name, e)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validação das requisições do Slack no /events, da verificação mais barata à mais cara
+
+1) Timestamp fora da janela (replay ou lixo): descartado só com os headers,
+   sem ler o corpo.
+2) HMAC-SHA256 calculado direto sobre os bytes do corpo, a partir de um
+   estado já inicializado com o segredo: sem decode/encode nem cópias.
+3) Só então o JSON é lido, com orjson se estiver instalado.
+"""
+
+import os
+import json
+import time
+import hmac
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _json_backend(name):
+    """Função loads do backend pedido; "auto" usa orjson quando instalado"""
+    if name in ('auto', 'orjson'):
+        try:
+            import orjson
+            return 'orjson', orjson.loads
+        except ImportError:
+            if name == 'orjson':
+                logger.warning("JSON_BACKEND=orjson mas o orjson não está instalado, usando json")
+    return 'json', json.loads
+
+
+# orjson.JSONDecodeError é subclasse de ValueError, como o do json
+JSON_BACKEND, json_loads = _json_backend(os.getenv('JSON_BACKEND', 'auto').lower())
+
+
+class SignatureVerifier:
+    """Verificação da assinatura v0 do Slack (X-Slack-Signature)"""
+
+    def __init__(self, secret, max_age=300.0, clock=time.time):
+        self.max_age = max_age
+        self.clock = clock
+        # Estado do HMAC com a chave já processada: cada requisição só copia
+        self._mac = hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256) if secret else None
+
+    @classmethod
+    def from_env(cls, secret):
+        """Criar a partir das variáveis de ambiente"""
+        return cls(secret, max_age=float(os.getenv('SLACK_REQUEST_MAX_AGE', 300)))
+
+    def fresh(self, timestamp):
+        """Timestamp presente e dentro da janela de `max_age` segundos"""
+        try:
+            return abs(self.clock() - int(timestamp)) <= self.max_age
+        except (TypeError, ValueError):
+            return False
+
+    def verify(self, body, timestamp, signature):
+        """Assinatura do corpo (bytes) confere com o header"""
+        if self._mac is None or not signature:
+            return False
+        try:
+            mac = self._mac.copy()
+            mac.update(b'v0:' + timestamp.encode('ascii') + b':')
+            mac.update(body)
+            return hmac.compare_digest('v0=' + mac.hexdigest(), signature)
+        except (TypeError, ValueError):
+            # Headers ausentes ou com caracteres não ASCII
+            return False
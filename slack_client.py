@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cliente da API Web do Slack com métricas por método
+"""
+
+import time
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from metrics import SLACK_API_SECONDS, SLACK_API_CALLS
+
+
+def api_call_status(error):
+    """Status da chamada para o label das métricas"""
+    if error is None:
+        return 'ok'
+    if isinstance(error, SlackApiError) and error.response.status_code == 429:
+        return 'ratelimited'
+    return 'error'
+
+
+def observe_api_call(api_method, start, error=None):
+    SLACK_API_SECONDS.labels(api_method).observe(time.perf_counter() - start)
+    SLACK_API_CALLS.labels(api_method, api_call_status(error)).inc()
+
+
+class InstrumentedWebClient(WebClient):
+    """WebClient que mede duração e resultado de cada chamada (chat.postMessage, bots.info...)"""
+
+    def api_call(self, api_method, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().api_call(api_method, **kwargs)
+        except Exception as e:
+            observe_api_call(api_method, start, e)
+            raise
+        observe_api_call(api_method, start)
+        return response
@@ -0,0 +1,832 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Camada de armazenamento compartilhada pelo bot
+
+Storage (SQLite em DB_PATH) define as operações usadas pelo resto do código;
+storage_postgres.PostgresStorage implementa as mesmas operações, com os
+mesmos formatos de linha, em PostgreSQL. open_storage() escolhe o backend
+pelo DATABASE_URL.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import logging
+from itertools import islice
+from contextlib import contextmanager
+
+from metrics import DB_QUERY_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+# SQL fixo: o sqlite3 mantém um cache de statements preparados por conexão,
+# indexado pelo texto da query, então reutilizar as mesmas strings evita
+# recompilar as queries a cada chamada.
+SQL_INSERT_MESSAGE = (
+    "INSERT INTO daily_messages (user_id, channel_id, date, message) VALUES (?, ?, ?, ?)"
+)
+SQL_SELECT_MESSAGES = (
+    "SELECT message FROM daily_messages WHERE user_id = ? AND date = ? ORDER BY timestamp, id"
+)
+SQL_SELECT_MESSAGES_AFTER = (
+    "SELECT id, message FROM daily_messages "
+    "WHERE user_id = ? AND date = ? AND id > ? ORDER BY timestamp, id"
+)
+# Histórico da mais recente para a mais antiga, na ordem do índice
+# (user_id, date, timestamp, rowid); a página seguinte começa depois da
+# última linha (keyset), sem OFFSET
+SQL_HISTORY = (
+    "SELECT id, date, timestamp, message FROM daily_messages "
+    "WHERE user_id = ? AND date >= ? AND date <= ? "
+    "ORDER BY date DESC, timestamp DESC, id DESC LIMIT ?"
+)
+SQL_HISTORY_AFTER = (
+    "SELECT id, date, timestamp, message FROM daily_messages "
+    "WHERE user_id = ? AND date >= ? AND date <= ? AND (date, timestamp, id) < (?, ?, ?) "
+    "ORDER BY date DESC, timestamp DESC, id DESC LIMIT ?"
+)
+# Busca no índice FTS5 (termos + user_id) em ordem decrescente de id, sem ordenar os resultados
+SQL_SEARCH = (
+    "SELECT m.id, m.date, m.timestamp, m.message FROM daily_messages_fts "
+    "JOIN daily_messages m ON m.id = daily_messages_fts.rowid "
+    "WHERE daily_messages_fts MATCH ? AND daily_messages_fts.rowid < ? "
+    "AND m.user_id = ? AND m.date >= ? AND m.date <= ? "
+    "ORDER BY daily_messages_fts.rowid DESC LIMIT ?"
+)
+SQL_SEARCH_LIKE = (
+    "SELECT id, date, timestamp, message FROM daily_messages "
+    "WHERE user_id = ? AND id < ? AND message LIKE ? ESCAPE '\\' AND date >= ? AND date <= ? "
+    "ORDER BY id DESC LIMIT ?"
+)
+# Exportação em lotes pela chave primária/única (keyset): cada lote usa a
+# conexão só durante a leitura, sem transação longa aberta
+SQL_EXPORT_MESSAGES = (
+    "SELECT id, user_id, channel_id, date, message, timestamp FROM daily_messages "
+    "WHERE id > ? ORDER BY id LIMIT ?"
+)
+SQL_EXPORT_RESPONSES = (
+    "SELECT user_id, date, response_sent, timestamp FROM daily_responses "
+    "WHERE (user_id, date) > (?, ?) ORDER BY user_id, date LIMIT ?"
+)
+# Importação idempotente: mensagens mantêm o id (id NULL = novo id) e
+# respostas são únicas por usuário/dia, sem desmarcar uma resposta enviada.
+# As mensagens de cada lote passam por uma tabela temporária e entram num
+# único INSERT ... SELECT: o FTS5 grava o índice pendente a cada statement,
+# então inserir linha a linha (executemany) com o trigger é ~3x mais lento
+SQL_CREATE_IMPORT_MESSAGES = (
+    "CREATE TEMP TABLE IF NOT EXISTS import_messages "
+    "(id INTEGER, user_id TEXT, channel_id TEXT, date TEXT, message TEXT, timestamp TEXT)"
+)
+SQL_STAGE_MESSAGE = "INSERT INTO temp.import_messages VALUES (?, ?, ?, ?, ?, ?)"
+SQL_IMPORT_MESSAGES = (
+    "INSERT INTO daily_messages (id, user_id, channel_id, date, message, timestamp) "
+    "SELECT id, user_id, channel_id, date, message, COALESCE(timestamp, CURRENT_TIMESTAMP) "
+    "FROM temp.import_messages WHERE true ORDER BY rowid ON CONFLICT (id) DO NOTHING"
+)
+SQL_CLEAR_IMPORT_MESSAGES = "DELETE FROM temp.import_messages"
+SQL_IMPORT_RESPONSE = (
+    "INSERT INTO daily_responses (user_id, date, response_sent, timestamp) "
+    "VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP)) "
+    "ON CONFLICT (user_id, date) DO UPDATE SET response_sent = MAX(response_sent, excluded.response_sent)"
+)
+# Retenção: usuário/dias antigos em ordem de data (índice (date, user_id)),
+# movidos em lotes; as respostas sem mensagens saem numa segunda passada
+SQL_OLD_DAYS = (
+    "SELECT date, user_id FROM daily_messages WHERE date < ? "
+    "GROUP BY date, user_id ORDER BY date, user_id LIMIT ?"
+)
+SQL_OLD_RESPONSE_DAYS = (
+    "SELECT date, user_id FROM daily_responses WHERE date < ? ORDER BY date, user_id LIMIT ?"
+)
+SQL_DAY_MESSAGES = (
+    "SELECT id, channel_id, message, timestamp FROM daily_messages "
+    "WHERE user_id = ? AND date = ? ORDER BY timestamp, id"
+)
+SQL_DELETE_DAY_MESSAGES = "DELETE FROM daily_messages WHERE user_id = ? AND date = ?"
+SQL_DELETE_RESPONSE = "DELETE FROM daily_responses WHERE user_id = ? AND date = ?"
+SQL_INSERT_ARCHIVE = (
+    "INSERT INTO daily_archive (user_id, date, messages, message_count, response_sent) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+SQL_SELECT_ARCHIVE = (
+    "SELECT messages, response_sent FROM daily_archive WHERE user_id = ? AND date = ? ORDER BY id"
+)
+SQL_HAS_FTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_messages_fts'"
+SQL_MARK_RESPONDED = (
+    "INSERT INTO daily_responses (user_id, date, response_sent) VALUES (?, ?, TRUE) "
+    "ON CONFLICT (user_id, date) DO UPDATE SET response_sent = TRUE"
+)
+# Compare-and-set: só altera (rowcount 1) se a daily ainda não foi respondida
+SQL_CLAIM_RESPONSE = (
+    "INSERT INTO daily_responses (user_id, date, response_sent) VALUES (?, ?, TRUE) "
+    "ON CONFLICT (user_id, date) DO UPDATE SET response_sent = TRUE WHERE NOT response_sent"
+)
+SQL_RELEASE_RESPONSE = (
+    "UPDATE daily_responses SET response_sent = FALSE WHERE user_id = ? AND date = ?"
+)
+SQL_SELECT_RESPONSE = "SELECT response_sent FROM daily_responses WHERE user_id = ? AND date = ?"
+SQL_SELECT_SUBSCRIPTIONS = "SELECT user_id, channel_id, timezone FROM subscriptions ORDER BY user_id"
+SQL_UPSERT_SUBSCRIPTION = (
+    "INSERT INTO subscriptions (user_id, channel_id, timezone) VALUES (?, ?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET channel_id = excluded.channel_id, timezone = excluded.timezone"
+)
+SQL_DELETE_SUBSCRIPTION = "DELETE FROM subscriptions WHERE user_id = ?"
+SQL_SELECT_BOT = "SELECT name, updated_at FROM bot_identities WHERE bot_id = ?"
+SQL_UPSERT_BOT = (
+    "INSERT INTO bot_identities (bot_id, name, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (bot_id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at"
+)
+SQL_CLAIM_EVENT = (
+    "INSERT INTO processed_events (event_key, received_at) VALUES (?, ?) "
+    "ON CONFLICT (event_key) DO NOTHING"
+)
+SQL_PRUNE_EVENTS = "DELETE FROM processed_events WHERE received_at < ?"
+SQL_INIT_JOB = "INSERT INTO scheduled_jobs (name, next_run) VALUES (?, ?) ON CONFLICT (name) DO NOTHING"
+SQL_SELECT_JOB_NEXT_RUN = "SELECT next_run FROM scheduled_jobs WHERE name = ?"
+SQL_CLAIM_JOB_RUN = (
+    "UPDATE scheduled_jobs SET next_run = ?, last_run = COALESCE(?, last_run) "
+    "WHERE name = ? AND next_run = ?"
+)
+# Com fencing: só avança se o lease ainda estiver com o mesmo token (nenhuma
+# outra réplica assumiu a liderança desde que este processo a obteve)
+SQL_CLAIM_JOB_RUN_FENCED = SQL_CLAIM_JOB_RUN + " AND EXISTS (SELECT 1 FROM leases WHERE name = ? AND token = ?)"
+SQL_FINISH_JOB = "UPDATE scheduled_jobs SET last_status = ?, last_duration = ? WHERE name = ?"
+SQL_SELECT_JOBS = (
+    "SELECT name, next_run, last_run, last_status, last_duration FROM scheduled_jobs ORDER BY next_run"
+)
+# Lease: livre, vencido ou já deste holder. O token só aumenta quando o
+# holder muda, então identifica cada mandato (fencing token)
+SQL_ACQUIRE_LEASE = (
+    "INSERT INTO leases (name, holder, token, expires_at) VALUES (?, ?, 1, ?) "
+    "ON CONFLICT (name) DO UPDATE SET "
+    "token = CASE WHEN leases.holder = excluded.holder THEN leases.token ELSE leases.token + 1 END, "
+    "holder = excluded.holder, expires_at = excluded.expires_at "
+    "WHERE leases.holder = excluded.holder OR leases.expires_at <= ?"
+)
+SQL_SELECT_LEASE = "SELECT holder, token, expires_at FROM leases WHERE name = ?"
+SQL_RELEASE_LEASE = "UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?"
+
+
+def _fts_phrase(value):
+    """Valor entre aspas no MATCH do FTS5: sem operadores nem sintaxe vinda do usuário"""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _chunks(rows, size):
+    """Listas de até `size` itens consumindo o iterável aos poucos"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _migration_initial(conn, default_user_id):
+    """v1: tabelas originais do bot"""
+    # Tabela para armazenar mensagens diárias
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabela para controlar respostas à daily
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            response_sent BOOLEAN DEFAULT FALSE,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_multi_user(conn, default_user_id):
+    """v2: colunas user_id/channel_id, índices compostos e resposta única por usuário/dia"""
+    conn.execute("ALTER TABLE daily_messages ADD COLUMN user_id TEXT NOT NULL DEFAULT ''")
+    conn.execute("ALTER TABLE daily_messages ADD COLUMN channel_id TEXT")
+    # Mensagens antigas pertencem ao usuário configurado até então
+    conn.execute("UPDATE daily_messages SET user_id = ? WHERE user_id = ''", (default_user_id or '',))
+    conn.execute(
+        "CREATE INDEX idx_daily_messages_user_date_ts "
+        "ON daily_messages (user_id, date, timestamp)"
+    )
+
+    # SQLite não adiciona UNIQUE com ALTER TABLE: recriar a tabela,
+    # consolidando as linhas duplicadas geradas pelo INSERT OR REPLACE antigo
+    conn.execute('''
+        CREATE TABLE daily_responses_v2 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL DEFAULT '',
+            date TEXT NOT NULL,
+            response_sent BOOLEAN DEFAULT FALSE,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, date)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO daily_responses_v2 (user_id, date, response_sent, timestamp)
+        SELECT ?, date, MAX(response_sent), MIN(timestamp)
+        FROM daily_responses GROUP BY date
+    ''', (default_user_id or '',))
+    conn.execute("DROP TABLE daily_responses")
+    conn.execute("ALTER TABLE daily_responses_v2 RENAME TO daily_responses")
+
+
+def _migration_bot_identities(conn, default_user_id):
+    """v3: cache persistente de bot_id -> nome do bot"""
+    conn.execute('''
+        CREATE TABLE bot_identities (
+            bot_id TEXT PRIMARY KEY,
+            name TEXT,
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+
+def _migration_subscriptions(conn, default_user_id):
+    """v4: assinaturas usuário/canal atendidas pelo processo"""
+    conn.execute('''
+        CREATE TABLE subscriptions (
+            user_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_processed_events(conn, default_user_id):
+    """v5: eventos já processados, para descartar retries e reentregas do Slack"""
+    conn.execute('''
+        CREATE TABLE processed_events (
+            event_key TEXT PRIMARY KEY,
+            received_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX idx_processed_events_received_at ON processed_events (received_at)")
+
+
+def _migration_scheduler(conn, default_user_id):
+    """v6: estado dos jobs agendados e fuso horário por assinatura"""
+    conn.execute('''
+        CREATE TABLE scheduled_jobs (
+            name TEXT PRIMARY KEY,
+            next_run REAL NOT NULL,
+            last_run REAL,
+            last_status TEXT,
+            last_duration REAL
+        )
+    ''')
+    conn.execute("ALTER TABLE subscriptions ADD COLUMN timezone TEXT")
+
+
+def _migration_search_index(conn, default_user_id):
+    """v7: índice de busca textual (FTS5) sobre daily_messages"""
+    # user_id também é indexado: a busca de um usuário cruza as listas do
+    # termo e do usuário em vez de filtrar os resultados de todos
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE daily_messages_fts "
+            "USING fts5(message, user_id, content='daily_messages', content_rowid='id')"
+        )
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        # SQLite compilado sem FTS5: a busca usa LIKE
+        logger.warning("SQLite sem FTS5, a busca no histórico fará varredura: %s", e)
+        return
+
+    # Triggers mantêm o índice em sincronia com a tabela (content externo)
+    conn.execute('''
+        CREATE TRIGGER daily_messages_fts_insert AFTER INSERT ON daily_messages BEGIN
+            INSERT INTO daily_messages_fts (rowid, message, user_id)
+            VALUES (new.id, new.message, new.user_id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER daily_messages_fts_delete AFTER DELETE ON daily_messages BEGIN
+            INSERT INTO daily_messages_fts (daily_messages_fts, rowid, message, user_id)
+            VALUES ('delete', old.id, old.message, old.user_id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER daily_messages_fts_update AFTER UPDATE OF message, user_id ON daily_messages BEGIN
+            INSERT INTO daily_messages_fts (daily_messages_fts, rowid, message, user_id)
+            VALUES ('delete', old.id, old.message, old.user_id);
+            INSERT INTO daily_messages_fts (rowid, message, user_id)
+            VALUES (new.id, new.message, new.user_id);
+        END
+    ''')
+    # Indexar o histórico existente
+    conn.execute("INSERT INTO daily_messages_fts (daily_messages_fts) VALUES ('rebuild')")
+
+
+def _migration_archive(conn, default_user_id):
+    """v8: arquivo compactado dos dias antigos e índice por data para a retenção"""
+    # Um registro por usuário/dia arquivado (pode haver mais de um se o mesmo
+    # dia for arquivado de novo, ex: após uma importação); messages é um blob
+    # comprimido com as mensagens do dia
+    conn.execute('''
+        CREATE TABLE daily_archive (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            messages BLOB NOT NULL,
+            message_count INTEGER NOT NULL,
+            response_sent BOOLEAN DEFAULT FALSE,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_daily_archive_user_date ON daily_archive (user_id, date)")
+    conn.execute("CREATE INDEX idx_daily_messages_date_user ON daily_messages (date, user_id)")
+
+
+def _migration_leases(conn, default_user_id):
+    """v9: leases da eleição de líder entre réplicas"""
+    conn.execute('''
+        CREATE TABLE leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            token INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+
+# Migrações versionadas via PRAGMA user_version: a posição na lista é a versão.
+# Nunca alterar uma migração já publicada, apenas adicionar novas ao final.
+MIGRATIONS = [
+    _migration_initial,
+    _migration_multi_user,
+    _migration_bot_identities,
+    _migration_subscriptions,
+    _migration_processed_events,
+    _migration_scheduler,
+    _migration_search_index,
+    _migration_archive,
+    _migration_leases,
+]
+
+
+def migrate(conn, default_user_id=None):
+    """Aplicar as migrações pendentes; retorna a versão final do schema"""
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Controle manual da transação (DDL incluso)
+    try:
+        # BEGIN IMMEDIATE garante que só um processo migra por vez
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                logger.info("Aplicando migração %d: %s", number, migration.__doc__)
+                migration(conn, default_user_id)
+                conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(MIGRATIONS)
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def pragmas_from_env():
+    """Montar pragmas do SQLite a partir das variáveis de ambiente"""
+    pragmas = {
+        # Antes do journal_mode: só vale para bancos novos (nos existentes,
+        # `python bot.py compact` converte). Permite devolver páginas livres
+        # ao sistema aos poucos com PRAGMA incremental_vacuum
+        'auto_vacuum': os.getenv('SQLITE_AUTO_VACUUM', 'INCREMENTAL'),
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '5000'),
+        'foreign_keys': 'ON',
+    }
+
+    # Pragmas extras no formato "cache_size=-8000,temp_store=MEMORY"
+    extra = os.getenv('SQLITE_PRAGMAS', '')
+    for item in extra.split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            pragmas[name.strip()] = value.strip()
+
+    return pragmas
+
+
+class ConnectionPool:
+    """Pool thread-safe de conexões SQLite persistentes"""
+
+    def __init__(self, path, size=4, timeout=30.0, pragmas=None, cached_statements=128):
+        self.path = path
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.cached_statements = cached_statements
+
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        """Abrir uma nova conexão já configurada"""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,  # Conexões circulam entre threads via pool
+            cached_statements=self.cached_statements,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self):
+        """Obter uma conexão do pool (bloqueia se todas estiverem em uso)"""
+        if self._closed:
+            raise RuntimeError("Pool de conexões fechado")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("Nenhuma conexão SQLite disponível no pool")
+
+    def release(self, conn):
+        """Devolver a conexão ao pool"""
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager que empresta uma conexão do pool"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Fechar todas as conexões do pool"""
+        with self._lock:
+            self._closed = True
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+
+
+class Storage:
+    """Operações de banco de dados usadas pelo bot"""
+
+    backend = 'sqlite'
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._has_fts = None
+
+    @classmethod
+    def from_env(cls):
+        """Criar storage a partir das variáveis de ambiente"""
+        pool = ConnectionPool(
+            os.getenv('DB_PATH', 'messages.db'),
+            size=int(os.getenv('SQLITE_POOL_SIZE', 4)),
+            pragmas=pragmas_from_env(),
+        )
+        return cls(pool)
+
+    def init_schema(self, default_user_id=None):
+        """Criar/atualizar o schema aplicando as migrações pendentes"""
+        with self.pool.connection() as conn:
+            return migrate(conn, default_user_id)
+
+    @timed(DB_QUERY_SECONDS, 'insert_message')
+    def insert_message(self, user_id, channel_id, date, message):
+        """Inserir uma mensagem do dia e retornar o id da linha"""
+        with self.pool.connection() as conn, conn:
+            return conn.execute(SQL_INSERT_MESSAGE, (user_id, channel_id, date, message)).lastrowid
+
+    @timed(DB_QUERY_SECONDS, 'insert_messages')
+    def insert_messages(self, rows):
+        """Inserir (user_id, channel_id, date, message) numa única transação; ids na mesma ordem"""
+        with self.pool.connection() as conn, conn:
+            return [conn.execute(SQL_INSERT_MESSAGE, row).lastrowid for row in rows]
+
+    @timed(DB_QUERY_SECONDS, 'get_messages')
+    def get_messages(self, user_id, date):
+        """Listar mensagens do usuário em uma data, em ordem de chegada"""
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute(SQL_SELECT_MESSAGES, (user_id, date))]
+
+    @timed(DB_QUERY_SECONDS, 'get_messages_after')
+    def get_messages_after(self, user_id, date, after_id=0):
+        """Listar (id, mensagem) do usuário em uma data com id maior que `after_id`"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_MESSAGES_AFTER, (user_id, date, after_id)).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'mark_responded')
+    def mark_responded(self, user_id, date):
+        """Registrar que a daily do usuário na data foi respondida"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_MARK_RESPONDED, (user_id, date))
+
+    @timed(DB_QUERY_SECONDS, 'history')
+    def history(self, user_id, start, end, after=None, limit=50):
+        """Página do histórico: (id, date, timestamp, message) em ordem decrescente
+
+        `after` é a (date, timestamp, id) da última linha da página anterior.
+        """
+        with self.pool.connection() as conn:
+            if after is None:
+                return conn.execute(SQL_HISTORY, (user_id, start, end, limit)).fetchall()
+            # A data do cursor limita o intervalo do índice: a página começa
+            # nela em vez de percorrer as linhas já devolvidas
+            end = min(end, after[0])
+            return conn.execute(SQL_HISTORY_AFTER, (user_id, start, end, *after, limit)).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'search')
+    def search(self, user_id, terms, start, end, before_id=None, limit=50):
+        """Página da busca textual: (id, date, timestamp, message), ids decrescentes
+
+        Mensagens com todos os `terms`; sem FTS5 no SQLite, os termos são
+        procurados na ordem dada com LIKE.
+        """
+        before_id = before_id or 2 ** 63 - 1
+        with self.pool.connection() as conn:
+            if self._has_fts is None:
+                self._has_fts = conn.execute(SQL_HAS_FTS).fetchone() is not None
+            if self._has_fts:
+                match = ' AND '.join(
+                    [f'user_id : {_fts_phrase(user_id)}'] + [f'message : {_fts_phrase(term)}' for term in terms]
+                )
+                return conn.execute(SQL_SEARCH, (match, before_id, user_id, start, end, limit)).fetchall()
+            pattern = '%'.join(
+                term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') for term in terms
+            )
+            return conn.execute(
+                SQL_SEARCH_LIKE, (user_id, before_id, f"%{pattern}%", start, end, limit)
+            ).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'claim_response')
+    def claim_response(self, user_id, date):
+        """Marcar a daily como respondida; False se já estava (outro worker/processo respondeu)"""
+        with self.pool.connection() as conn, conn:
+            return conn.execute(SQL_CLAIM_RESPONSE, (user_id, date)).rowcount == 1
+
+    def release_response(self, user_id, date):
+        """Desfazer um claim cuja resposta não foi enviada"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_RELEASE_RESPONSE, (user_id, date))
+
+    @timed(DB_QUERY_SECONDS, 'response_sent')
+    def response_sent(self, user_id, date):
+        """Verificar se a daily do usuário na data já foi respondida"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_SELECT_RESPONSE, (user_id, date)).fetchone()
+        return bool(row and row[0])
+
+    def list_subscriptions(self):
+        """Listar (user_id, channel_id, timezone) cadastrados"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_SUBSCRIPTIONS).fetchall()
+
+    def save_subscription(self, user_id, channel_id, timezone=None):
+        """Cadastrar ou atualizar a assinatura de um usuário"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_UPSERT_SUBSCRIPTION, (user_id, channel_id, timezone))
+
+    def delete_subscription(self, user_id):
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_DELETE_SUBSCRIPTION, (user_id,))
+
+    @timed(DB_QUERY_SECONDS, 'get_bot_identity')
+    def get_bot_identity(self, bot_id):
+        """Buscar (nome, updated_at) persistido de um bot, ou None"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_BOT, (bot_id,)).fetchone()
+
+    @timed(DB_QUERY_SECONDS, 'save_bot_identity')
+    def save_bot_identity(self, bot_id, name, updated_at):
+        """Persistir o nome resolvido de um bot (None = sem informação)"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_UPSERT_BOT, (bot_id, name, updated_at))
+
+    @timed(DB_QUERY_SECONDS, 'claim_event')
+    def claim_event(self, event_key, received_at):
+        """Registrar o evento; retorna False se ele já tinha sido processado"""
+        with self.pool.connection() as conn, conn:
+            return conn.execute(SQL_CLAIM_EVENT, (event_key, received_at)).rowcount == 1
+
+    def prune_events(self, before):
+        """Apagar eventos registrados antes de `before`; retorna quantos foram apagados"""
+        with self.pool.connection() as conn, conn:
+            return conn.execute(SQL_PRUNE_EVENTS, (before,)).rowcount
+
+    def init_job(self, name, next_run):
+        """Registrar o job se for novo; retorna a próxima execução salva"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_INIT_JOB, (name, next_run))
+            return conn.execute(SQL_SELECT_JOB_NEXT_RUN, (name,)).fetchone()[0]
+
+    def get_job_next_run(self, name):
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_SELECT_JOB_NEXT_RUN, (name,)).fetchone()
+        return row[0] if row else None
+
+    @timed(DB_QUERY_SECONDS, 'claim_job_run')
+    def claim_job_run(self, name, expected, next_run, ran_at, fence=None):
+        """Avançar o job de `expected` para `next_run` (compare-and-set)
+
+        Retorna False se outro processo já avançou o horário: só quem
+        consegue a troca executa o job. Com `fence` (lease, token), também
+        se o lease já passou para outro holder.
+        """
+        with self.pool.connection() as conn, conn:
+            if fence is None:
+                return conn.execute(SQL_CLAIM_JOB_RUN, (next_run, ran_at, name, expected)).rowcount == 1
+            return conn.execute(
+                SQL_CLAIM_JOB_RUN_FENCED, (next_run, ran_at, name, expected, *fence)
+            ).rowcount == 1
+
+    def finish_job(self, name, status, duration):
+        """Registrar o resultado da última execução"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_FINISH_JOB, (status, duration, name))
+
+    def list_jobs(self):
+        """Listar (name, next_run, last_run, last_status, last_duration) dos jobs"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_JOBS).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'acquire_lease')
+    def acquire_lease(self, name, holder, now, ttl):
+        """Obter ou renovar o lease até `now + ttl`; retorna o token ou None se outro holder o detém"""
+        with self.pool.connection() as conn, conn:
+            if conn.execute(SQL_ACQUIRE_LEASE, (name, holder, now + ttl, now)).rowcount != 1:
+                return None
+            return conn.execute(SQL_SELECT_LEASE, (name,)).fetchone()[1]
+
+    def release_lease(self, name, holder):
+        """Liberar o lease (se ainda for deste holder) para outro assumir sem esperar o vencimento"""
+        with self.pool.connection() as conn, conn:
+            conn.execute(SQL_RELEASE_LEASE, (name, holder))
+
+    def get_lease(self, name):
+        """(holder, token, expires_at) do lease, ou None"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_LEASE, (name,)).fetchone()
+
+    def export_messages(self, batch=5000):
+        """Gerar (id, user_id, channel_id, date, message, timestamp) em ordem de id, `batch` por leitura"""
+        last_id = 0
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(SQL_EXPORT_MESSAGES, (last_id, batch)).fetchall()
+            yield from rows
+            if len(rows) < batch:
+                return
+            last_id = rows[-1][0]
+
+    def export_responses(self, batch=5000):
+        """Gerar (user_id, date, response_sent, timestamp) por usuário/data, `batch` por leitura"""
+        last_key = ('', '')
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(SQL_EXPORT_RESPONSES, last_key + (batch,)).fetchall()
+            yield from rows
+            if len(rows) < batch:
+                return
+            last_key = rows[-1][:2]
+
+    def import_messages(self, rows, batch=5000):
+        """Gravar linhas no formato de export_messages, uma transação a cada `batch`; retorna o total"""
+        total = 0
+        for chunk in _chunks(rows, batch):
+            with self.pool.connection() as conn, conn:
+                conn.execute(SQL_CREATE_IMPORT_MESSAGES)
+                conn.executemany(SQL_STAGE_MESSAGE, chunk)
+                conn.execute(SQL_IMPORT_MESSAGES)
+                conn.execute(SQL_CLEAR_IMPORT_MESSAGES)
+            total += len(chunk)
+        return total
+
+    def import_responses(self, rows, batch=5000):
+        """Gravar linhas no formato de export_responses, uma transação a cada `batch`; retorna o total"""
+        total = 0
+        for chunk in _chunks(rows, batch):
+            with self.pool.connection() as conn, conn:
+                conn.executemany(SQL_IMPORT_RESPONSE, chunk)
+            total += len(chunk)
+        return total
+
+    @timed(DB_QUERY_SECONDS, 'take_old_days')
+    def take_old_days(self, before, limit, archive=None):
+        """Remover mensagens e respostas de até `limit` usuário/dias anteriores a `before`
+
+        Uma transação (BEGIN IMMEDIATE) por lote. Retorna os registros
+        (user_id, date, [(id, channel_id, message, timestamp), ...], response_sent);
+        `archive(records)` roda na transação, antes de apagar, e devolve as
+        linhas (user_id, date, messages, message_count, response_sent) de daily_archive.
+        """
+        with self.pool.connection() as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            days = conn.execute(SQL_OLD_DAYS, (before, limit)).fetchall()
+            if not days:
+                days = conn.execute(SQL_OLD_RESPONSE_DAYS, (before, limit)).fetchall()
+            records = []
+            for day, user_id in days:
+                messages = conn.execute(SQL_DAY_MESSAGES, (user_id, day)).fetchall()
+                row = conn.execute(SQL_SELECT_RESPONSE, (user_id, day)).fetchone()
+                records.append((user_id, day, messages, bool(row and row[0])))
+            if archive and records:
+                conn.executemany(SQL_INSERT_ARCHIVE, archive(records))
+            keys = [(user_id, day) for day, user_id in days]
+            conn.executemany(SQL_DELETE_DAY_MESSAGES, keys)
+            conn.executemany(SQL_DELETE_RESPONSE, keys)
+        return records
+
+    def get_archive(self, user_id, date):
+        """Blobs (messages, response_sent) arquivados do usuário na data"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_ARCHIVE, (user_id, date)).fetchall()
+
+    def db_size(self):
+        """(tamanho do banco, bytes em páginas livres)"""
+        with self.pool.connection() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return pages * page_size, free * page_size
+
+    def auto_vacuum(self):
+        """Modo de auto_vacuum do banco: 0 = NONE, 1 = FULL, 2 = INCREMENTAL"""
+        with self.pool.connection() as conn:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+    def incremental_vacuum(self, pages):
+        """Devolver até `pages` páginas livres ao sistema; retorna as páginas livres restantes"""
+        with self.pool.connection() as conn:
+            # execute() do sqlite3 dá um único passo no pragma (libera uma página);
+            # executescript roda o statement até o fim
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def optimize(self):
+        """Atualizar as estatísticas do planejador onde for útil (PRAGMA optimize)"""
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA optimize")
+
+    def vacuum(self):
+        """VACUUM completo, convertendo o banco para auto_vacuum incremental (bloqueia o banco)"""
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+
+    def close(self):
+        """Liberar as conexões"""
+        self.pool.close()
+
+
+def open_storage():
+    """Storage do backend configurado: PostgreSQL com DATABASE_URL=postgresql://..., senão SQLite em DB_PATH"""
+    url = os.getenv('DATABASE_URL', '')
+    if url.startswith(('postgres://', 'postgresql://')):
+        # Import tardio: psycopg só é necessário com PostgreSQL
+        from storage_postgres import PostgresStorage
+        return PostgresStorage.from_env()
+    if url:
+        raise ValueError(f"DATABASE_URL não suportado: {url.split(':', 1)[0]}:// (use postgresql://)")
+    return Storage.from_env()
+
+
+if __name__ == "__main__":
+    # Atualizar um banco existente no lugar: python storage.py [caminho] [user_id]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv('DB_PATH', 'messages.db')
+    user_id = sys.argv[2] if len(sys.argv) > 2 else os.getenv('USER_ID')
+    storage = Storage(ConnectionPool(path, size=1, pragmas=pragmas_from_env()))
+    print(f"{path}: schema na versão {storage.init_schema(user_id)}")
+    storage.close()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazenamento em PostgreSQL (DATABASE_URL=postgresql://...)
+
+Mesmas operações e mesmos formatos de linha do Storage do SQLite, para que
+várias réplicas do bot (atrás de um balanceador ou cada uma com seu Socket
+Mode) compartilhem o histórico, as respostas, a deduplicação e os jobs:
+
+- conexões do psycopg_pool por processo; cada operação é uma transação
+  curta (o pool faz commit ao devolver a conexão, rollback em erro);
+- o psycopg prepara no servidor as queries repetidas, como o cache de
+  statements do sqlite3;
+- claims (resposta do dia, evento, job) usam os mesmos INSERT ... ON
+  CONFLICT / UPDATE condicional, atômicos entre réplicas;
+- date e timestamp continuam texto ISO em UTC e response_sent volta como
+  booleano: cursores do /history, exportação e arquivo não mudam de formato;
+- busca textual com to_tsvector('simple') e índice GIN, um termo por frase
+  como no FTS5 (sem remover acentos);
+- importação via COPY numa tabela temporária, como o INSERT ... SELECT do SQLite.
+
+Requer o psycopg 3 com o pool: pip install "psycopg[binary,pool]".
+"""
+
+import os
+import logging
+
+import psycopg_pool
+
+from metrics import DB_QUERY_SECONDS, timed
+from storage import _chunks
+
+logger = logging.getLogger(__name__)
+
+# Mesmo formato do CURRENT_TIMESTAMP do SQLite (UTC, sem fração)
+NOW = "to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+SQL_INSERT_MESSAGE = (
+    "INSERT INTO daily_messages (user_id, channel_id, date, message) VALUES (%s, %s, %s, %s) RETURNING id"
+)
+SQL_SELECT_MESSAGES = (
+    "SELECT message FROM daily_messages WHERE user_id = %s AND date = %s ORDER BY timestamp, id"
+)
+SQL_SELECT_MESSAGES_AFTER = (
+    "SELECT id, message FROM daily_messages "
+    "WHERE user_id = %s AND date = %s AND id > %s ORDER BY timestamp, id"
+)
+SQL_HISTORY = (
+    "SELECT id, date, timestamp, message FROM daily_messages "
+    "WHERE user_id = %s AND date >= %s AND date <= %s "
+    "ORDER BY date DESC, timestamp DESC, id DESC LIMIT %s"
+)
+SQL_HISTORY_AFTER = (
+    "SELECT id, date, timestamp, message FROM daily_messages "
+    "WHERE user_id = %s AND date >= %s AND date <= %s AND (date, timestamp, id) < (%s, %s, %s) "
+    "ORDER BY date DESC, timestamp DESC, id DESC LIMIT %s"
+)
+# {query}: um phraseto_tsquery por termo, combinados com &&
+SQL_SEARCH = (
+    "SELECT id, date, timestamp, message FROM daily_messages "
+    "WHERE to_tsvector('simple', message) @@ ({query}) "
+    "AND user_id = %s AND id < %s AND date >= %s AND date <= %s "
+    "ORDER BY id DESC LIMIT %s"
+)
+SQL_SEARCH_TERM = "phraseto_tsquery('simple', %s)"
+SQL_EXPORT_MESSAGES = (
+    "SELECT id, user_id, channel_id, date, message, timestamp FROM daily_messages "
+    "WHERE id > %s ORDER BY id LIMIT %s"
+)
+SQL_EXPORT_RESPONSES = (
+    "SELECT user_id, date, response_sent, timestamp FROM daily_responses "
+    "WHERE (user_id, date) > (%s, %s) ORDER BY user_id, date LIMIT %s"
+)
+# Importação: COPY para a tabela temporária (esvaziada no commit) e um único
+# INSERT ... SELECT; id NULL = novo id da sequência
+SQL_CREATE_IMPORT_MESSAGES = (
+    "CREATE TEMP TABLE IF NOT EXISTS import_messages "
+    "(id BIGINT, user_id TEXT, channel_id TEXT, date TEXT, message TEXT, timestamp TEXT) "
+    "ON COMMIT DELETE ROWS"
+)
+SQL_COPY_IMPORT_MESSAGES = (
+    "COPY import_messages (id, user_id, channel_id, date, message, timestamp) FROM STDIN"
+)
+SQL_IMPORT_MESSAGES = (
+    "INSERT INTO daily_messages (id, user_id, channel_id, date, message, timestamp) "
+    "SELECT COALESCE(id, nextval(pg_get_serial_sequence('daily_messages', 'id'))), "
+    f"user_id, channel_id, date, message, COALESCE(timestamp, {NOW}) "
+    "FROM import_messages ON CONFLICT (id) DO NOTHING"
+)
+# Ids importados não avançam a sequência: ajustá-la ao maior id gravado.
+# O lock impede inserts concorrentes entre a importação e o ajuste
+SQL_LOCK_MESSAGES = "LOCK TABLE daily_messages IN SHARE ROW EXCLUSIVE MODE"
+SQL_SYNC_MESSAGE_ID = (
+    "SELECT setval(pg_get_serial_sequence('daily_messages', 'id'), MAX(id)) FROM daily_messages"
+)
+SQL_IMPORT_RESPONSE = (
+    "INSERT INTO daily_responses (user_id, date, response_sent, timestamp) "
+    f"VALUES (%s, %s, %s, COALESCE(%s, {NOW})) "
+    "ON CONFLICT (user_id, date) DO UPDATE "
+    "SET response_sent = daily_responses.response_sent OR excluded.response_sent"
+)
+SQL_OLD_DAYS = (
+    "SELECT date, user_id FROM daily_messages WHERE date < %s "
+    "GROUP BY date, user_id ORDER BY date, user_id LIMIT %s"
+)
+SQL_OLD_RESPONSE_DAYS = (
+    "SELECT date, user_id FROM daily_responses WHERE date < %s ORDER BY date, user_id LIMIT %s"
+)
+SQL_DAY_MESSAGES = (
+    "SELECT id, channel_id, message, timestamp FROM daily_messages "
+    "WHERE user_id = %s AND date = %s ORDER BY timestamp, id"
+)
+SQL_DELETE_DAY_MESSAGES = "DELETE FROM daily_messages WHERE user_id = %s AND date = %s"
+SQL_DELETE_RESPONSE = "DELETE FROM daily_responses WHERE user_id = %s AND date = %s"
+SQL_INSERT_ARCHIVE = (
+    "INSERT INTO daily_archive (user_id, date, messages, message_count, response_sent) "
+    "VALUES (%s, %s, %s, %s, %s)"
+)
+SQL_SELECT_ARCHIVE = (
+    "SELECT messages, response_sent FROM daily_archive WHERE user_id = %s AND date = %s ORDER BY id"
+)
+SQL_MARK_RESPONDED = (
+    "INSERT INTO daily_responses (user_id, date, response_sent) VALUES (%s, %s, TRUE) "
+    "ON CONFLICT (user_id, date) DO UPDATE SET response_sent = TRUE"
+)
+SQL_CLAIM_RESPONSE = (
+    "INSERT INTO daily_responses (user_id, date, response_sent) VALUES (%s, %s, TRUE) "
+    "ON CONFLICT (user_id, date) DO UPDATE SET response_sent = TRUE WHERE NOT daily_responses.response_sent"
+)
+SQL_RELEASE_RESPONSE = (
+    "UPDATE daily_responses SET response_sent = FALSE WHERE user_id = %s AND date = %s"
+)
+SQL_SELECT_RESPONSE = "SELECT response_sent FROM daily_responses WHERE user_id = %s AND date = %s"
+SQL_SELECT_SUBSCRIPTIONS = "SELECT user_id, channel_id, timezone FROM subscriptions ORDER BY user_id"
+SQL_UPSERT_SUBSCRIPTION = (
+    "INSERT INTO subscriptions (user_id, channel_id, timezone) VALUES (%s, %s, %s) "
+    "ON CONFLICT (user_id) DO UPDATE SET channel_id = excluded.channel_id, timezone = excluded.timezone"
+)
+SQL_DELETE_SUBSCRIPTION = "DELETE FROM subscriptions WHERE user_id = %s"
+SQL_SELECT_BOT = "SELECT name, updated_at FROM bot_identities WHERE bot_id = %s"
+SQL_UPSERT_BOT = (
+    "INSERT INTO bot_identities (bot_id, name, updated_at) VALUES (%s, %s, %s) "
+    "ON CONFLICT (bot_id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at"
+)
+SQL_CLAIM_EVENT = (
+    "INSERT INTO processed_events (event_key, received_at) VALUES (%s, %s) "
+    "ON CONFLICT (event_key) DO NOTHING"
+)
+SQL_PRUNE_EVENTS = "DELETE FROM processed_events WHERE received_at < %s"
+SQL_INIT_JOB = "INSERT INTO scheduled_jobs (name, next_run) VALUES (%s, %s) ON CONFLICT (name) DO NOTHING"
+SQL_SELECT_JOB_NEXT_RUN = "SELECT next_run FROM scheduled_jobs WHERE name = %s"
+SQL_CLAIM_JOB_RUN = (
+    "UPDATE scheduled_jobs SET next_run = %s, last_run = COALESCE(%s, last_run) "
+    "WHERE name = %s AND next_run = %s"
+)
+SQL_CLAIM_JOB_RUN_FENCED = SQL_CLAIM_JOB_RUN + " AND EXISTS (SELECT 1 FROM leases WHERE name = %s AND token = %s)"
+SQL_FINISH_JOB = "UPDATE scheduled_jobs SET last_status = %s, last_duration = %s WHERE name = %s"
+SQL_SELECT_JOBS = (
+    "SELECT name, next_run, last_run, last_status, last_duration FROM scheduled_jobs ORDER BY next_run"
+)
+SQL_ACQUIRE_LEASE = (
+    "INSERT INTO leases (name, holder, token, expires_at) VALUES (%s, %s, 1, %s) "
+    "ON CONFLICT (name) DO UPDATE SET "
+    "token = CASE WHEN leases.holder = excluded.holder THEN leases.token ELSE leases.token + 1 END, "
+    "holder = excluded.holder, expires_at = excluded.expires_at "
+    "WHERE leases.holder = excluded.holder OR leases.expires_at <= %s "
+    "RETURNING token"
+)
+SQL_SELECT_LEASE = "SELECT holder, token, expires_at FROM leases WHERE name = %s"
+SQL_RELEASE_LEASE = "UPDATE leases SET expires_at = 0 WHERE name = %s AND holder = %s"
+
+# Chave do advisory lock das migrações: só uma réplica migra por vez
+MIGRATION_LOCK = 0x6461696C79  # "daily"
+
+
+def _migration_initial(conn):
+    """v1: schema equivalente à versão 8 do SQLite"""
+    conn.execute(f'''
+        CREATE TABLE daily_messages (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            user_id TEXT NOT NULL DEFAULT '',
+            channel_id TEXT,
+            date TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TEXT DEFAULT {NOW}
+        )
+    ''')
+    # id no índice: ordem do histórico (keyset) e das mensagens do dia
+    conn.execute(
+        "CREATE INDEX idx_daily_messages_user_date_ts ON daily_messages (user_id, date, timestamp, id)"
+    )
+    conn.execute("CREATE INDEX idx_daily_messages_date_user ON daily_messages (date, user_id)")
+    conn.execute(
+        "CREATE INDEX idx_daily_messages_search ON daily_messages USING gin (to_tsvector('simple', message))"
+    )
+    conn.execute(f'''
+        CREATE TABLE daily_responses (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            user_id TEXT NOT NULL DEFAULT '',
+            date TEXT NOT NULL,
+            response_sent BOOLEAN NOT NULL DEFAULT FALSE,
+            timestamp TEXT DEFAULT {NOW},
+            UNIQUE (user_id, date)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE bot_identities (
+            bot_id TEXT PRIMARY KEY,
+            name TEXT,
+            updated_at DOUBLE PRECISION NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE subscriptions (
+            user_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            timezone TEXT,
+            created_at TEXT DEFAULT {NOW}
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE processed_events (
+            event_key TEXT PRIMARY KEY,
+            received_at DOUBLE PRECISION NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_processed_events_received_at ON processed_events (received_at)")
+    conn.execute('''
+        CREATE TABLE scheduled_jobs (
+            name TEXT PRIMARY KEY,
+            next_run DOUBLE PRECISION NOT NULL,
+            last_run DOUBLE PRECISION,
+            last_status TEXT,
+            last_duration DOUBLE PRECISION
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE daily_archive (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            messages BYTEA NOT NULL,
+            message_count INTEGER NOT NULL,
+            response_sent BOOLEAN DEFAULT FALSE,
+            archived_at TEXT DEFAULT {NOW}
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_daily_archive_user_date ON daily_archive (user_id, date)")
+
+
+def _migration_leases(conn):
+    """v2: leases da eleição de líder entre réplicas"""
+    conn.execute('''
+        CREATE TABLE leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            token BIGINT NOT NULL,
+            expires_at DOUBLE PRECISION NOT NULL
+        )
+    ''')
+
+
+# Migrações versionadas na tabela schema_version: a posição na lista é a versão.
+# Nunca alterar uma migração já publicada, apenas adicionar novas ao final.
+MIGRATIONS = [
+    _migration_initial,
+    _migration_leases,
+]
+
+
+def migrate(conn):
+    """Aplicar as migrações pendentes numa transação; retorna a versão final do schema"""
+    with conn.transaction():
+        conn.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK,))
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        row = conn.execute("SELECT version FROM schema_version").fetchone()
+        version = row[0] if row else 0
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logger.info("Aplicando migração %d: %s", number, migration.__doc__)
+            migration(conn)
+        if row is None:
+            conn.execute("INSERT INTO schema_version (version) VALUES (%s)", (len(MIGRATIONS),))
+        elif version != len(MIGRATIONS):
+            conn.execute("UPDATE schema_version SET version = %s", (len(MIGRATIONS),))
+    return len(MIGRATIONS)
+
+
+def connection_pool(conninfo, size=4, timeout=30.0):
+    """Pool de conexões do psycopg, aberto e com uma conexão pronta"""
+    return psycopg_pool.ConnectionPool(
+        conninfo,
+        min_size=1,
+        max_size=max(1, int(size)),
+        timeout=timeout,
+        name='dailybot',
+        open=True,
+    )
+
+
+class PostgresStorage:
+    """Operações de banco de dados usadas pelo bot, em PostgreSQL"""
+
+    backend = 'postgresql'
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    def from_env(cls):
+        """Criar storage a partir das variáveis de ambiente"""
+        pool = connection_pool(
+            os.environ['DATABASE_URL'],
+            size=int(os.getenv('PG_POOL_SIZE', 4)),
+            timeout=float(os.getenv('PG_POOL_TIMEOUT', 30)),
+        )
+        return cls(pool)
+
+    def init_schema(self, default_user_id=None):
+        """Criar/atualizar o schema aplicando as migrações pendentes"""
+        # default_user_id só serve para bancos SQLite anteriores ao multiusuário
+        with self.pool.connection() as conn:
+            return migrate(conn)
+
+    @timed(DB_QUERY_SECONDS, 'insert_message')
+    def insert_message(self, user_id, channel_id, date, message):
+        """Inserir uma mensagem do dia e retornar o id da linha"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_INSERT_MESSAGE, (user_id, channel_id, date, message)).fetchone()[0]
+
+    @timed(DB_QUERY_SECONDS, 'insert_messages')
+    def insert_messages(self, rows):
+        """Inserir (user_id, channel_id, date, message) numa única transação; ids na mesma ordem"""
+        ids = []
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            # Enviados em pipeline: uma ida ao servidor para o lote todo
+            cur.executemany(SQL_INSERT_MESSAGE, rows, returning=True)
+            while True:
+                ids.append(cur.fetchone()[0])
+                if not cur.nextset():
+                    break
+        return ids
+
+    @timed(DB_QUERY_SECONDS, 'get_messages')
+    def get_messages(self, user_id, date):
+        """Listar mensagens do usuário em uma data, em ordem de chegada"""
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute(SQL_SELECT_MESSAGES, (user_id, date))]
+
+    @timed(DB_QUERY_SECONDS, 'get_messages_after')
+    def get_messages_after(self, user_id, date, after_id=0):
+        """Listar (id, mensagem) do usuário em uma data com id maior que `after_id`"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_MESSAGES_AFTER, (user_id, date, after_id)).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'mark_responded')
+    def mark_responded(self, user_id, date):
+        """Registrar que a daily do usuário na data foi respondida"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_MARK_RESPONDED, (user_id, date))
+
+    @timed(DB_QUERY_SECONDS, 'history')
+    def history(self, user_id, start, end, after=None, limit=50):
+        """Página do histórico: (id, date, timestamp, message) em ordem decrescente
+
+        `after` é a (date, timestamp, id) da última linha da página anterior.
+        """
+        with self.pool.connection() as conn:
+            if after is None:
+                return conn.execute(SQL_HISTORY, (user_id, start, end, limit)).fetchall()
+            end = min(end, after[0])
+            return conn.execute(SQL_HISTORY_AFTER, (user_id, start, end, *after, limit)).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'search')
+    def search(self, user_id, terms, start, end, before_id=None, limit=50):
+        """Página da busca textual: (id, date, timestamp, message), ids decrescentes
+
+        Mensagens com todos os `terms`, cada um procurado como frase.
+        """
+        before_id = before_id or 2 ** 63 - 1
+        query = SQL_SEARCH.format(query=' && '.join([SQL_SEARCH_TERM] * len(terms)))
+        with self.pool.connection() as conn:
+            return conn.execute(query, (*terms, user_id, before_id, start, end, limit)).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'claim_response')
+    def claim_response(self, user_id, date):
+        """Marcar a daily como respondida; False se já estava (outra réplica/worker respondeu)"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_CLAIM_RESPONSE, (user_id, date)).rowcount == 1
+
+    def release_response(self, user_id, date):
+        """Desfazer um claim cuja resposta não foi enviada"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_RELEASE_RESPONSE, (user_id, date))
+
+    @timed(DB_QUERY_SECONDS, 'response_sent')
+    def response_sent(self, user_id, date):
+        """Verificar se a daily do usuário na data já foi respondida"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_SELECT_RESPONSE, (user_id, date)).fetchone()
+        return bool(row and row[0])
+
+    def list_subscriptions(self):
+        """Listar (user_id, channel_id, timezone) cadastrados"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_SUBSCRIPTIONS).fetchall()
+
+    def save_subscription(self, user_id, channel_id, timezone=None):
+        """Cadastrar ou atualizar a assinatura de um usuário"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_UPSERT_SUBSCRIPTION, (user_id, channel_id, timezone))
+
+    def delete_subscription(self, user_id):
+        with self.pool.connection() as conn:
+            conn.execute(SQL_DELETE_SUBSCRIPTION, (user_id,))
+
+    @timed(DB_QUERY_SECONDS, 'get_bot_identity')
+    def get_bot_identity(self, bot_id):
+        """Buscar (nome, updated_at) persistido de um bot, ou None"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_BOT, (bot_id,)).fetchone()
+
+    @timed(DB_QUERY_SECONDS, 'save_bot_identity')
+    def save_bot_identity(self, bot_id, name, updated_at):
+        """Persistir o nome resolvido de um bot (None = sem informação)"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_UPSERT_BOT, (bot_id, name, updated_at))
+
+    @timed(DB_QUERY_SECONDS, 'claim_event')
+    def claim_event(self, event_key, received_at):
+        """Registrar o evento; retorna False se ele já tinha sido processado"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_CLAIM_EVENT, (event_key, received_at)).rowcount == 1
+
+    def prune_events(self, before):
+        """Apagar eventos registrados antes de `before`; retorna quantos foram apagados"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_PRUNE_EVENTS, (before,)).rowcount
+
+    def init_job(self, name, next_run):
+        """Registrar o job se for novo; retorna a próxima execução salva"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_INIT_JOB, (name, next_run))
+            return conn.execute(SQL_SELECT_JOB_NEXT_RUN, (name,)).fetchone()[0]
+
+    def get_job_next_run(self, name):
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_SELECT_JOB_NEXT_RUN, (name,)).fetchone()
+        return row[0] if row else None
+
+    @timed(DB_QUERY_SECONDS, 'claim_job_run')
+    def claim_job_run(self, name, expected, next_run, ran_at, fence=None):
+        """Avançar o job de `expected` para `next_run` (compare-and-set)
+
+        Retorna False se outra réplica já avançou o horário: só quem
+        consegue a troca executa o job. Com `fence` (lease, token), também
+        se o lease já passou para outro holder.
+        """
+        with self.pool.connection() as conn:
+            if fence is None:
+                return conn.execute(SQL_CLAIM_JOB_RUN, (next_run, ran_at, name, expected)).rowcount == 1
+            return conn.execute(
+                SQL_CLAIM_JOB_RUN_FENCED, (next_run, ran_at, name, expected, *fence)
+            ).rowcount == 1
+
+    def finish_job(self, name, status, duration):
+        """Registrar o resultado da última execução"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_FINISH_JOB, (status, duration, name))
+
+    def list_jobs(self):
+        """Listar (name, next_run, last_run, last_status, last_duration) dos jobs"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_JOBS).fetchall()
+
+    @timed(DB_QUERY_SECONDS, 'acquire_lease')
+    def acquire_lease(self, name, holder, now, ttl):
+        """Obter ou renovar o lease até `now + ttl`; retorna o token ou None se outro holder o detém"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_ACQUIRE_LEASE, (name, holder, now + ttl, now)).fetchone()
+        return row[0] if row else None
+
+    def release_lease(self, name, holder):
+        """Liberar o lease (se ainda for deste holder) para outro assumir sem esperar o vencimento"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_RELEASE_LEASE, (name, holder))
+
+    def get_lease(self, name):
+        """(holder, token, expires_at) do lease, ou None"""
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_SELECT_LEASE, (name,)).fetchone()
+
+    def export_messages(self, batch=5000):
+        """Gerar (id, user_id, channel_id, date, message, timestamp) em ordem de id, `batch` por leitura"""
+        last_id = 0
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(SQL_EXPORT_MESSAGES, (last_id, batch)).fetchall()
+            yield from rows
+            if len(rows) < batch:
+                return
+            last_id = rows[-1][0]
+
+    def export_responses(self, batch=5000):
+        """Gerar (user_id, date, response_sent, timestamp) por usuário/data, `batch` por leitura"""
+        last_key = ('', '')
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(SQL_EXPORT_RESPONSES, last_key + (batch,)).fetchall()
+            yield from rows
+            if len(rows) < batch:
+                return
+            last_key = rows[-1][:2]
+
+    def import_messages(self, rows, batch=5000):
+        """Gravar linhas no formato de export_messages, uma transação a cada `batch`; retorna o total"""
+        total = 0
+        for chunk in _chunks(rows, batch):
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(SQL_CREATE_IMPORT_MESSAGES)
+                with cur.copy(SQL_COPY_IMPORT_MESSAGES) as copy:
+                    for row in chunk:
+                        copy.write_row(row)
+                cur.execute(SQL_LOCK_MESSAGES)
+                cur.execute(SQL_IMPORT_MESSAGES)
+                cur.execute(SQL_SYNC_MESSAGE_ID)
+            total += len(chunk)
+        return total
+
+    def import_responses(self, rows, batch=5000):
+        """Gravar linhas no formato de export_responses, uma transação a cada `batch`; retorna o total"""
+        total = 0
+        for chunk in _chunks(rows, batch):
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                # Exportações do SQLite trazem response_sent como 0/1
+                cur.executemany(SQL_IMPORT_RESPONSE, [
+                    (user_id, date, bool(response_sent), timestamp)
+                    for user_id, date, response_sent, timestamp in chunk
+                ])
+            total += len(chunk)
+        return total
+
+    @timed(DB_QUERY_SECONDS, 'take_old_days')
+    def take_old_days(self, before, limit, archive=None):
+        """Remover mensagens e respostas de até `limit` usuário/dias anteriores a `before`
+
+        Uma transação por lote, com o mesmo contrato do Storage do SQLite:
+        `archive(records)` roda na transação, antes de apagar.
+        """
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            days = cur.execute(SQL_OLD_DAYS, (before, limit)).fetchall()
+            if not days:
+                days = cur.execute(SQL_OLD_RESPONSE_DAYS, (before, limit)).fetchall()
+            records = []
+            for day, user_id in days:
+                messages = cur.execute(SQL_DAY_MESSAGES, (user_id, day)).fetchall()
+                row = cur.execute(SQL_SELECT_RESPONSE, (user_id, day)).fetchone()
+                records.append((user_id, day, messages, bool(row and row[0])))
+            if archive and records:
+                archived = archive(records)
+                if archived:
+                    cur.executemany(SQL_INSERT_ARCHIVE, archived)
+            keys = [(user_id, day) for day, user_id in days]
+            if keys:
+                cur.executemany(SQL_DELETE_DAY_MESSAGES, keys)
+                cur.executemany(SQL_DELETE_RESPONSE, keys)
+        return records
+
+    def get_archive(self, user_id, date):
+        """Blobs (messages, response_sent) arquivados do usuário na data"""
+        with self.pool.connection() as conn:
+            return [(bytes(blob), response_sent)
+                    for blob, response_sent in conn.execute(SQL_SELECT_ARCHIVE, (user_id, date))]
+
+    def db_size(self):
+        """(tamanho do banco, bytes livres); o espaço livre fica com o autovacuum do servidor"""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT pg_database_size(current_database())").fetchone()[0], 0
+
+    def auto_vacuum(self):
+        """Sem equivalente ao auto_vacuum do SQLite (0 = NONE): não há páginas a devolver aos poucos"""
+        return 0
+
+    def incremental_vacuum(self, pages):
+        """Nada a fazer: o autovacuum do PostgreSQL reaproveita o espaço; retorna 0 páginas livres"""
+        return 0
+
+    def optimize(self):
+        """Atualizar as estatísticas do planejador (ANALYZE)"""
+        with self.pool.connection() as conn:
+            conn.execute("ANALYZE")
+
+    def vacuum(self):
+        """VACUUM FULL: devolve o espaço livre ao sistema (bloqueia as tabelas)"""
+        with self.pool.connection() as conn:
+            # VACUUM não roda dentro de uma transação
+            conn.autocommit = True
+            try:
+                conn.execute("VACUUM (FULL, ANALYZE)")
+            finally:
+                conn.autocommit = False
+
+    def close(self):
+        """Liberar as conexões"""
+        self.pool.close()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de assinaturas usuário/canal atendidas por um único processo
+"""
+
+import os
+import json
+import threading
+import logging
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription(NamedTuple):
+    """Usuário cujas mensagens são armazenadas e o canal da sua daily"""
+    user_id: str
+    channel_id: str
+    timezone: Optional[str] = None  # ex: America/Sao_Paulo; None = TIMEZONE do processo
+    template: Optional[str] = None  # template do digest (TEMPLATES_FILE); None = DIGEST_TEMPLATE
+
+
+class SubscriptionRegistry:
+    """Índices em memória para roteamento O(1) de eventos por usuário e canal"""
+
+    def __init__(self, subscriptions=()):
+        self._lock = threading.Lock()
+        self._by_user = {}
+        self._by_channel = {}
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    @classmethod
+    def load(cls, storage=None):
+        """Carregar assinaturas do .env, do SUBSCRIPTIONS_FILE e da tabela subscriptions
+
+        Fontes posteriores sobrescrevem as anteriores para o mesmo usuário.
+        """
+        registry = cls()
+
+        # Configuração de usuário único (compatível com o .env original)
+        user_id = os.getenv('USER_ID')
+        channel_id = os.getenv('SLACK_CHANNEL_ID')
+        if user_id and channel_id:
+            registry.add(Subscription(user_id, channel_id))
+
+        # Arquivo JSON: [{"user_id": "U...", "channel_id": "C...", "timezone": "...", "template": "..."}, ...]
+        path = os.getenv('SUBSCRIPTIONS_FILE')
+        if path:
+            with open(path, encoding='utf-8') as f:
+                for item in json.load(f):
+                    registry.add(Subscription(item['user_id'], item['channel_id'], item.get('timezone'),
+                                              item.get('template')))
+
+        if storage is not None:
+            for row in storage.list_subscriptions():
+                registry.add(Subscription(*row))
+
+        logger.info("%d assinaturas carregadas", len(registry))
+        return registry
+
+    def add(self, subscription):
+        """Adicionar ou substituir a assinatura de um usuário"""
+        with self._lock:
+            self._remove(subscription.user_id)
+            self._by_user[subscription.user_id] = subscription
+            self._by_channel.setdefault(subscription.channel_id, []).append(subscription)
+
+    def remove(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id):
+        old = self._by_user.pop(user_id, None)
+        if old is not None:
+            subscribers = self._by_channel[old.channel_id]
+            subscribers.remove(old)
+            if not subscribers:
+                del self._by_channel[old.channel_id]
+
+    def for_user(self, user_id) -> Optional[Subscription]:
+        """Assinatura do usuário, ou None"""
+        return self._by_user.get(user_id)
+
+    def for_channel(self, channel_id):
+        """Assinaturas cuja daily acontece no canal"""
+        return tuple(self._by_channel.get(channel_id, ()))
+
+    def __iter__(self):
+        return iter(list(self._by_user.values()))
+
+    def __len__(self):
+        return len(self._by_user)
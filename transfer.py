@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação e importação do histórico (daily_messages e daily_responses)
+
+    python bot.py export messages backup.ndjson
+    python bot.py import messages backup.ndjson
+    python bot.py export responses - --format csv > respostas.csv
+
+Tudo é feito em fluxo: a exportação lê o banco em lotes pela chave e
+escreve linha a linha; a importação lê o arquivo com geradores e grava
+lotes com executemany, uma transação por lote. A memória usada não depende
+do tamanho do banco nem do arquivo. A importação é idempotente: mensagens
+mantêm o id (linhas já existentes são puladas) e respostas são únicas por
+usuário/dia.
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+from signing import json_loads
+from storage import open_storage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('ndjson', 'csv')
+
+# Tabela -> colunas, na ordem de Storage.export_*/import_* (iguais nos dois backends)
+COLUMNS = {
+    'messages': ('id', 'user_id', 'channel_id', 'date', 'message', 'timestamp'),
+    'responses': ('user_id', 'date', 'response_sent', 'timestamp'),
+}
+REQUIRED = {
+    'messages': ('user_id', 'date', 'message'),
+    'responses': ('user_id', 'date'),
+}
+
+PROGRESS_EVERY = 1_000_000
+
+
+class TransferError(ValueError):
+    """Linha inválida no arquivo importado"""
+
+
+def detect_format(path, fmt=None):
+    """Formato explícito ou pela extensão do arquivo (default: ndjson)"""
+    if fmt:
+        return fmt
+    if path and path.lower().endswith('.csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+def _integer(value):
+    return None if value in (None, '') else int(value)
+
+
+def _boolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 't', 'yes')
+    return bool(value)
+
+
+def _text(value):
+    return None if value in (None, '') else str(value)
+
+
+# Conversão dos valores lidos (no CSV tudo é texto e vazio = NULL)
+CONVERTERS = {
+    'id': _integer,
+    'response_sent': _boolean,
+}
+
+
+def _converter(table, append):
+    """Função registro (dict) -> tupla nas colunas da tabela"""
+    columns = COLUMNS[table]
+    required = REQUIRED[table]
+    converters = [CONVERTERS.get(column, _text) for column in columns]
+
+    def convert(record, line):
+        if not isinstance(record, dict):
+            raise TransferError(f"Linha {line}: esperado um objeto")
+        missing = [column for column in required if not record.get(column)]
+        if missing:
+            raise TransferError(f"Linha {line}: faltando {', '.join(missing)}")
+        try:
+            row = tuple(func(record.get(column)) for column, func in zip(columns, converters))
+        except (TypeError, ValueError) as e:
+            raise TransferError(f"Linha {line}: {e}")
+        # Sem o id, o banco gera um novo (anexar a um banco com dados próprios)
+        return (None,) + row[1:] if append and table == 'messages' else row
+
+    return convert
+
+
+def read_ndjson(stream, table, append=False):
+    """Gerar tuplas a partir de um objeto JSON por linha"""
+    convert = _converter(table, append)
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json_loads(text)
+        except ValueError as e:
+            raise TransferError(f"Linha {line}: JSON inválido ({e})")
+        yield convert(record, line)
+
+
+def read_csv(stream, table, append=False):
+    """Gerar tuplas a partir de um CSV com cabeçalho"""
+    convert = _converter(table, append)
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield convert(record, reader.line_num)
+
+
+def write_ndjson(rows, stream, table):
+    columns = COLUMNS[table]
+    write = stream.write
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for row in rows:
+        write(dumps(dict(zip(columns, row))))
+        write('\n')
+
+
+def write_csv(rows, stream, table):
+    writer = csv.writer(stream)
+    writer.writerow(COLUMNS[table])
+    writer.writerows(rows)
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+WRITERS = {'ndjson': write_ndjson, 'csv': write_csv}
+
+
+class _Progress:
+    """Repassa as linhas contando e logando o andamento a cada PROGRESS_EVERY"""
+
+    def __init__(self, rows, action):
+        self.rows = rows
+        self.action = action
+        self.count = 0
+
+    def __iter__(self):
+        start = time.perf_counter()
+        for self.count, row in enumerate(self.rows, 1):
+            if self.count % PROGRESS_EVERY == 0:
+                logger.info("%s: %d linhas (%.0f linhas/s)", self.action, self.count,
+                            self.count / (time.perf_counter() - start))
+            yield row
+
+
+@contextmanager
+def _open(path, mode):
+    """Arquivo em texto UTF-8; "-" = stdin/stdout"""
+    if path != '-':
+        with open(path, mode, encoding='utf-8', newline='') as stream:
+            yield stream
+        return
+    stream = io.TextIOWrapper((sys.stdin if 'r' in mode else sys.stdout).buffer,
+                              encoding='utf-8', newline='')
+    try:
+        yield stream
+    finally:
+        stream.flush()
+        # Não fechar o stdin/stdout do processo junto com o wrapper
+        stream.detach()
+
+
+def export_table(storage, table, stream, fmt='ndjson', batch=5000):
+    """Escrever a tabela no stream; retorna o número de linhas"""
+    rows = storage.export_messages(batch) if table == 'messages' else storage.export_responses(batch)
+    progress = _Progress(rows, f"Exportando {table}")
+    WRITERS[fmt](progress, stream, table)
+    return progress.count
+
+
+def import_table(storage, table, stream, fmt='ndjson', batch=5000, append=False):
+    """Gravar no banco as linhas do stream; retorna o número de linhas"""
+    rows = _Progress(READERS[fmt](stream, table, append), f"Importando {table}")
+    if table == 'messages':
+        return storage.import_messages(rows, batch)
+    return storage.import_responses(rows, batch)
+
+
+def add_commands(subparsers):
+    """Subcomandos export/import do `python bot.py`"""
+    for name, help_text in (('export', 'exportar o histórico para NDJSON/CSV'),
+                            ('import', 'importar o histórico de NDJSON/CSV')):
+        parser = subparsers.add_parser(name, help=help_text)
+        parser.add_argument('table', choices=sorted(COLUMNS))
+        parser.add_argument('path', help='arquivo ("-" = stdout/stdin)')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='default: pela extensão (.csv), senão ndjson')
+        parser.add_argument('--batch', type=int, default=int(os.getenv('TRANSFER_BATCH_SIZE', 5000)),
+                            help='linhas por lote/transação')
+        if name == 'import':
+            parser.add_argument('--append', action='store_true',
+                                help='ignorar os ids das mensagens e gerar novos')
+        parser.set_defaults(handler=run)
+
+
+def run(args):
+    """Executar export/import com o banco configurado; retorna o código de saída"""
+    storage = open_storage()
+    storage.init_schema(os.getenv('USER_ID'))
+    fmt = detect_format(args.path, args.format)
+    start = time.perf_counter()
+    try:
+        if args.command == 'export':
+            with _open(args.path, 'w') as stream:
+                count = export_table(storage, args.table, stream, fmt, args.batch)
+        else:
+            with _open(args.path, 'r') as stream:
+                count = import_table(storage, args.table, stream, fmt, args.batch, args.append)
+    except (OSError, TransferError) as e:
+        logger.error("Falha ao transferir %s: %s", args.table, e)
+        return 1
+    finally:
+        storage.close()
+    elapsed = time.perf_counter() - start
+    logger.info("%s %s: %d linhas em %.1fs (%.0f linhas/s)",
+                'Exportado' if args.command == 'export' else 'Importado',
+                args.table, count, elapsed, count / elapsed if elapsed else 0)
+    return 0
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritor único com commit agrupado (group commit) das mensagens armazenadas
+
+Às 9h muitos usuários mandam suas atualizações ao mesmo tempo. Com um
+INSERT + commit por mensagem, os workers se revezam no lock de escrita do
+SQLite e cada commit paga seu próprio fsync (com SQLITE_SYNCHRONOUS=FULL) ou
+sua escrita no WAL. Aqui uma única thread escritora recebe as mensagens de
+todos os workers numa fila e grava várias numa transação só, limitada por
+quantidade (WRITE_BATCH_SIZE) e por tempo (WRITE_BATCH_DELAY). O Future de
+cada chamador é concluído com o id da linha depois do commit do seu lote.
+
+Com WRITE_BATCH_DELAY=0 (padrão) o lote é o que já estava na fila: enquanto
+um commit acontece, as mensagens seguintes se acumulam para o próximo, sem
+latência extra quando há pouco movimento. Um atraso positivo espera mais
+mensagens antes de cada commit.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from metrics import DB_WRITE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Sentinela para encerrar a thread escritora
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Fila de inserts gravados em lotes por uma thread escritora
+
+    Com `enabled=False` cada mensagem é gravada na thread do chamador, na
+    própria transação, como antes. A thread é iniciada no primeiro envio
+    (depois do fork, nos workers do gunicorn).
+    """
+
+    def __init__(self, storage, max_batch=200, max_delay=0.0, max_queue=10000, timeout=30.0, enabled=True):
+        self.storage = storage
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max(0.0, max_delay)
+        self.timeout = timeout
+        self.enabled = enabled
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, storage):
+        """Criar a partir das variáveis de ambiente"""
+        return cls(
+            storage,
+            max_batch=int(os.getenv('WRITE_BATCH_SIZE', 200)),
+            max_delay=float(os.getenv('WRITE_BATCH_DELAY', 0)),
+            max_queue=int(os.getenv('WRITE_QUEUE_SIZE', 10000)),
+            timeout=float(os.getenv('WRITE_TIMEOUT', 30)),
+            enabled=os.getenv('DB_GROUP_COMMIT', 'True').lower() == 'true',
+        )
+
+    def submit(self, user_id, channel_id, date, message):
+        """Enfileirar a mensagem; o Future recebe o id da linha após o commit"""
+        if not self.enabled:
+            future = Future()
+            try:
+                future.set_result(self.storage.insert_message(user_id, channel_id, date, message))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put(((user_id, channel_id, date, message), future), timeout=self.timeout)
+        except queue.Full:
+            raise TimeoutError("Fila de gravação cheia")
+        return future
+
+    def insert_message(self, user_id, channel_id, date, message):
+        """Gravar a mensagem e esperar o commit do lote; retorna o id da linha"""
+        return self.submit(user_id, channel_id, date, message).result(timeout=self.timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'batches': self.batches,
+                'rows': self.rows,
+                'largest_batch': self.largest_batch,
+                'failed': self.failed,
+                'queue_depth': self.queue_depth(),
+            }
+
+    def stop(self, timeout=5.0):
+        """Gravar o que já está na fila e encerrar a thread escritora"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+
+            # Completar o lote com o que chegar até o limite de tamanho ou de tempo
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        """Gravar o lote numa transação e concluir os Futures"""
+        try:
+            ids = self.storage.insert_messages([row for row, _ in batch])
+        except Exception as e:
+            # Lote recusado: gravar uma a uma para só a mensagem com problema falhar
+            logger.warning("Falha ao gravar lote de %d mensagens, gravando uma a uma: %s", len(batch), e)
+            for row, future in batch:
+                try:
+                    future.set_result(self.storage.insert_message(*row))
+                except Exception as row_error:
+                    with self._lock:
+                        self.failed += 1
+                    future.set_exception(row_error)
+            return
+
+        for (_, future), message_id in zip(batch, ids):
+            future.set_result(message_id)
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
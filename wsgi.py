@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor WSGI de produção (gunicorn) para o Webhook Mode (SERVER=gunicorn)
+
+O processo master valida a configuração e aplica as migrações, fecha as
+conexões e só então faz o fork: não mantém threads nem conexões abertas.
+Cada worker cria o próprio DailyBot depois do fork (pool de conexões,
+eleição de líder e scheduler) e atende o /events com várias threads. A
+eleição garante que só um worker roda os jobs de cada horário; o estado
+compartilhado entre workers fica no banco.
+"""
+
+import os
+import logging
+
+from gunicorn.app.base import BaseApplication
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# DailyBot do worker atual (criado em load(), depois do fork)
+_worker_bot = None
+
+
+def options_from_env(port):
+    """Opções do gunicorn a partir das variáveis de ambiente"""
+    return {
+        'bind': f"0.0.0.0:{port}",
+        'worker_class': 'gthread',
+        'workers': int(os.getenv('WEB_WORKERS', 2)),
+        'threads': int(os.getenv('WEB_THREADS', 4)),
+        'keepalive': int(os.getenv('WEB_KEEPALIVE', 5)),
+        'timeout': int(os.getenv('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30)),
+        'preload_app': False,
+    }
+
+
+def worker_exit(server, worker):
+    """Shutdown gracioso do worker: parar o scheduler, drenar a fila de eventos e os envios pendentes e fechar o banco"""
+    if _worker_bot is not None:
+        _worker_bot.stop_scheduler()
+        _worker_bot.dispatcher.stop(timeout=float(os.getenv('WEB_GRACEFUL_TIMEOUT', 30)))
+        _worker_bot.outbound.stop()
+        _worker_bot.writer.stop()
+        _worker_bot.storage.close()
+
+
+class GunicornServer(BaseApplication):
+    """Aplicação gunicorn embutida, iniciada pelo DailyBot.start()"""
+
+    def __init__(self, bot_factory, options, when_ready=None):
+        self.bot_factory = bot_factory
+        self.options = dict(options, worker_exit=worker_exit)
+        if when_ready:
+            self.options['when_ready'] = when_ready
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        """Executado em cada worker, depois do fork"""
+        global _worker_bot
+        _worker_bot = self.bot_factory()
+        _worker_bot.start_scheduler()
+        _worker_bot.dispatcher.start()
+        metrics.watch_dispatcher(_worker_bot.dispatcher)
+        # O socket já escuta no master: o /health deste worker passa a responder ready
+        _worker_bot.mark_ready()
+        logger.info(f"Worker {os.getpid()} pronto")
+        return _worker_bot.app